@@ -0,0 +1,343 @@
+"""Per-device alert rules evaluated incrementally on every sample.
+
+A rule is a spec string, optionally limited to one device with ``ADDR=``:
+
+``bpm>180:10``
+    BPM above 180 continuously for 10 seconds (``bpm<40:10`` for below).
+``stale:5``
+    No sample for 5 seconds, counted from the last sample or from when the
+    device was registered or connected. Deadlines live in a timer wheel, so
+    checking them costs nothing per sample.
+``artifacts>20%:30``
+    More than 20% of RR intervals rejected by the filter over the last 30
+    seconds (per-second buckets, at least ``ARTIFACT_MIN_BEATS`` beats).
+
+Every rule keeps O(1) state per device. Firing and resolving produce events
+that an ``AlertDispatcher`` batches and delivers to webhooks (JSON POST) and
+local commands (JSON on stdin) from the event loop, without blocking it.
+"""
+import asyncio
+import json
+import re
+import time
+import urllib.request
+from collections import deque
+
+FIRING = "firing"
+RESOLVED = "resolved"
+
+# Seconds per timer wheel slot, and slots per revolution
+WHEEL_TICK = 0.25
+WHEEL_SLOTS = 512
+
+ARTIFACT_WINDOW = 60
+ARTIFACT_MIN_BEATS = 10
+
+# Seconds to collect events into one delivery, and events kept while sinks are slow
+BATCH_DELAY = 0.5
+MAX_PENDING_EVENTS = 1000
+
+WEBHOOK_TIMEOUT = 5.0
+
+_RULE_PATTERN = re.compile(
+    r"^(?:(?P<address>[^=]+)=)?(?P<metric>bpm|artifacts|stale)"
+    r"(?:(?P<op>[<>])(?P<value>[\d.]+)(?P<percent>%)?)?(?::(?P<seconds>[\d.]+))?$")
+
+
+class ThresholdRule:
+    """BPM above (or below) a threshold for at least ``duration`` seconds."""
+
+    def __init__(self, spec, address, above, threshold, duration):
+        self.spec = spec
+        self.address = address
+        self.above = above
+        self.threshold = threshold
+        self.duration = duration
+
+    def new_state(self):
+        return [None, False]  # condition_since, firing
+
+    def update(self, state, timestamp, heart_rate, rr_count, artifacts):
+        if (heart_rate > self.threshold) if self.above else (heart_rate < self.threshold):
+            if state[0] is None:
+                state[0] = timestamp
+            if not state[1] and timestamp - state[0] >= self.duration:
+                state[1] = True
+                return FIRING, heart_rate
+        else:
+            state[0] = None
+            if state[1]:
+                state[1] = False
+                return RESOLVED, heart_rate
+        return None
+
+
+class ArtifactRateRule:
+    """Share of rejected RR intervals over a sliding window of one-second buckets."""
+
+    def __init__(self, spec, address, threshold, window):
+        self.spec = spec
+        self.address = address
+        self.threshold = threshold
+        self.window = max(1, int(window))
+
+    def new_state(self):
+        return _ArtifactWindow(self.window)
+
+    def update(self, state, timestamp, heart_rate, rr_count, artifacts):
+        state.add(int(timestamp), rr_count, artifacts)
+        beats = state.accepted + state.rejected
+        rate = state.rejected / beats if beats else 0.0
+        if not state.firing and beats >= ARTIFACT_MIN_BEATS and rate > self.threshold:
+            state.firing = True
+            return FIRING, round(rate, 3)
+        if state.firing and rate <= self.threshold:
+            state.firing = False
+            return RESOLVED, round(rate, 3)
+        return None
+
+
+class _ArtifactWindow:
+    __slots__ = ("accepted_buckets", "rejected_buckets", "second", "accepted", "rejected", "firing")
+
+    def __init__(self, window):
+        self.accepted_buckets = [0] * window
+        self.rejected_buckets = [0] * window
+        self.second = None
+        self.accepted = self.rejected = 0
+        self.firing = False
+
+    def add(self, second, accepted, rejected):
+        size = len(self.accepted_buckets)
+        if self.second is None or second - self.second >= size:
+            self.accepted_buckets = [0] * size
+            self.rejected_buckets = [0] * size
+            self.accepted = self.rejected = 0
+        elif second > self.second:
+            # Expire the buckets of the seconds skipped since the last sample
+            for expired in range(self.second + 1, second + 1):
+                index = expired % size
+                self.accepted -= self.accepted_buckets[index]
+                self.rejected -= self.rejected_buckets[index]
+                self.accepted_buckets[index] = self.rejected_buckets[index] = 0
+        if self.second is None or second > self.second:
+            self.second = second
+        index = self.second % size
+        self.accepted_buckets[index] += accepted
+        self.rejected_buckets[index] += rejected
+        self.accepted += accepted
+        self.rejected += rejected
+
+
+class StaleRule:
+    """No sample for ``timeout`` seconds; deadlines are checked by the engine's timer wheel."""
+
+    def __init__(self, spec, address, timeout):
+        self.spec = spec
+        self.address = address
+        self.timeout = timeout
+
+    def new_state(self):
+        return [0.0, False, False, 0.0]  # deadline, scheduled, firing, last sample
+
+    def update(self, state, timestamp, heart_rate, rr_count, artifacts):
+        state[0] = timestamp + self.timeout
+        state[3] = timestamp
+        if state[2]:
+            state[2] = False
+            return RESOLVED, 0.0
+        return None
+
+
+def parse_alert_rule(text):
+    """Parse a rule spec (see the module docstring); raises ValueError."""
+    match = _RULE_PATTERN.match(text.strip())
+    if match is None:
+        raise ValueError(f"invalid alert rule {text!r}")
+    address = match["address"].upper() if match["address"] else None
+    metric, op, seconds = match["metric"], match["op"], match["seconds"]
+    if metric == "stale":
+        if op or seconds is None:
+            raise ValueError("expected stale:SECONDS")
+        return StaleRule(text, address, float(seconds))
+    if op is None:
+        raise ValueError(f"{metric} rule needs a comparison, e.g. {metric}>N")
+    value = float(match["value"]) / (100 if match["percent"] else 1)
+    if metric == "bpm":
+        return ThresholdRule(text, address, op == ">", value, float(seconds or 0))
+    if op != ">":
+        raise ValueError("artifact rules only support >")
+    return ArtifactRateRule(text, address, value, float(seconds or ARTIFACT_WINDOW))
+
+
+class TimerWheel:
+    """Hashed timer wheel: O(1) schedule, O(due items) per tick."""
+
+    def __init__(self, now, tick=WHEEL_TICK, slots=WHEEL_SLOTS):
+        self.tick = tick
+        self.slots = [[] for _ in range(slots)]
+        self.position = int(now / tick)
+
+    def schedule(self, when, item):
+        index = max(int(when / self.tick) + 1, self.position + 1)
+        self.slots[index % len(self.slots)].append((index, item))
+
+    def advance(self, now):
+        """Return the items due up to ``now``."""
+        due = []
+        target = int(now / self.tick)
+        while self.position < target:
+            self.position += 1
+            slot = self.slots[self.position % len(self.slots)]
+            if not slot:
+                continue
+            waiting = [entry for entry in slot if entry[0] > self.position]
+            due.extend(item for index, item in slot if index <= self.position)
+            slot[:] = waiting
+        return due
+
+
+class AlertEngine:
+    """Runs rules on samples and stale checks; ``notify(event)`` gets every transition."""
+
+    def __init__(self, rules, notify, now=None):
+        self.rules = list(rules)
+        self.notify = notify
+        self.wheel = TimerWheel(time.time() if now is None else now)
+        self.active = {}  # (rule spec, address) -> firing event
+        self._device_rules = {}  # address -> ([(rule, state)], [(stale rule, state)])
+
+    def rules_for(self, address):
+        """``(rules, stale_rules)`` for a device, each paired with its state."""
+        rules = self._device_rules.get(address)
+        if rules is None:
+            matching = [rule for rule in self.rules if rule.address in (None, address.upper())]
+            rules = self._device_rules[address] = (
+                [(rule, rule.new_state()) for rule in matching if not isinstance(rule, StaleRule)],
+                [(rule, rule.new_state()) for rule in matching if isinstance(rule, StaleRule)])
+        return rules
+
+    def on_sample(self, address, name, timestamp, heart_rate, rr_count=0, artifacts=0):
+        """Evaluate every rule for ``address`` (``rr_count`` accepted, ``artifacts`` rejected)."""
+        rules, stale_rules = self.rules_for(address)
+        for rule, state in rules:
+            result = rule.update(state, timestamp, heart_rate, rr_count, artifacts)
+            if result is not None:
+                self._emit(rule, address, name, result[0], result[1], timestamp)
+        for rule, state in stale_rules:
+            result = rule.update(state, timestamp, heart_rate, rr_count, artifacts)
+            if result is not None:
+                self._emit(rule, address, name, result[0], result[1], timestamp)
+            if not state[1]:
+                state[1] = True
+                self.wheel.schedule(state[0], (rule, state, address, name))
+
+    def watch_device(self, address, name, now=None):
+        """Start the stale deadlines of a device that has not sent a sample yet.
+
+        Call when a device is registered or (re)connects, so one that never
+        sends a notification still goes stale. Deadlines already running are
+        pushed back to a full timeout from ``now``.
+        """
+        now = time.time() if now is None else now
+        for rule, state in self.rules_for(address)[1]:
+            if state[2]:
+                continue
+            state[0] = max(state[0], now + rule.timeout)
+            if not state[1]:
+                state[3] = now
+                state[1] = True
+                self.wheel.schedule(state[0], (rule, state, address, name))
+
+    def check_stale(self, now):
+        for item in self.wheel.advance(now):
+            rule, state, address, name = item
+            if state[0] > now:
+                # Samples arrived since this entry was scheduled
+                self.wheel.schedule(state[0], item)
+                continue
+            state[1] = False
+            if not state[2]:
+                state[2] = True
+                self._emit(rule, address, name, FIRING, round(now - state[3], 1), now)
+
+    async def run(self, tick=WHEEL_TICK):
+        """Advance the timer wheel until cancelled."""
+        while True:
+            await asyncio.sleep(tick)
+            self.check_stale(time.time())
+
+    def _emit(self, rule, address, name, status, value, timestamp):
+        event = {"rule": rule.spec, "device_address": address, "device_name": name,
+                 "status": status, "value": value, "timestamp": timestamp}
+        if status == FIRING:
+            self.active[(rule.spec, address)] = event
+        else:
+            self.active.pop((rule.spec, address), None)
+        self.notify(event)
+
+
+class AlertDispatcher:
+    """Batches alert events and delivers them from ``loop``; ``submit`` never blocks."""
+
+    def __init__(self, loop, webhooks=(), commands=(), delay=BATCH_DELAY):
+        self.loop = loop
+        self.webhooks = list(webhooks)
+        self.commands = list(commands)
+        self.delay = delay
+        self.pending = deque(maxlen=MAX_PENDING_EVENTS)
+        self.delivered = 0
+        self.dropped = 0
+        self.failures = 0
+        self._wakeup = asyncio.Event()
+
+    def submit(self, event):
+        if len(self.pending) == self.pending.maxlen:
+            self.dropped += 1
+        self.pending.append(event)
+        try:
+            on_loop = asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            on_loop = False
+        if on_loop:
+            self._wakeup.set()
+        else:
+            self.loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def run(self):
+        """Deliver batches until cancelled."""
+        while True:
+            await self._wakeup.wait()
+            await asyncio.sleep(self.delay)
+            self._wakeup.clear()
+            batch = list(self.pending)
+            self.pending.clear()
+            if not batch:
+                continue
+            body = json.dumps({"alerts": batch}).encode()
+            results = await asyncio.gather(
+                *(self._post(url, body) for url in self.webhooks),
+                *(self._run_command(command, body) for command in self.commands),
+                return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    self.failures += 1
+                    print(f"Alert delivery failed: {result}")
+            self.delivered += len(batch)
+
+    async def _post(self, url, body):
+        request = urllib.request.Request(url, data=body, method="POST",
+                                         headers={"Content-Type": "application/json"})
+
+        def send():
+            with urllib.request.urlopen(request, timeout=WEBHOOK_TIMEOUT) as response:
+                response.read()
+
+        await self.loop.run_in_executor(None, send)
+
+    async def _run_command(self, command, body):
+        process = await asyncio.create_subprocess_shell(command, stdin=asyncio.subprocess.PIPE)
+        await process.communicate(body)
+        if process.returncode:
+            raise RuntimeError(f"{command!r} exited with {process.returncode}")
+
@@ -0,0 +1,506 @@
+"""Micro-benchmarks for the heart rate pipeline.
+
+Usage: python bench.py [name ...]   (no names runs everything)
+"""
+import asyncio
+import importlib.util
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from alerts import AlertEngine, parse_alert_rule
+from classifier import classify_device
+from device_cache import DeviceCache
+from export import export_stream
+from hr_parser import build_hr_measurement, parse_hr_measurement, parse_packed_measurements
+from filters import SMOOTHING_FILTER, HeartRateFilter
+from hrv import HrvEngine
+from loadtest import print_results, run_loadtest
+from metrics import Counter, Histogram
+from recorder import SessionRecorder
+from relay import RelayPublisher, RelaySubscriber
+from snapshot import HeartRateSnapshot
+from static_assets import AssetStore
+from transport import HR_SERVICE_UUID, SimulatedTransport, SimulationConfig
+from wire import pack_sample
+
+# Target rate for the notification parser on one core
+PARSER_TARGET_PER_SEC = 1_000_000
+
+# Seconds from process start to the first heart rate sample in headless mode
+STARTUP_TARGET = 1.5
+
+# Packages garmin.py needs; the end-to-end benchmarks are skipped without them
+SERVER_REQUIREMENTS = ("fastapi", "uvicorn", "bleak")
+
+
+def _rate(func, iterations):
+    """Run ``func(iterations)`` and return operations per second."""
+    start = time.perf_counter()
+    func(iterations)
+    return iterations / (time.perf_counter() - start)
+
+
+def bench_parser():
+    """Parse typical 0x2A37 payloads; fails if below PARSER_TARGET_PER_SEC."""
+    payloads = {
+        "uint8 bpm": (bytearray(b"\x06\x48"), (72, True, None, ())),
+        "uint8 bpm + 2 RR": (bytearray(b"\x16\x48\x40\x03\x52\x03"),
+                             (72, True, None, (0x340, 0x352))),
+        "uint16 bpm + energy + RR": (bytearray(b"\x1f\x48\x00\x10\x00\x40\x03"),
+                                     (72, True, 16, (0x340,))),
+    }
+    ok = True
+    for label, (payload, expected) in payloads.items():
+        if tuple(parse_hr_measurement(payload)) != expected:
+            print(f"parser  {label:28s} decoded {tuple(parse_hr_measurement(payload))}, "
+                  f"expected {expected}")
+            ok = False
+            continue
+        def run(n, payload=payload):
+            parse = parse_hr_measurement
+            for _ in range(n):
+                parse(payload)
+        run(1000)
+        rate = _rate(run, 1_000_000)
+        ok &= rate >= PARSER_TARGET_PER_SEC
+        print(f"parser  {label:28s} {rate / 1e6:6.2f} M/s")
+
+    packed = bytearray(b"\x16\x48\x40\x03\x52\x03") * 10_000
+    lengths = [6] * 10_000
+
+    def run_packed(n):
+        for _ in range(n // len(lengths)):
+            parse_packed_measurements(packed, lengths)
+    rate = _rate(run_packed, 1_000_000)
+    print(f"parser  {'packed batch (memoryview)':28s} {rate / 1e6:6.2f} M/s")
+    return ok
+
+
+async def _run_simulated_fleet(devices, rate_hz, duration, handler):
+    transport = SimulatedTransport(devices, SimulationConfig(rate_hz=rate_hz, seed=1))
+    clients = [transport.client(address) for address in await transport.scan()]
+    for client in clients:
+        await client.connect()
+        await client.start_notify(HR_SERVICE_UUID, handler)
+    await asyncio.sleep(duration)
+    for client in clients:
+        await client.disconnect()
+
+
+def bench_simulator(devices=1000, rate_hz=4.0, duration=5.0):
+    """Drive the parser from a simulated fleet; fails if notifications fall behind."""
+    received = 0
+
+    def handler(sender, data):
+        nonlocal received
+        parse_hr_measurement(data)
+        received += 1
+
+    cpu = time.process_time()
+    asyncio.run(_run_simulated_fleet(devices, rate_hz, duration, handler))
+    cpu = time.process_time() - cpu
+    expected = devices * rate_hz * duration
+    print(f"sim     {devices} devices @ {rate_hz:g} Hz: {received / duration:8.0f} notif/s "
+          f"({received / expected:.1%} of target, {cpu / duration:.0%} CPU)")
+    return received >= 0.95 * expected
+
+
+def bench_device_list(devices=500, rounds=100):
+    """Time the device selection list at 500 devices (needs a display)."""
+    import tkinter as tk
+    from device_list import DeviceRow, VirtualDeviceList
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"ui      skipped: {e}")
+        return True
+    root.geometry("1000x700")
+    noop = lambda *args: None
+    device_list = VirtualDeviceList(root, noop, noop, noop)
+    root.update()
+
+    rng = random.Random(1)
+    rows = [DeviceRow(f"AA:BB:CC:00:{i >> 8:02X}:{i & 0xFF:02X}", f"Device {i}",
+                      rng.randint(-100, -30), "Unknown") for i in range(devices)]
+    start = time.perf_counter()
+    device_list.set_rows(sorted(rows, key=lambda row: row.rssi, reverse=True))
+    root.update()
+    initial = time.perf_counter() - start
+
+    # Scan-like updates: a batch of RSSI changes, re-sorted, every round
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for i in rng.sample(range(devices), 50):
+            rows[i] = rows[i]._replace(rssi=rng.randint(-100, -30))
+        device_list.set_rows(sorted(rows, key=lambda row: row.rssi, reverse=True))
+        root.update()
+    update = (time.perf_counter() - start) / rounds
+
+    widgets = len(device_list.cards) + len(device_list.pool)
+    root.destroy()
+    print(f"ui      {devices} devices: first render {initial * 1000:.1f} ms, "
+          f"update {update * 1000:.2f} ms, {widgets} cards alive")
+    return True
+
+
+def bench_chart(rate_hz=4.0, hours=3.0):
+    """Live chart over a multi-hour session; fails if canvas items grow (needs a display)."""
+    import tkinter as tk
+    from live_chart import LiveChart
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"chart   skipped: {e}")
+        return True
+    root.geometry("600x200")
+    chart = LiveChart(root)
+    chart.pack(fill=tk.BOTH, expand=True)
+    root.update()
+    items = chart.item_count
+
+    rng = random.Random(1)
+    samples = int(hours * 3600 * rate_hz)
+    start = time.perf_counter()
+    for i in range(samples):
+        chart.add_sample(i / rate_hz, rng.randint(60, 180), [rng.uniform(500, 1000)])
+        if i % 4 == 0:
+            root.update_idletasks()
+    per_sample = (time.perf_counter() - start) / samples
+    grown = chart.item_count - items
+    root.destroy()
+    print(f"chart   {hours:g} h at {rate_hz:g} Hz: {per_sample * 1e6:.0f} µs/sample, "
+          f"{items} canvas items (+{grown})")
+    return grown == 0
+
+
+def bench_classifier(advertisements=50_000):
+    """Classify scan-like advertisements; fails below 20k/s."""
+    rng = random.Random(1)
+    services = [[], [HR_SERVICE_UUID], ["180f", "0000fe9f-0000-1000-8000-00805f9b34fb"]]
+    # 500 devices advertising repeatedly, as during a continuous scan
+    devices = [("%02X:%02X:%02X:%02X:%02X:%02X" % tuple(rng.randrange(256) for _ in range(6)),
+                rng.choice(services), rng.choice([None, {0x004C: b""}, {0x0087: b""}]))
+               for _ in range(500)]
+    stream = [rng.choice(devices) for _ in range(advertisements)]
+
+    def run(n):
+        for address, uuids, manufacturer_data in stream[:n]:
+            classify_device(address, uuids, manufacturer_data)
+    rate = _rate(run, advertisements)
+    print(f"classify {advertisements} advertisements: {rate / 1000:8.0f} k/s")
+    return rate >= 20_000
+
+
+def bench_metrics(samples=1_000_000):
+    """Instrumentation added to each notification; fails at 1 µs or more per sample."""
+    counter = Counter("bench_notifications_total", "", ["device"]).labels("5E:00:00:00:00:01")
+    histogram = Histogram("bench_latency_seconds", "")
+
+    def handler_path(n):
+        perf_counter_ns = time.perf_counter_ns
+        for _ in range(n):
+            perf_counter_ns()
+            counter.inc()
+
+    def delivery_path(n):
+        perf_counter_ns = time.perf_counter_ns
+        published = perf_counter_ns()
+        for _ in range(n):
+            histogram.observe_ns(perf_counter_ns() - published)
+
+    ok = True
+    for label, run in (("handler counter", handler_path), ("delivery histogram", delivery_path)):
+        cost = 1e9 / _rate(run, samples)
+        ok &= cost < 1000
+        print(f"{label:20s}: {cost:8.0f} ns/sample")
+    return ok
+
+
+def bench_hrv(devices=100, rate_hz=4.0, duration=60.0):
+    """HRV updates plus a summary per notification; fails above 10% of one core."""
+    rng = random.Random(1)
+    engines = [HrvEngine() for _ in range(devices)]
+    steps = int(duration * rate_hz)
+    # About one beat per notification at 4 Hz and typical heart rates
+    samples = [[(rng.randint(60, 180), (rng.randint(600, 1000),) if rng.random() < 0.7 else ())
+                for _ in range(devices)] for _ in range(steps)]
+
+    started = time.process_time()
+    for step, readings in enumerate(samples):
+        timestamp = step / rate_hz
+        for engine, (heart_rate, rr) in zip(engines, readings):
+            engine.add_sample(timestamp, heart_rate, rr)
+            engine.summary()
+    cpu = time.process_time() - started
+    load = cpu / duration
+    print(f"hrv {devices} devices @ {rate_hz:g} Hz: {load * 100:6.2f}% of one core "
+          f"({cpu * 1e6 / (steps * devices):.1f} µs/sample)")
+    return load < 0.10
+
+
+def bench_filter(samples=200_000):
+    """Smoothing filter chain per notification; fails at 20 µs or more per sample."""
+    rng = random.Random(1)
+    stream = [(rng.randint(60, 180) if rng.random() > 0.02 else 0,
+               (rng.randint(600, 1000),) if rng.random() < 0.7 else ())
+              for _ in range(samples)]
+    signal_filter = HeartRateFilter(SMOOTHING_FILTER)
+
+    def run(n):
+        process = signal_filter.process
+        for heart_rate, rr in stream[:n]:
+            process(heart_rate, rr)
+    cost = 1e6 / _rate(run, samples)
+    print(f"filter '{SMOOTHING_FILTER}': {cost:6.2f} µs/sample")
+    return cost < 20
+
+
+def bench_wire(samples=100_000):
+    """Encode cost and size per sample: JSON snapshot body vs the binary wire format."""
+    engine = HrvEngine()
+    for rr in (820, 850, 800, 870):
+        engine.add_rr(rr)
+    payload = {
+        "heart_rate": 72, "timestamp": time.time(), "device_name": "Polar H10 1A2B3C4D",
+        "device_address": "A0:9E:1A:12:34:56", "is_connected": True,
+        "rr_intervals": [833.984375, 800.78125], "heart_rate_raw": 73,
+        "rr_intervals_raw": [833.984375, 800.78125], "sensor_contact": True,
+        "energy_expended": None, "hrv": engine.summary(), "seq": 123456,
+    }
+    encoders = {
+        "json": lambda: json.dumps(payload, separators=(",", ":")).encode(),
+        "binary": lambda: pack_sample(payload),
+    }
+    for label, encode in encoders.items():
+        def run(n, encode=encode):
+            for _ in range(n):
+                encode()
+        cost = 1e6 / _rate(run, samples)
+        size = len(encode())
+        print(f"wire    {label:6s}: {cost:6.2f} µs/sample, {size:4d} bytes/sample, "
+              f"{size * 100 * 4 / 1024:6.1f} KiB/s for 100 devices @ 4 Hz")
+    return True
+
+
+def bench_relay(devices=100, rate_hz=4.0, duration=3.0):
+    """Publisher and subscriber on loopback (UDP and TCP); fails on loss or a 10 ms p99."""
+    async def run(url):
+        loop = asyncio.get_running_loop()
+        latencies = []
+        subscriber = RelaySubscriber(url, lambda address, name, primary, sample:
+                                     latencies.append(time.time() - sample["timestamp"]))
+        receiving = loop.create_task(subscriber.run())
+        await asyncio.sleep(0.1)
+        publisher = RelayPublisher(url, loop)
+        await publisher.start()
+        while publisher.scheme == "tcp" and publisher._writer is None:
+            await asyncio.sleep(0.01)
+        ticks = int(duration * rate_hz)
+        for tick in range(ticks):
+            for device in range(devices):
+                snapshot = HeartRateSnapshot({
+                    "heart_rate": 60 + device % 60, "timestamp": time.time(),
+                    "device_name": f"Sim {device}",
+                    "device_address": f"5E:00:00:00:{device // 256:02X}:{device % 256:02X}",
+                    "is_connected": True, "rr_intervals": [833.984375], "heart_rate_raw": 60,
+                    "rr_intervals_raw": [833.984375], "sensor_contact": True, "energy_expended": None,
+                })
+                publisher.send(snapshot, device == 0)
+            await asyncio.sleep(1.0 / rate_hz)
+        await asyncio.sleep(0.2)
+        publisher.close()
+        await asyncio.sleep(0.1)
+        receiving.cancel()
+        sent = devices * ticks
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2] * 1000 if latencies else float("nan")
+        p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else float("nan")
+        print(f"relay {publisher.scheme}: {subscriber.frames}/{sent} frames, {subscriber.lost} lost "
+              f"by seq, latency p50 {p50:.2f} ms, p99 {p99:.2f} ms")
+        return subscriber.frames == sent and p99 < 10.0
+
+    ok = True
+    for url in ("udp://127.0.0.1:19069", "tcp://127.0.0.1:19070"):
+        ok &= asyncio.run(run(url))
+    return ok
+
+
+def bench_alerts(devices=24, samples=200_000):
+    """Rule evaluation per sample with ~200 rules over 24 devices; fails at 20 µs or more."""
+    addresses = [f"5E:00:00:00:00:{index:02X}" for index in range(devices)]
+    specs = ["bpm>180:10", "bpm<40:10", "stale:5", "artifacts>20%:30",
+             "bpm>200", "bpm<30", "stale:30", "artifacts>50%:10"]
+    for address in addresses:
+        specs += [f"{address}=bpm>{limit}:{hold}" for limit, hold in
+                  ((150, 5), (160, 10), (170, 20), (175, 30))]
+        specs += [f"{address}=bpm<{limit}:5" for limit in (45, 50)]
+        specs += [f"{address}=artifacts>10%:60", f"{address}=stale:2"]
+    engine = AlertEngine([parse_alert_rule(spec) for spec in specs], lambda event: None, now=0.0)
+    rng = random.Random(7)
+    stream = [(addresses[i % devices], i / (4.0 * devices), rng.randint(50, 190),
+               rng.randint(0, 3), int(rng.random() < 0.05)) for i in range(samples)]
+
+    def run(n):
+        on_sample = engine.on_sample
+        for address, timestamp, heart_rate, rr_count, artifacts in stream[:n]:
+            on_sample(address, "device", timestamp, heart_rate, rr_count, artifacts)
+
+    cost = 1e6 / _rate(run, samples)
+    engine.check_stale(stream[-1][1] + 60)
+    per_device = sum(map(len, engine.rules_for(addresses[0])))
+    print(f"alerts: {len(specs)} rules, {per_device} per device: {cost:5.2f} µs/sample, "
+          f"{cost / per_device * 1000:5.0f} ns/rule")
+    return cost < 20.0
+
+
+def bench_export(devices=2, hours=12.0, rate_hz=1.0):
+    """Export a 12 h recording to CSV and FIT; fails if peak memory reaches 16 MiB."""
+    ok = True
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "session.hrlog")
+        with SessionRecorder(path) as recorder:
+            ids = [recorder.add_device(f"5E:00:00:00:00:{index:02X}", f"Sim {index}")
+                   for index in range(devices)]
+            started = time.time() - hours * 3600
+            for tick in range(int(hours * 3600 * rate_hz)):
+                payload = build_hr_measurement(60 + tick % 90, [800 + tick % 64, 790])
+                for device_id in ids:
+                    recorder.record(device_id, payload, started + tick / rate_hz)
+        samples = int(hours * 3600 * rate_hz)
+        for format in ("csv", "fit"):
+            # FIT files hold one device
+            rows = samples if format == "fit" else samples * devices
+            began = time.perf_counter()
+            size = sum(len(data) for data in export_stream(path, format))
+            elapsed = time.perf_counter() - began
+            tracemalloc.start()
+            for _ in export_stream(path, format):
+                pass
+            peak = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+            print(f"export {format}: {rows / elapsed:9.0f} rows/s, {size / 2**20:6.1f} MiB out, "
+                  f"peak {peak:5.1f} MiB traced")
+            ok &= peak < 16
+    return ok
+
+
+def bench_assets(requests=200_000):
+    """Overlay asset responses: cost per request and bytes per scene reload."""
+    store = AssetStore(os.path.join(os.path.dirname(os.path.abspath(__file__)), "static"))
+    page = store.get("obs_display.html")
+    script = store.get("hr_stream.js")
+    etag = page.variants.get("gzip", page.variants["identity"])[1]
+
+    def run(n):
+        for _ in range(n):
+            page.response(None, "gzip, deflate, br", etag)
+
+    cost = 1e6 / _rate(run, requests)
+    raw = len(page.variants["identity"][0]) + len(script.variants["identity"][0])
+    cold = sum(len(asset.response(None, "gzip, deflate, br", None)[1]) for asset in (page, script))
+    print(f"assets: {cost:5.2f} µs/revalidation, encodings {store.encodings}; reload "
+          f"{raw} bytes uncompressed, {cold} cold, 0 revalidated (script cached immutable)")
+    return True
+
+
+def _missing_server_requirements():
+    return [name for name in SERVER_REQUIREMENTS if importlib.util.find_spec(name) is None]
+
+
+def _measure_startup(label, arguments, timeout):
+    """Run ``garmin.py --headless --simulate`` until its first sample; True if under target."""
+    command = [sys.executable, "garmin.py", "--headless", "--simulate", "--sim-rate", "4",
+               *arguments]
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(__file__)),
+                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    watchdog = threading.Timer(timeout, process.kill)
+    watchdog.start()
+    line = ""
+    try:
+        for line in process.stdout:
+            match = re.match(r"First heart rate sample ([\d.]+)s", line)
+            if match:
+                wall = time.perf_counter() - started
+                print(f"startup ({label}) to first sample: {float(match.group(1)):6.2f} s "
+                      f"in-process, {wall:6.2f} s wall")
+                return wall < STARTUP_TARGET
+        if time.perf_counter() - started >= timeout:
+            print(f"startup ({label}): FAILED (no sample within {timeout:.0f} s; "
+                  f"last output: {line.strip()!r})")
+        else:
+            print(f"startup ({label}): FAILED (exited with {process.wait()} before the first "
+                  f"sample; last output: {line.strip()!r})")
+        return False
+    finally:
+        watchdog.cancel()
+        process.kill()
+        process.wait()
+
+
+def bench_startup(timeout=15.0):
+    """Cold start of ``garmin.py --headless`` to its first sample, for an explicit
+    ``--device`` and for ``--auto`` with the device remembered in the cache."""
+    missing = _missing_server_requirements()
+    if missing:
+        print(f"startup: skipped ({', '.join(missing)} not installed)")
+        return True
+    address = "5E:00:00:00:00:00"
+    ok = _measure_startup("--device", ["--device", address], timeout)
+    with tempfile.TemporaryDirectory() as directory:
+        cache = DeviceCache(os.path.join(directory, "cache.json"))
+        cache.record_connected(address, "Simulated HR 1", primary=True)
+        ok &= _measure_startup("remembered", ["--auto", "--device-cache", cache.path], timeout)
+    return ok
+
+
+def bench_loadtest():
+    """Short end-to-end run of loadtest.py (see it for the full suite and JSON output)."""
+    missing = _missing_server_requirements()
+    if missing:
+        print(f"loadtest: skipped ({', '.join(missing)} not installed)")
+        return True
+    results = run_loadtest(devices=10, rate_hz=4.0, clients=20, duration=3.0, warmup=1.0)
+    if results is None:
+        print("loadtest: FAILED (server exited or never connected its simulated devices)")
+        return False
+    print_results(results)
+    return all(result["errors"] == 0 for result in results["endpoints"].values())
+
+
+BENCHMARKS = {
+    "parser": bench_parser,
+    "simulator": bench_simulator,
+    "ui": bench_device_list,
+    "chart": bench_chart,
+    "classifier": bench_classifier,
+    "metrics": bench_metrics,
+    "hrv": bench_hrv,
+    "filter": bench_filter,
+    "wire": bench_wire,
+    "relay": bench_relay,
+    "alerts": bench_alerts,
+    "export": bench_export,
+    "assets": bench_assets,
+    "startup": bench_startup,
+    "loadtest": bench_loadtest,
+}
+
+
+def main(names):
+    ok = True
+    for name in names or BENCHMARKS:
+        ok &= BENCHMARKS[name]()
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,116 @@
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+
+# Samples kept per uncoalesced client before the oldest are dropped
+SUBSCRIBER_BACKLOG = 32
+
+
+class Subscription:
+    """Per-client delivery buffer for one push client (WebSocket or SSE).
+
+    Samples are delivered on the subscriber's own event loop. Without a rate
+    every sample is queued (bounded, oldest dropped first). If the client asked
+    for a coalescing rate, only the newest sample is kept and sent once per
+    interval, so slow clients never build a backlog.
+    """
+
+    def __init__(self, loop, min_interval=0.0):
+        self.loop = loop
+        self.min_interval = min_interval
+        self._pending = deque(maxlen=1 if min_interval else SUBSCRIBER_BACKLOG)
+        self._event = asyncio.Event()
+        self._last_sent = 0.0
+        # perf_counter_ns() at which the message last returned by get() was published
+        self.published_ns = 0
+
+    def _deliver(self, item):
+        self._pending.append(item)
+        self._event.set()
+
+    async def get(self):
+        """Wait for the next message, honouring the coalescing interval."""
+        if self.min_interval:
+            wait = self._last_sent + self.min_interval - self.loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+        while not self._pending:
+            self._event.clear()
+            await self._event.wait()
+        self._last_sent = self.loop.time()
+        message, self.published_ns = self._pending.popleft()
+        return message
+
+
+class HeartRateBroadcaster:
+    """Fan-out of heart rate samples from the BLE side to push clients.
+
+    Each sample is JSON-encoded once. Subscribers on the publisher's own loop
+    (the normal case, with BLE and the API server sharing one loop) get it
+    directly; any other loop gets a single ``call_soon_threadsafe``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, rate=0.0):
+        """Register a client on the running loop; ``rate`` caps messages per second."""
+        loop = asyncio.get_running_loop()
+        sub = Subscription(loop, 1.0 / rate if rate and rate > 0 else 0.0)
+        with self._lock:
+            subs = dict(self._subscribers)
+            subs[loop] = subs.get(loop, frozenset()) | {sub}
+            self._subscribers = subs
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subs = dict(self._subscribers)
+            remaining = subs.get(sub.loop, frozenset()) - {sub}
+            if remaining:
+                subs[sub.loop] = remaining
+            else:
+                subs.pop(sub.loop, None)
+            self._subscribers = subs
+
+    @property
+    def client_count(self):
+        return sum(len(subs) for subs in self._subscribers.values())
+
+    def publish(self, data):
+        """Serialize ``data`` once and push it to every subscriber."""
+        if self._subscribers:
+            self.publish_message(json.dumps(data))
+
+    def publish_message(self, message, published_ns=None):
+        """Push an already encoded message (any immutable object) to every subscriber.
+
+        ``published_ns`` (``time.perf_counter_ns``, default now) lets clients
+        measure end-to-end delivery latency via ``Subscription.published_ns``.
+        """
+        subscribers = self._subscribers
+        if not subscribers:
+            return
+        item = (message, published_ns or time.perf_counter_ns())
+        try:
+            current = asyncio.get_running_loop()
+        except RuntimeError:
+            current = None
+        for loop, subs in subscribers.items():
+            if loop is current:
+                # Publisher shares the clients' loop: hand over directly
+                _fan_out(subs, item)
+                continue
+            try:
+                loop.call_soon_threadsafe(_fan_out, subs, item)
+            except RuntimeError:
+                # Loop already closed; its clients are gone.
+                pass
+
+
+def _fan_out(subs, item):
+    for sub in subs:
+        sub._deliver(item)
@@ -0,0 +1,143 @@
+"""Device classification for scan results, precompiled at import.
+
+Manufacturer hints come from, in order of reliability:
+
+1. Bluetooth SIG company IDs in the advertisement's manufacturer data.
+2. The IEEE OUI registry, if ``oui.csv`` (MA-L CSV export) or ``oui.txt``
+   is placed next to this module. Download it from
+   https://standards-oui.ieee.org/ to enable OUI lookups.
+3. First-octet MAC guesses, used only when neither of the above matches
+   (random/private addresses make these unreliable).
+
+Service hints use a set of normalized 16-bit service UUIDs. Results are
+memoized per (address, services, company IDs).
+"""
+import csv
+import os
+import re
+from functools import lru_cache
+
+BASE_UUID_SUFFIX = "-0000-1000-8000-00805f9b34fb"
+
+# Bluetooth SIG assigned company identifiers
+COMPANY_IDS = {
+    0x004C: "APPLE",
+    0x0075: "SAMSUNG",
+    0x0087: "GARMIN",
+    0x006B: "POLAR",
+}
+
+# Coarse first-octet guesses, kept in the original display order
+MAC_PATTERNS = {
+    "APPLE": ["4C:", "8C:", "F0:", "3C:", "A4:", "BC:"],
+    "SAMSUNG": ["C8:", "E8:", "CC:", "78:", "EC:"],
+    "GARMIN": ["88:", "C4:", "00:", "A4:", "14:"],
+    "POLAR": ["A0:", "00:", "B8:"],
+    "FITBIT": ["FC:", "FB:", "2C:"],
+    "SUUNTO": ["00:", "B4:"],
+    "AMAZFIT": ["C8:", "A4:", "E8:"],
+    "WAHOO": ["90:", "58:"],
+}
+
+SERVICE_HINTS = {
+    0x180D: "❤️ HR",
+    0x180F: "🔋 BAT",
+}
+
+OUI_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+# Keep only the brand from registry names such as "Garmin International"
+OUI_BRANDS = {name.lower(): name for name in MAC_PATTERNS}
+
+_OUI_TXT_LINE = re.compile(r"^\s*([0-9A-Fa-f]{2})-([0-9A-Fa-f]{2})-([0-9A-Fa-f]{2})\s+\(hex\)\s+(.+?)\s*$")
+
+
+def _build_prefix_table(patterns):
+    """First octet -> tuple of manufacturers, in pattern order."""
+    table = {}
+    for manufacturer, prefixes in patterns.items():
+        for prefix in prefixes:
+            octet = prefix.rstrip(":").upper()
+            table[octet] = table.get(octet, ()) + (manufacturer,)
+    return table
+
+
+def _brand(organization):
+    lowered = organization.lower()
+    for key, brand in OUI_BRANDS.items():
+        if key in lowered:
+            return brand
+    return organization.split(",")[0].strip().upper()
+
+
+def load_oui_file(path):
+    """Parse an IEEE MA-L registry (CSV export or oui.txt) into {"AA:BB:CC": brand}."""
+    table = {}
+    with open(path, encoding="utf-8", errors="replace") as f:
+        if path.endswith(".csv"):
+            for row in csv.reader(f):
+                if len(row) >= 3 and len(row[1]) == 6 and row[0] == "MA-L":
+                    oui = row[1].upper()
+                    table[f"{oui[0:2]}:{oui[2:4]}:{oui[4:6]}"] = _brand(row[2])
+        else:
+            for line in f:
+                match = _OUI_TXT_LINE.match(line)
+                if match:
+                    a, b, c, organization = match.groups()
+                    table[f"{a}:{b}:{c}".upper()] = _brand(organization)
+    return table
+
+
+def _load_bundled_oui():
+    for name in ("oui.csv", "oui.txt"):
+        path = os.path.join(OUI_DIRECTORY, name)
+        if os.path.exists(path):
+            return load_oui_file(path)
+    return {}
+
+
+PREFIX_TABLE = _build_prefix_table(MAC_PATTERNS)
+OUI_TABLE = _load_bundled_oui()
+
+
+def service_uuid16(uuid):
+    """Return the 16-bit form of a SIG service UUID, or None for vendor UUIDs."""
+    uuid = str(uuid).lower()
+    if len(uuid) == 4:
+        return int(uuid, 16)
+    if len(uuid) == 36 and uuid.endswith(BASE_UUID_SUFFIX) and uuid.startswith("0000"):
+        return int(uuid[4:8], 16)
+    return None
+
+
+@lru_cache(maxsize=8192)
+def _classify(address, services, companies):
+    hints = []
+    for company_id in companies:
+        brand = COMPANY_IDS.get(company_id)
+        if brand is not None and brand not in hints:
+            hints.append(brand)
+    if not hints:
+        brand = OUI_TABLE.get(address[:8])
+        if brand is not None:
+            hints.append(brand)
+    if not hints:
+        hints.extend(PREFIX_TABLE.get(address[:2], ()))
+
+    uuids16 = set()
+    for uuid in services:
+        value = service_uuid16(uuid)
+        if value is not None:
+            uuids16.add(value)
+    for value, hint in SERVICE_HINTS.items():
+        if value in uuids16:
+            hints.append(hint)
+
+    return " | ".join(hints) if hints else "Unknown"
+
+
+def classify_device(address, services=None, manufacturer_data=None):
+    """Describe a device, e.g. ``"GARMIN | ❤️ HR"``, or ``"Unknown"``."""
+    return _classify(address.upper(),
+                     tuple(services) if services else (),
+                     tuple(manufacturer_data) if manufacturer_data else ())
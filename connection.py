@@ -0,0 +1,141 @@
+"""Connection state machine with automatic reconnect.
+
+A ``DeviceConnection`` keeps one device connected for as long as its ``run``
+task lives. Disconnects are reported by the transport's
+``disconnected_callback`` (no polling), after which the connection retries
+with jittered exponential backoff.
+"""
+import asyncio
+import random
+import time
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+DISCONNECTED = "disconnected"
+CONNECTING = "connecting"
+CONNECTED = "connected"
+BACKOFF = "backoff"
+STOPPED = "stopped"
+
+# Reconnect delays in seconds
+BACKOFF_INITIAL = 0.5
+BACKOFF_MAX = 30.0
+BACKOFF_FACTOR = 2.0
+
+
+class Backoff:
+    """Exponential backoff; each delay is drawn uniformly up to the current ceiling."""
+
+    def __init__(self, initial=BACKOFF_INITIAL, maximum=BACKOFF_MAX, factor=BACKOFF_FACTOR):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.attempt = 0
+
+    def next(self):
+        ceiling = min(self.maximum, self.initial * self.factor ** self.attempt)
+        self.attempt += 1
+        return random.uniform(self.initial / 2, max(self.initial / 2, ceiling))
+
+    def reset(self):
+        self.attempt = 0
+
+
+@dataclass
+class ConnectionStats:
+    state: str = DISCONNECTED
+    connects: int = 0
+    drops: int = 0
+    failed_attempts: int = 0
+    first_attempt: Optional[float] = None  # Unix time of the first connection attempt
+    connected_since: Optional[float] = None
+    last_drop: Optional[float] = None
+    last_connect_duration: Optional[float] = None    # seconds from attempt to subscribed
+    last_reconnect_duration: Optional[float] = None  # seconds from drop to subscribed
+    next_retry_in: Optional[float] = None
+    last_error: Optional[str] = None
+
+    def as_dict(self):
+        return asdict(self)
+
+
+class DeviceConnection:
+    """Keeps a device connected, reconnecting with backoff after drops.
+
+    ``target`` may be an address or a cached ``BLEDevice`` from a scan, which
+    lets Bleak skip discovery on reconnects. Once an attempt with a cached
+    device fails, later attempts use its plain address so the transport
+    looks the device up again. ``on_connected(client)`` is
+    awaited after each successful connect (e.g. to start notifications) and
+    ``on_state(stats, message)`` is called on every state change.
+    """
+
+    def __init__(self, transport, target, on_connected, on_state=None,
+                 timeout=10.0, backoff=None):
+        self.transport = transport
+        self.target = target
+        self.on_connected = on_connected
+        self.on_state = on_state
+        self.timeout = timeout
+        self.backoff = backoff or Backoff()
+        self.stats = ConnectionStats()
+
+    def _set_state(self, state, message=None):
+        self.stats.state = state
+        if self.on_state is not None:
+            self.on_state(self.stats, message)
+
+    async def run(self):
+        """Connect and stay connected until cancelled."""
+        loop = asyncio.get_running_loop()
+        stats = self.stats
+        try:
+            while True:
+                disconnected = asyncio.Event()
+
+                def on_disconnect(client):
+                    loop.call_soon_threadsafe(disconnected.set)
+
+                if stats.first_attempt is None:
+                    stats.first_attempt = time.time()
+                self._set_state(CONNECTING)
+                started = time.monotonic()
+                try:
+                    async with self.transport.client(self.target, timeout=self.timeout,
+                                                     disconnected_callback=on_disconnect) as client:
+                        await self.on_connected(client)
+                        now = time.monotonic()
+                        stats.connects += 1
+                        stats.connected_since = time.time()
+                        stats.last_connect_duration = now - started
+                        if stats.last_drop is not None:
+                            stats.last_reconnect_duration = time.time() - stats.last_drop
+                        stats.next_retry_in = None
+                        stats.last_error = None
+                        self.backoff.reset()
+                        self._set_state(CONNECTED)
+                        await disconnected.wait()
+                    stats.drops += 1
+                    stats.last_drop = time.time()
+                    stats.connected_since = None
+                    self._set_state(DISCONNECTED, "Connection lost")
+                except Exception as e:
+                    stats.failed_attempts += 1
+                    stats.last_error = str(e)
+                    if not isinstance(self.target, str):
+                        # BlueZ may have dropped the object or the device re-advertised
+                        self.target = self.target.address
+                    if stats.connected_since is not None:
+                        stats.drops += 1
+                        stats.last_drop = time.time()
+                        stats.connected_since = None
+                    self._set_state(DISCONNECTED, f"Error: {e}")
+
+                delay = self.backoff.next()
+                stats.next_retry_in = delay
+                self._set_state(BACKOFF, f"Reconnecting in {delay:.1f}s...")
+                await asyncio.sleep(delay)
+        finally:
+            stats.connected_since = None
+            stats.next_retry_in = None
+            self._set_state(STOPPED)
@@ -0,0 +1,57 @@
+"""Rate-limited console output for per-notification messages.
+
+Printing every notification blocks the BLE callback on terminal I/O. A
+``RateLimitedLogger`` only records the latest arguments on the hot path; a
+background thread formats and prints them at most once per interval.
+"""
+import threading
+
+# Seconds between printed lines
+LOG_INTERVAL = 1.0
+
+
+class RateLimitedLogger:
+    """Prints ``template.format(*latest_args)`` at most once per ``interval``."""
+
+    def __init__(self, template, interval=LOG_INTERVAL):
+        self.template = template
+        self.interval = interval
+        self._args = None
+        self._count = 0
+        self._stopped = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def update(self, *args):
+        """Record the latest values; cheap enough for the notification path."""
+        self._args = args
+        self._count += 1
+        if self._thread is None:
+            self._start()
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="console-log", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        printed = 0
+        while not self._stopped.wait(self.interval):
+            printed = self._flush(printed)
+        self._flush(printed)
+
+    def _flush(self, printed):
+        count, args = self._count, self._args
+        if count == printed or args is None:
+            return printed
+        line = self.template.format(*args)
+        if count - printed > 1:
+            line += f" ({count - printed} updates)"
+        print(line, flush=True)
+        return count
+
+    def close(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
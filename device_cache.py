@@ -0,0 +1,123 @@
+"""Small on-disk cache of probed devices and the last device used.
+
+For each address it stores whether the device exposes the Heart Rate service
+(from a probe or a successful connection) and the handle of its Heart Rate
+Measurement characteristic. The last primary device lets the next start
+connect straight away instead of scanning first.
+
+Saves made from a running event loop are written by an executor thread so
+BLE and API work on the loop never waits on the disk; saves that arrive while
+a write is in flight are coalesced into one more write of the latest state.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+
+CACHE_FILE = os.path.join(os.path.expanduser("~"), ".hr_monitor_cache.json")
+CACHE_VERSION = 1
+
+
+class DeviceCache:
+    """JSON-backed device cache; ``path=None`` keeps it in memory only."""
+
+    def __init__(self, path=CACHE_FILE):
+        self.path = path
+        self.devices = {}
+        self.last_address = None
+        self._lock = threading.Lock()
+        self._pending = None   # serialized state not yet written
+        self._writing = False  # an executor thread is draining _pending
+        if path is not None:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != CACHE_VERSION:
+            return
+        self.devices = data.get("devices", {})
+        self.last_address = data.get("last_device")
+
+    def save(self):
+        if self.path is None:
+            return
+        data = {"version": CACHE_VERSION, "last_device": self.last_address, "devices": self.devices}
+        text = json.dumps(data, indent=1)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(text)
+            return
+        with self._lock:
+            self._pending = text
+            start = not self._writing
+            self._writing = True
+        if start:
+            loop.run_in_executor(None, self._drain)
+
+    def _drain(self):
+        while True:
+            with self._lock:
+                text, self._pending = self._pending, None
+                if text is None:
+                    self._writing = False
+                    return
+            self._write(text)
+
+    def _write(self, text):
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"Could not save device cache: {e}")
+
+    def get(self, address):
+        return self.devices.get(address.upper())
+
+    def has_hr(self, address):
+        """True/False once probed or connected, None if unknown."""
+        entry = self.get(address)
+        return entry.get("has_hr") if entry else None
+
+    def hr_handle(self, address):
+        entry = self.get(address)
+        return entry.get("hr_handle") if entry else None
+
+    @property
+    def last_device(self):
+        """``(address, name)`` of the last primary device, or None."""
+        entry = self.get(self.last_address) if self.last_address else None
+        if entry is None:
+            return None
+        return self.last_address, entry.get("name") or self.last_address
+
+    def _update(self, address, **fields):
+        entry = dict(self.devices.get(address.upper(), {}))
+        entry.update(fields)
+        if entry != self.devices.get(address.upper()):
+            self.devices[address.upper()] = entry
+            return True
+        return False
+
+    def record_probe(self, address, has_hr, hr_handle=None, save=True):
+        self._update(address, has_hr=has_hr, hr_handle=hr_handle, probed_at=time.time())
+        if save:
+            self.save()
+
+    def record_connected(self, address, name, hr_handle=None, primary=False):
+        fields = {"name": name, "has_hr": True}
+        if hr_handle is not None:
+            fields["hr_handle"] = hr_handle
+        changed = self._update(address, **fields)
+        if primary and self.last_address != address.upper():
+            self.last_address = address.upper()
+            changed = True
+        if changed:
+            self.save()
@@ -0,0 +1,187 @@
+"""Virtualized, keyed device card list for the device selection window.
+
+Only the cards inside the visible part of the canvas exist as Tk widgets.
+Cards are keyed by address: a row that keeps its address keeps its card
+(only changed labels are reconfigured), rows that scroll out of view hand
+their card back to a pool for reuse, and moving a row is a single
+``canvas.coords`` call.
+"""
+import tkinter as tk
+from tkinter import ttk
+from collections import namedtuple
+
+DeviceRow = namedtuple("DeviceRow", "address name rssi hint")
+
+# Fixed card geometry (pixels) so row positions can be computed, not measured
+CARD_HEIGHT = 150
+CARD_GAP = 16
+CARD_PADX = 15
+
+# Extra rows rendered above and below the viewport to hide scroll pop-in
+OVERSCAN = 2
+
+
+def signal_badge(rssi):
+    """Colour and label for a signal strength."""
+    if rssi > -50:
+        return "#27ae60", "🟢 Strong"
+    elif rssi > -70:
+        return "#f39c12", "🟡 Good"
+    return "#e74c3c", "🔴 Weak"
+
+
+class DeviceCard:
+    """One reusable device card; ``show`` rebinds it to a row."""
+
+    def __init__(self, canvas, on_connect, on_monitor, on_test):
+        self.row = None
+        self.frame = tk.Frame(canvas, bg="white", relief=tk.RAISED, bd=1)
+        self.window = canvas.create_window(0, 0, window=self.frame, anchor="nw",
+                                           height=CARD_HEIGHT - CARD_GAP, state="hidden")
+
+        # Header with device name and signal
+        header_frame = tk.Frame(self.frame, bg="white")
+        header_frame.pack(fill=tk.X, padx=15, pady=(15, 5))
+
+        self.name_label = tk.Label(header_frame, font=("Helvetica", 14, "bold"),
+                                   bg="white", fg="#2c3e50")
+        self.name_label.pack(side=tk.LEFT, anchor="w")
+
+        self.signal_frame = tk.Frame(header_frame, relief=tk.RAISED, bd=1)
+        self.signal_frame.pack(side=tk.RIGHT)
+
+        self.signal_label = tk.Label(self.signal_frame, font=("Helvetica", 9, "bold"),
+                                     fg="white", padx=8, pady=2)
+        self.signal_label.pack()
+
+        # Device details
+        details_frame = tk.Frame(self.frame, bg="white")
+        details_frame.pack(fill=tk.X, padx=15, pady=5)
+
+        self.address_label = tk.Label(details_frame, font=("Helvetica", 9),
+                                      bg="white", fg="#7f8c8d")
+        self.address_label.pack(anchor="w")
+
+        self.hint_label = tk.Label(details_frame, font=("Helvetica", 9),
+                                   bg="white", fg="#3498db")
+        self.hint_label.pack(anchor="w")
+
+        # Action buttons
+        button_frame = tk.Frame(self.frame, bg="white")
+        button_frame.pack(fill=tk.X, padx=15, pady=(5, 15))
+
+        tk.Button(button_frame, text="🚀 Connect",
+                  command=lambda: on_connect(self.row.address, self.row.name),
+                  font=("Helvetica", 11, "bold"),
+                  bg="#e74c3c", fg="white",
+                  relief=tk.FLAT, padx=25, pady=8).pack(side=tk.RIGHT, padx=5)
+
+        tk.Button(button_frame, text="➕ Monitor",
+                  command=lambda: on_monitor(self.row.address, self.row.name),
+                  font=("Helvetica", 10),
+                  bg="#3498db", fg="white",
+                  relief=tk.FLAT, padx=15, pady=6).pack(side=tk.RIGHT, padx=5)
+
+        tk.Button(button_frame, text="🧪 Test",
+                  command=lambda: on_test(self.row.address),
+                  font=("Helvetica", 10),
+                  bg="#95a5a6", fg="white",
+                  relief=tk.FLAT, padx=15, pady=6).pack(side=tk.RIGHT, padx=5)
+
+    def show(self, row):
+        """Bind the card to ``row``, reconfiguring only what changed."""
+        old = self.row
+        self.row = row
+        if old is not None and old == row:
+            return
+        if old is None or old.name != row.name:
+            self.name_label.config(text=f"📱 {row.name}")
+        if old is None or old.rssi != row.rssi:
+            color, text = signal_badge(row.rssi)
+            self.signal_frame.config(bg=color)
+            self.signal_label.config(text=f"{text} ({row.rssi})", bg=color)
+        if old is None or old.address != row.address:
+            self.address_label.config(text=f"🏷️ {row.address}")
+        if old is None or old.hint != row.hint:
+            self.hint_label.config(text=f"🔗 {row.hint}" if row.hint != "Unknown" else "")
+
+
+class VirtualDeviceList:
+    """Scrollable list of device cards that only materializes visible rows."""
+
+    def __init__(self, parent, on_connect, on_monitor, on_test):
+        self.on_connect = on_connect
+        self.on_monitor = on_monitor
+        self.on_test = on_test
+        self.rows = []
+        self.cards = {}
+        self.pool = []
+        self.width = 1
+
+        self.canvas = tk.Canvas(parent, bg="#ecf0f1", highlightthickness=0)
+        self.scrollbar = ttk.Scrollbar(parent, orient="vertical", command=self._on_scrollbar)
+        self.canvas.configure(yscrollcommand=self.scrollbar.set, yscrollincrement=20)
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.canvas.bind("<Configure>", self._on_configure)
+        self.canvas.bind_all("<MouseWheel>", self._on_mousewheel)
+        self.canvas.bind_all("<Button-4>", lambda e: self._scroll(-3))
+        self.canvas.bind_all("<Button-5>", lambda e: self._scroll(3))
+
+    def set_rows(self, rows):
+        """Replace the row list; only cards whose rows changed are touched."""
+        self.rows = rows
+        self.canvas.configure(scrollregion=(0, 0, self.width, max(1, len(rows) * CARD_HEIGHT)))
+        self.render()
+
+    def clear(self):
+        self.set_rows([])
+        self.canvas.yview_moveto(0)
+
+    def visible_range(self):
+        top = self.canvas.canvasy(0)
+        height = self.canvas.winfo_height()
+        first = max(0, int(top // CARD_HEIGHT) - OVERSCAN)
+        last = min(len(self.rows), int((top + height) // CARD_HEIGHT) + 1 + OVERSCAN)
+        return first, last
+
+    def render(self):
+        """Materialize cards for the visible rows, recycling the rest."""
+        first, last = self.visible_range()
+        visible = {self.rows[i].address: i for i in range(first, last)}
+
+        for address in [a for a in self.cards if a not in visible]:
+            card = self.cards.pop(address)
+            self.canvas.itemconfigure(card.window, state="hidden")
+            self.pool.append(card)
+
+        canvas = self.canvas
+        for address, index in visible.items():
+            card = self.cards.get(address)
+            if card is None:
+                card = self.pool.pop() if self.pool else DeviceCard(
+                    canvas, self.on_connect, self.on_monitor, self.on_test)
+                canvas.itemconfigure(card.window, state="normal", width=self.width)
+                self.cards[address] = card
+            card.show(self.rows[index])
+            canvas.coords(card.window, CARD_PADX, index * CARD_HEIGHT + CARD_GAP // 2)
+
+    def _on_configure(self, event):
+        width = max(1, event.width - 2 * CARD_PADX)
+        if width != self.width:
+            self.width = width
+            for card in self.cards.values():
+                self.canvas.itemconfigure(card.window, width=width)
+        self.set_rows(self.rows)
+
+    def _on_scrollbar(self, *args):
+        self.canvas.yview(*args)
+        self.render()
+
+    def _scroll(self, units):
+        self.canvas.yview_scroll(units, "units")
+        self.render()
+
+    def _on_mousewheel(self, event):
+        self._scroll(-1 if event.delta > 0 else 1)
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+
+
+class DeviceManager:
+    """Runs every device connection as a task on one shared asyncio loop.
+
+    ``run_device(address, name, **kwargs)`` is the coroutine that owns a single
+    connection; the manager starts the loop thread on first use and keeps at
+    most one task per address. Adding a running device again with
+    ``primary=True`` restarts its task in the primary role. Other long-lived work (scans, the API server)
+    is scheduled on the same loop with ``run``.
+    """
+
+    def __init__(self, run_device):
+        self._run_device = run_device
+        self._loop = None
+        self._thread = None
+        self._tasks = {}
+        self._kwargs = {}     # address -> kwargs the running task was started with
+        self._removing = {}   # address -> task being cancelled by remove_device
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self):
+        """The shared event loop, started on first access."""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever,
+                                                name="event-loop", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    @property
+    def addresses(self):
+        return list(self._tasks)
+
+    def add_device(self, address, name, **kwargs):
+        """Start monitoring a device; a no-op if it is already running."""
+        return asyncio.run_coroutine_threadsafe(self._add(address, name, kwargs), self.loop)
+
+    def remove_device(self, address):
+        """Stop monitoring a device and disconnect it."""
+        return asyncio.run_coroutine_threadsafe(self._remove(address), self.loop)
+
+    def run(self, coro):
+        """Schedule any coroutine on the shared loop from another thread."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    async def _add(self, address, name, kwargs):
+        removing = self._removing.get(address)
+        if removing is not None:
+            await asyncio.wait({removing})
+        task = self._tasks.get(address)
+        if task is not None and not task.done():
+            if not kwargs.get("primary") or self._kwargs[address].get("primary"):
+                return task
+            await self._remove(address)
+            task = self._tasks.get(address)
+            if task is not None and not task.done():
+                # Another add got in while the old task was stopping
+                return task
+        task = asyncio.create_task(self._run_device(address, name, **kwargs),
+                                   name=f"device-{address}")
+        self._tasks[address] = task
+        self._kwargs[address] = kwargs
+        task.add_done_callback(lambda done: self._forget(address, done))
+        return task
+
+    def _forget(self, address, task):
+        if self._tasks.get(address) is task:
+            del self._tasks[address]
+            del self._kwargs[address]
+
+    async def _remove(self, address):
+        task = self._tasks.get(address)
+        if task is None:
+            return
+        self._removing[address] = task
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        finally:
+            if self._removing.get(address) is task:
+                del self._removing[address]
+
+    def stop(self):
+        """Cancel all device tasks and stop the loop."""
+        if self._loop is None:
+            return
+        for address in list(self._tasks):
+            self.remove_device(address).result(timeout=10)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=10)
@@ -0,0 +1,333 @@
+"""Streaming export of session recordings to CSV, Parquet and FIT.
+
+Notifications are decoded straight from the memory-mapped recording into
+column chunks of ``CHUNK_ROWS`` samples, and each writer turns a chunk into
+output bytes before the next one is read, so memory stays constant however
+long the session is and output starts with the first chunk.
+
+``csv``
+    One row per notification; RR intervals in ms, space separated.
+``parquet``
+    One row group per chunk, built with pyarrow compute kernels (needs
+    ``pyarrow``). RR intervals are a ``list<float32>`` column.
+``fit``
+    Garmin FIT activity file for a single device: ``record`` messages with
+    heart rate and ``hrv`` messages with RR intervals. The header holds the
+    data size, so a first pass over the recording sizes the file.
+
+Usage: python export.py RECORDING [--format csv|parquet|fit] [--device ADDR]
+                        [--from UNIX_TIME] [--to UNIX_TIME] [--output FILE]
+"""
+import argparse
+import importlib
+import struct
+import sys
+
+from hr_parser import RR_TICKS_PER_SECOND, parse_hr_measurement
+from recorder import ENTRY_DEVICE, SessionRecording
+
+CHUNK_ROWS = 4096
+
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "fit": ("application/vnd.ant.fit", "fit"),
+}
+
+CSV_HEADER = ("timestamp,device_address,device_name,heart_rate,sensor_contact,"
+              "energy_expended,rr_intervals_ms\n")
+
+
+def read_chunks(path, device=None, start=None, end=None, size=CHUNK_ROWS):
+    """Yield column dicts of at most ``size`` samples from a recording.
+
+    Columns: ``timestamp``, ``device_address``, ``device_name``,
+    ``heart_rate``, ``sensor_contact``, ``energy_expended``, ``rr_offsets``
+    (``size + 1`` offsets into ``rr_ticks``) and ``rr_ticks``.
+    """
+    device = device.upper() if device else None
+    with SessionRecording(path) as recording:
+        chunk = _new_chunk()
+        skip = set()
+        for timestamp, kind, device_id, payload in recording:
+            if kind == ENTRY_DEVICE:
+                # Appended sessions restart device ids, so re-decide on every declaration
+                address = recording.devices[device_id][0]
+                if device is not None and address.upper() != device:
+                    skip.add(device_id)
+                else:
+                    skip.discard(device_id)
+                continue
+            if device_id in skip or (start is not None and timestamp < start):
+                continue
+            if end is not None and timestamp > end:
+                continue
+            try:
+                measurement = parse_hr_measurement(payload)
+            except ValueError:
+                continue
+            address, name = recording.devices.get(device_id, (str(device_id), ""))
+            chunk["timestamp"].append(timestamp)
+            chunk["device_address"].append(address)
+            chunk["device_name"].append(name)
+            chunk["heart_rate"].append(measurement.heart_rate)
+            chunk["sensor_contact"].append(measurement.sensor_contact)
+            chunk["energy_expended"].append(measurement.energy_expended)
+            chunk["rr_ticks"].extend(measurement.rr_intervals)
+            chunk["rr_offsets"].append(len(chunk["rr_ticks"]))
+            if len(chunk["timestamp"]) >= size:
+                yield chunk
+                chunk = _new_chunk()
+        if chunk["timestamp"]:
+            yield chunk
+
+
+def _new_chunk():
+    return {"timestamp": [], "device_address": [], "device_name": [], "heart_rate": [],
+            "sensor_contact": [], "energy_expended": [], "rr_offsets": [0], "rr_ticks": []}
+
+
+def csv_stream(chunks):
+    yield CSV_HEADER.encode()
+    scale = 1000.0 / RR_TICKS_PER_SECOND
+    for chunk in chunks:
+        offsets, ticks = chunk["rr_offsets"], chunk["rr_ticks"]
+        lines = []
+        for index, (timestamp, address, name, heart_rate, contact, energy) in enumerate(zip(
+                chunk["timestamp"], chunk["device_address"], chunk["device_name"],
+                chunk["heart_rate"], chunk["sensor_contact"], chunk["energy_expended"])):
+            rr = " ".join(f"{rr * scale:.1f}" for rr in ticks[offsets[index]:offsets[index + 1]])
+            name = name.replace('"', '""')
+            lines.append(f'{timestamp:.3f},{address},"{name}",{heart_rate},'
+                         f'{"" if contact is None else int(contact)},'
+                         f'{"" if energy is None else energy},{rr}\n')
+        yield "".join(lines).encode()
+
+
+class _ChunkSink:
+    """Write-only file object whose contents are taken after each row group."""
+
+    closed = False
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b"".join(self.parts)
+        self.parts.clear()
+        return data
+
+
+def load_pyarrow():
+    """Return ``(pyarrow, pyarrow.compute, pyarrow.parquet)``; RuntimeError if missing."""
+    try:
+        return tuple(importlib.import_module(name)
+                     for name in ("pyarrow", "pyarrow.compute", "pyarrow.parquet"))
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)") from None
+
+
+def parquet_stream(chunks):
+    pa, pc, pq = load_pyarrow()
+    schema = pa.schema([
+        ("timestamp", pa.timestamp("us", tz="UTC")),
+        ("device_address", pa.dictionary(pa.int32(), pa.string())),
+        ("device_name", pa.dictionary(pa.int32(), pa.string())),
+        ("heart_rate", pa.uint16()),
+        ("sensor_contact", pa.bool_()),
+        ("energy_expended", pa.uint16()),
+        ("rr_intervals_ms", pa.list_(pa.float32())),
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for chunk in chunks:
+            micros = pc.multiply(pa.array(chunk["timestamp"], pa.float64()), 1_000_000)
+            rr_ms = pc.multiply(pa.array(chunk["rr_ticks"], pa.uint16()).cast(pa.float32()),
+                                pa.scalar(1000.0 / RR_TICKS_PER_SECOND, pa.float32()))
+            batch = pa.record_batch([
+                pc.cast(micros, pa.int64(), safe=False).cast(schema.field("timestamp").type),
+                pa.array(chunk["device_address"]).dictionary_encode(),
+                pa.array(chunk["device_name"]).dictionary_encode(),
+                pa.array(chunk["heart_rate"], pa.uint16()),
+                pa.array(chunk["sensor_contact"], pa.bool_()),
+                pa.array(chunk["energy_expended"], pa.uint16()),
+                pa.ListArray.from_arrays(pa.array(chunk["rr_offsets"], pa.int32()), rr_ms),
+            ], schema=schema)
+            writer.write_batch(batch)
+            yield sink.take()
+    finally:
+        writer.close()
+    yield sink.take()
+
+
+# FIT timestamps count seconds from 1989-12-31 00:00 UTC
+FIT_EPOCH = 631065600
+FIT_HEADER = struct.Struct("<BBHI4s")
+FIT_PROTOCOL_VERSION = 0x10
+FIT_PROFILE_VERSION = 2100
+
+# Local message types and their definitions (global number, fields)
+FIT_FILE_ID, FIT_RECORD, FIT_HRV = 0, 1, 2
+FIT_HRV_VALUES = 5
+_FIT_DEFINITIONS = {
+    # type (enum), manufacturer (uint16), product (uint16), time_created (uint32)
+    FIT_FILE_ID: (0, ((0, 1, 0x00), (1, 2, 0x84), (2, 2, 0x84), (4, 4, 0x86))),
+    # timestamp (uint32), heart_rate (uint8)
+    FIT_RECORD: (20, ((253, 4, 0x86), (3, 1, 0x02))),
+    # time (uint16[5], ms)
+    FIT_HRV: (78, ((0, 2 * FIT_HRV_VALUES, 0x84),)),
+}
+FIT_FILE_ID_DATA = struct.Struct("<BBHHI")
+FIT_RECORD_DATA = struct.Struct("<BIB")
+FIT_HRV_DATA = struct.Struct(f"<B{FIT_HRV_VALUES}H")
+FIT_INVALID_UINT16 = 0xFFFF
+FIT_MANUFACTURER_DEVELOPMENT = 255
+FIT_FILE_ACTIVITY = 4
+
+
+def _fit_crc_table():
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+        table.append(crc)
+    return table
+
+
+_FIT_CRC_TABLE = _fit_crc_table()
+
+
+def fit_crc(data, crc=0):
+    """CRC-16 used by FIT files (poly 0x8005, reflected)."""
+    table = _FIT_CRC_TABLE
+    for byte in data:
+        crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
+    return crc
+
+
+def _fit_definitions():
+    parts = []
+    for local_type, (global_number, fields) in _FIT_DEFINITIONS.items():
+        parts.append(struct.pack("<BBBHB", 0x40 | local_type, 0, 0, global_number, len(fields)))
+        parts.extend(struct.pack("<BBB", *field) for field in fields)
+    return b"".join(parts)
+
+
+def _fit_messages(chunk):
+    """Record and hrv messages of one chunk."""
+    offsets, ticks = chunk["rr_offsets"], chunk["rr_ticks"]
+    parts = []
+    for index, (timestamp, heart_rate) in enumerate(zip(chunk["timestamp"], chunk["heart_rate"])):
+        parts.append(FIT_RECORD_DATA.pack(FIT_RECORD, max(0, int(timestamp) - FIT_EPOCH),
+                                          min(heart_rate, 254)))
+        rr = [round(tick * 1000 / RR_TICKS_PER_SECOND)
+              for tick in ticks[offsets[index]:offsets[index + 1]]]
+        for start in range(0, len(rr), FIT_HRV_VALUES):
+            values = rr[start:start + FIT_HRV_VALUES]
+            values += [FIT_INVALID_UINT16] * (FIT_HRV_VALUES - len(values))
+            parts.append(FIT_HRV_DATA.pack(FIT_HRV, *values))
+    return b"".join(parts)
+
+
+def fit_stream(path, device=None, start=None, end=None):
+    """FIT file for one device (the first recorded one if ``device`` is None)."""
+    if device is None:
+        device = first_device(path)
+    if device is None:
+        raise ValueError("recording has no devices")
+    return _fit_chunks(path, device, start, end)
+
+
+def _fit_chunks(path, device, start, end):
+    # First pass: the header needs the size of everything that follows
+    data_size = 0
+    created = None
+    for chunk in read_chunks(path, device, start, end):
+        if created is None:
+            created = chunk["timestamp"][0]
+        data_size += len(_fit_messages(chunk))
+    preamble = _fit_definitions() + FIT_FILE_ID_DATA.pack(
+        FIT_FILE_ID, FIT_FILE_ACTIVITY, FIT_MANUFACTURER_DEVELOPMENT, 0,
+        max(0, int(created or 0) - FIT_EPOCH))
+    header = FIT_HEADER.pack(14, FIT_PROTOCOL_VERSION, FIT_PROFILE_VERSION,
+                             len(preamble) + data_size, b".FIT")
+    header += struct.pack("<H", fit_crc(header))
+    crc = fit_crc(header)
+    crc = fit_crc(preamble, crc)
+    yield header + preamble
+    for chunk in read_chunks(path, device, start, end):
+        data = _fit_messages(chunk)
+        crc = fit_crc(data, crc)
+        yield data
+    yield struct.pack("<H", crc)
+
+
+def first_device(path):
+    with SessionRecording(path) as recording:
+        for timestamp, kind, device_id, payload in recording:
+            if kind == ENTRY_DEVICE:
+                return recording.devices[device_id][0]
+    return None
+
+
+def export_stream(path, format="csv", device=None, start=None, end=None):
+    """Generator of output bytes; ValueError/RuntimeError before the first chunk if invalid."""
+    if format not in FORMATS:
+        raise ValueError(f"unknown export format {format!r} (expected {', '.join(FORMATS)})")
+    if format == "fit":
+        return fit_stream(path, device, start, end)
+    # Open the recording now, as fit_stream does via first_device, so a missing
+    # or malformed file fails here rather than after the response has started
+    SessionRecording(path).close()
+    chunks = read_chunks(path, device, start, end)
+    if format == "parquet":
+        load_pyarrow()
+        return parquet_stream(chunks)
+    return csv_stream(chunks)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export a session recording")
+    parser.add_argument("recording", help="file written with --record")
+    parser.add_argument("--format", choices=list(FORMATS), default="csv")
+    parser.add_argument("--device", metavar="ADDR",
+                        help="only this device (FIT exports one device, by default the first)")
+    parser.add_argument("--from", dest="start", type=float, metavar="UNIX_TIME",
+                        help="first sample time")
+    parser.add_argument("--to", dest="end", type=float, metavar="UNIX_TIME", help="last sample time")
+    parser.add_argument("--output", "-o", metavar="FILE", help="output file (default: stdout)")
+    args = parser.parse_args(argv)
+    try:
+        stream = export_stream(args.recording, args.format, args.device, args.start, args.end)
+        output = open(args.output, "wb") if args.output else sys.stdout.buffer
+        try:
+            for data in stream:
+                output.write(data)
+        finally:
+            if args.output:
+                output.close()
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"Export failed: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""Streaming artifact rejection and smoothing for heart rate and RR intervals.
+
+A filter is described by a spec string of comma-separated stages, applied in
+order, e.g. ``"rr,median:5,kalman"``:
+
+``median[:WINDOW]``
+    Rolling median of the last WINDOW BPM values (removes single spikes and
+    dropouts). O(log w) search plus a small memmove per sample.
+``kalman[:PROCESS_NOISE[:MEASUREMENT_NOISE]]``
+    1-D Kalman smoother on BPM with a random-walk model. O(1).
+``rr[:TOLERANCE]``
+    Drops RR intervals outside a physiological range or deviating by more
+    than TOLERANCE (fraction) from the median of recent intervals, the usual
+    ectopic-beat criterion. O(log w).
+
+``none`` disables filtering and is the default, so ``heart_rate`` is the
+device's own value unless a filter is asked for. Every stage keeps a fixed
+amount of state.
+"""
+from bisect import bisect_left, insort
+from collections import deque
+
+from hr_parser import RR_TICKS_PER_SECOND
+
+DEFAULT_FILTER = "none"
+
+# Artifact rejection plus light smoothing, the usual opt-in chain
+SMOOTHING_FILTER = "rr,median:3,kalman"
+
+MEDIAN_WINDOW = 5
+
+# BPM^2 per sample; a larger process noise follows real changes faster
+KALMAN_PROCESS_NOISE = 1.0
+KALMAN_MEASUREMENT_NOISE = 4.0
+
+RR_TOLERANCE = 0.2
+RR_WINDOW = 9
+RR_MIN_MS = 300
+RR_MAX_MS = 2000
+
+
+class RollingMedian:
+    def __init__(self, window=MEDIAN_WINDOW):
+        if window < 1:
+            raise ValueError("median window must be at least 1")
+        self.window = int(window)
+        self._order = deque()
+        self._sorted = []
+
+    def update(self, value):
+        """Add ``value`` and return the median of the window."""
+        values = self._sorted
+        if len(self._order) == self.window:
+            del values[bisect_left(values, self._order.popleft())]
+        self._order.append(value)
+        insort(values, value)
+        n = len(values)
+        mid = n // 2
+        return values[mid] if n % 2 else (values[mid - 1] + values[mid]) / 2
+
+
+class KalmanSmoother:
+    def __init__(self, process_noise=KALMAN_PROCESS_NOISE,
+                 measurement_noise=KALMAN_MEASUREMENT_NOISE):
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self._estimate = None
+        self._variance = measurement_noise
+
+    def update(self, value):
+        if self._estimate is None:
+            self._estimate = float(value)
+            return self._estimate
+        variance = self._variance + self.process_noise
+        gain = variance / (variance + self.measurement_noise)
+        self._estimate += gain * (value - self._estimate)
+        self._variance = (1.0 - gain) * variance
+        return self._estimate
+
+
+class RrOutlierFilter:
+    """Rejects RR intervals (in ticks) that look like artifacts or ectopic beats.
+
+    Every in-range interval feeds the reference median, accepted or not, so a
+    genuine change in rhythm is followed after a few beats while isolated
+    outliers are dropped.
+    """
+
+    def __init__(self, tolerance=RR_TOLERANCE, window=RR_WINDOW,
+                 min_ms=RR_MIN_MS, max_ms=RR_MAX_MS):
+        self.tolerance = tolerance
+        self.min_ticks = min_ms * RR_TICKS_PER_SECOND // 1000
+        self.max_ticks = max_ms * RR_TICKS_PER_SECOND // 1000
+        self._median = RollingMedian(window)
+        self._reference = None
+        self.rejected = 0
+
+    def filter(self, rr_ticks):
+        """Return the accepted intervals from ``rr_ticks``."""
+        accepted = []
+        for rr in rr_ticks:
+            if not self.min_ticks <= rr <= self.max_ticks:
+                self.rejected += 1
+                continue
+            reference = self._reference
+            if reference is None or abs(rr - reference) <= self.tolerance * reference:
+                accepted.append(rr)
+            else:
+                self.rejected += 1
+            self._reference = self._median.update(rr)
+        return accepted
+
+
+BPM_STAGES = {
+    "median": (RollingMedian, (int,)),
+    "kalman": (KalmanSmoother, (float, float)),
+}
+RR_STAGES = {
+    "rr": (RrOutlierFilter, (float,)),
+}
+
+
+def _build_stage(text):
+    name, *params = text.strip().split(":")
+    factory, types = BPM_STAGES.get(name) or RR_STAGES.get(name) or (None, ())
+    if factory is None:
+        raise ValueError(f"unknown filter stage {name!r}")
+    if len(params) > len(types):
+        raise ValueError(f"too many parameters for {name!r}")
+    return name, factory(*(kind(value) for kind, value in zip(types, params)))
+
+
+class HeartRateFilter:
+    """Applies a filter spec to each notification's BPM and RR intervals."""
+
+    def __init__(self, spec=DEFAULT_FILTER):
+        self.spec = spec
+        self.bpm_stages = []
+        self.rr_stages = []
+        for text in spec.split(","):
+            if not text.strip() or text.strip() == "none":
+                continue
+            name, stage = _build_stage(text)
+            (self.rr_stages if name in RR_STAGES else self.bpm_stages).append(stage)
+
+    def process(self, heart_rate, rr_ticks):
+        """Return ``(filtered_bpm, accepted_rr_ticks)``."""
+        value = heart_rate
+        for stage in self.bpm_stages:
+            value = stage.update(value)
+        for stage in self.rr_stages:
+            rr_ticks = stage.filter(rr_ticks)
+        return int(round(value)), rr_ticks
+
+
+def parse_filter_spec(spec):
+    """Validate a filter spec (for argparse); returns it unchanged."""
+    HeartRateFilter(spec)
+    return spec
+
+
+def parse_device_filter(text):
+    """Parse ``ADDR=SPEC`` into ``(address, spec)``."""
+    address, sep, spec = text.partition("=")
+    if not sep or not address:
+        raise ValueError("expected ADDR=SPEC")
+    return address.upper(), parse_filter_spec(spec)
@@ -1,25 +1,151 @@
+import time
+
+# Process start, for the cold-start-to-first-sample measurement
+STARTED_AT = time.perf_counter()
+
+import sys
+
+if __name__ == "__main__" and sys.argv[1:2] == ["export"]:
+    # Offline export needs neither the API stack nor the overlay assets
+    from export import main as export_main
+    sys.exit(export_main(sys.argv[2:]))
+
+import argparse
 import asyncio
+import importlib
+import os
+import signal
 import threading
-import queue
-import tkinter as tk
-from tkinter import ttk, messagebox
-from bleak import BleakClient, BleakScanner
-import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import StreamingResponse
 import json
-import time
-from dataclasses import dataclass
-from typing import Optional
+from dataclasses import dataclass, field
+from functools import partial
+from typing import List, Optional
+from urllib.parse import urlsplit
+
+from alerts import FIRING, AlertDispatcher, AlertEngine, parse_alert_rule
+from broadcaster import HeartRateBroadcaster
+from classifier import classify_device
+from connection import CONNECTED, DeviceConnection
+from console_log import RateLimitedLogger
+from device_cache import DeviceCache
+from device_manager import DeviceManager
+from export import FORMATS as EXPORT_FORMATS, export_stream
+from gui_channel import GuiChannel
+from hr_history import HeartRateHistory
+from filters import (DEFAULT_FILTER, SMOOTHING_FILTER, HeartRateFilter, parse_device_filter,
+                     parse_filter_spec)
+from hr_parser import RR_TICKS_PER_SECOND, parse_hr_measurement, rr_ticks_to_ms
+from hrv import DEFAULT_ZONES, HRV_WINDOW, HrvEngine, parse_zones
+from metrics import (CONTENT_TYPE, DURATION_BUCKETS, Counter, CounterFunction, Gauge, Histogram,
+                     LatencyMiddleware, Registry)
+from overlay_config import (DEFAULT_OVERLAY_CONFIG, OverlayConfig, load_overlay_config,
+                            merge_overlay_config, save_overlay_config)
+from recorder import SessionRecorder, replay_recording
+from relay import RelayPublisher, RelaySubscriber, parse_relay_url
+from scanner import ContinuousScanner, has_hr_service, match_devices
+from snapshot import HeartRateSnapshot, SnapshotLog, etag_matches
+from static_assets import AssetStore
+from transport import HR_SERVICE_UUID, BleakTransport, SimulatedTransport, SimulationConfig
+from wire import BATCH_MEDIA_TYPE, SAMPLE_MEDIA_TYPE, pack_batch
+
+# Tk and the GUI widgets are bound by load_gui(), only when a window opens
+tk = ttk = messagebox = DeviceRow = VirtualDeviceList = LiveChart = None
 
 # UUID for the Heart Rate Measurement characteristic
 HR_MEASUREMENT_UUID = "00002a37-0000-1000-8000-00805f9b34fb"
-HR_SERVICE_UUID = "0000180d-0000-1000-8000-00805f9b34fb"
 
 # Global variables
-gui_queue = queue.Queue()
+gui_channel = GuiChannel()
+hr_log = RateLimitedLogger("Heart Rate: {} bpm")
+malformed_log = RateLimitedLogger("Ignoring malformed heart rate notification: {}")
 selected_device = None
+hr_broadcaster = HeartRateBroadcaster()
+hr_history = HeartRateHistory()
+hr_zones = DEFAULT_ZONES  # lower BPM bound of each heart rate zone
+default_filter_spec = DEFAULT_FILTER
+device_filter_specs = {}  # upper-case address -> filter spec
+session_recorder = None
+ble_transport = BleakTransport()
+discovered_devices = {}  # address -> BLEDevice from the last scan
+connection_stats = {}  # address -> ConnectionStats
+first_sample_seen = False
+api_server = None  # uvicorn.Server, once running on the shared loop
+api_server_future = None
+device_cache = DeviceCache()  # probe results, HR handles and the last primary device
+cli_device_addresses = []  # --device addresses
+api_host = "127.0.0.1"
+api_port = 8069
+relay_publishers = []  # RelayPublisher per --relay-to URL
+relay_subscriber = None  # RelaySubscriber with --relay-from
+alert_engine = None  # AlertEngine with --alert
+alert_dispatcher = None
+overlay_config = OverlayConfig(DEFAULT_OVERLAY_CONFIG)
+overlay_config_path = None  # --overlay-config file updates are saved to
+overlay_broadcaster = HeartRateBroadcaster()  # pushes OverlayConfig to open overlays
+
+# Metrics exported at /metrics
+metrics_registry = Registry()
+notifications_total = metrics_registry.register(Counter(
+    "hr_notifications_total", "Heart rate notifications received", ["device"]))
+malformed_notifications_total = metrics_registry.register(Counter(
+    "hr_malformed_notifications_total", "Heart rate notifications that failed to parse"))
+connect_seconds = metrics_registry.register(Histogram(
+    "hr_ble_connect_seconds", "Time from connection attempt to subscribed",
+    buckets=DURATION_BUCKETS))
+reconnect_seconds = metrics_registry.register(Histogram(
+    "hr_ble_reconnect_seconds", "Time from connection drop to subscribed again",
+    buckets=DURATION_BUCKETS))
+scan_seconds = metrics_registry.register(Histogram(
+    "hr_scan_seconds", "Duration of BLE scans", buckets=DURATION_BUCKETS))
+delivery_seconds = metrics_registry.register(Histogram(
+    "hr_delivery_latency_seconds",
+    "Time from notification received to sent to a WebSocket/SSE client", ["transport"]))
+api_latency_seconds = metrics_registry.register(Histogram(
+    "hr_api_request_seconds", "HTTP request latency until the response starts",
+    ["method", "route"]))
+metrics_registry.register(Gauge(
+    "hr_gui_queue_depth", "Undelivered GUI updates", lambda: gui_channel.depth))
+metrics_registry.register(Gauge(
+    "hr_push_clients", "Connected WebSocket/SSE clients", lambda: hr_broadcaster.client_count))
+metrics_registry.register(CounterFunction(
+    "hr_relay_frames_sent_total", "Relay frames sent to subscribers",
+    lambda: sum(publisher.sent for publisher in relay_publishers)))
+metrics_registry.register(CounterFunction(
+    "hr_relay_frames_dropped_total", "Relay frames not sent (send error or slow TCP subscriber)",
+    lambda: sum(publisher.dropped for publisher in relay_publishers)))
+metrics_registry.register(CounterFunction(
+    "hr_relay_frames_received_total", "Relay frames received from publishers",
+    lambda: relay_subscriber.frames if relay_subscriber is not None else 0))
+metrics_registry.register(CounterFunction(
+    "hr_relay_frames_lost_total", "Relay frames missing from the sequence numbers received",
+    lambda: relay_subscriber.lost if relay_subscriber is not None else 0))
+metrics_registry.register(Gauge(
+    "hr_alerts_active", "Alert rules currently firing",
+    lambda: len(alert_engine.active) if alert_engine is not None else 0))
+metrics_registry.register(Gauge(
+    "hr_alert_events_dropped", "Alert events dropped while delivery was backed up",
+    lambda: alert_dispatcher.dropped if alert_dispatcher is not None else 0))
+
+# Seconds a device scan keeps streaming results
+SCAN_DURATION = 10.0
+
+# Simultaneous connections when probing many devices (BlueZ adapters
+# typically handle only a few concurrent connects)
+PROBE_CONCURRENCY = 3
+
+# Milliseconds to wait for filter controls to settle before refiltering
+FILTER_DEBOUNCE_MS = 150
+
+# Seconds between SSE keep-alive comments when no samples arrive
+SSE_KEEPALIVE = 15.0
+
+# History query defaults and limits
+DEFAULT_HISTORY_WINDOW = 3600.0
+DEFAULT_HISTORY_BUCKETS = 300
+MAX_HISTORY_BUCKETS = 5000
 
 @dataclass
 class HeartRateData:
@@ -28,8 +154,19 @@ class HeartRateData:
     device_name: str
     device_address: str
     is_connected: bool
+    rr_intervals: List[float] = field(default_factory=list)
+    sensor_contact: Optional[bool] = None
+    energy_expended: Optional[int] = None
+    # Unfiltered values as reported by the device
+    heart_rate_raw: int = 0
+    rr_intervals_raw: List[float] = field(default_factory=list)
+    signal_filter: Optional[HeartRateFilter] = field(default=None, repr=False, compare=False)
+    hrv: HrvEngine = field(default_factory=lambda: HrvEngine(zones=hr_zones),
+                           repr=False, compare=False)
+    # Latest immutable snapshot; the only part of the state API readers touch
+    snapshot: Optional[HeartRateSnapshot] = field(default=None, repr=False, compare=False)
 
-# Global heart rate data store
+# Global heart rate data store (the primary device shown by the GUI and overlays)
 current_hr_data = HeartRateData(
     heart_rate=0,
     timestamp=time.time(),
@@ -38,157 +175,692 @@ current_hr_data = HeartRateData(
     is_connected=False
 )
 
+def state_payload(state):
+    """Fields of a device state that go into its snapshot."""
+    return {
+        "heart_rate": state.heart_rate,
+        "timestamp": state.timestamp,
+        "device_name": state.device_name,
+        "device_address": state.device_address,
+        "is_connected": state.is_connected,
+        "rr_intervals": state.rr_intervals,
+        "heart_rate_raw": state.heart_rate_raw,
+        "rr_intervals_raw": state.rr_intervals_raw,
+        "sensor_contact": state.sensor_contact,
+        "energy_expended": state.energy_expended,
+        "hrv": state.hrv.summary()
+    }
+
+# Recent snapshots of all devices, for /api/samples?since=N
+snapshot_log = SnapshotLog()
+
+def publish_state(state):
+    """Serialize ``state`` into a new snapshot and swap it in."""
+    snapshot = HeartRateSnapshot(state_payload(state))
+    state.snapshot = snapshot
+    snapshot_log.append(snapshot)
+    for publisher in relay_publishers:
+        publisher.send(snapshot, state is current_hr_data)
+    return snapshot
+
+publish_state(current_hr_data)
+
+# Per-device state keyed by address; the primary device maps to current_hr_data
+device_states = {}
+
+def build_signal_filter(device_address):
+    """Fresh filter for a device from --device-filter, else --filter."""
+    spec = device_filter_specs.get(device_address.upper(), default_filter_spec)
+    signal_filter = HeartRateFilter(spec)
+    return signal_filter if signal_filter.bpm_stages or signal_filter.rr_stages else None
+
+def get_device_state(device_address, device_name, primary=False):
+    """Get or create the state for a device."""
+    if primary:
+        # Re-point the primary slot at this device
+        for address, state in list(device_states.items()):
+            if state is current_hr_data and address != device_address:
+                del device_states[address]
+        if current_hr_data.device_address != device_address:
+            current_hr_data.hrv = HrvEngine(zones=hr_zones)
+            current_hr_data.signal_filter = build_signal_filter(device_address)
+        current_hr_data.device_address = device_address
+        current_hr_data.device_name = device_name
+        device_states[device_address] = current_hr_data
+        publish_state(current_hr_data)
+        return current_hr_data
+    state = device_states.get(device_address)
+    if state is None:
+        state = HeartRateData(
+            heart_rate=0,
+            timestamp=time.time(),
+            device_name=device_name,
+            device_address=device_address,
+            is_connected=False,
+            signal_filter=build_signal_filter(device_address)
+        )
+        publish_state(state)
+        device_states[device_address] = state
+    return state
+
 # FastAPI app
 app = FastAPI(title="Heart Rate Monitor API")
 
+# Overlays on other origins may read; changes (PUT) are same-origin only
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
+    allow_methods=["GET", "HEAD"],
     allow_headers=["*"],
 )
 
-# Serve static files
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.add_middleware(LatencyMiddleware, histogram=api_latency_seconds)
+
+# Overlay assets, read and precompressed once
+asset_store = AssetStore("static")
+
+@app.api_route("/static/{path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def get_static(path: str, request: Request):
+    asset = asset_store.get(path)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    status, body, headers = asset.response(request.query_params.get("v"),
+                                           request.headers.get("accept-encoding"),
+                                           request.headers.get("if-none-match"))
+    return Response(content=body, status_code=status, media_type=asset.media_type,
+                    headers=headers)
+
+def wants_binary(request, media_type):
+    """Content negotiation: the binary ``wire`` format via Accept or ?format=binary."""
+    return (request.query_params.get("format") == "binary"
+            or media_type in request.headers.get("accept", ""))
+
+def snapshot_response(request, snapshot):
+    """Serve a snapshot's cached JSON or binary record, or 304 if the client already has it."""
+    binary = wants_binary(request, SAMPLE_MEDIA_TYPE)
+    etag = f'"{snapshot.seq}.bin"' if binary else snapshot.etag
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if binary:
+        return Response(content=snapshot.packed, media_type=SAMPLE_MEDIA_TYPE, headers=headers)
+    return Response(content=snapshot.body(time.time()), media_type="application/json",
+                    headers=headers)
+
+def publish_heart_rate(received_ns=None):
+    """Snapshot the primary device and push it to all WebSocket/SSE clients.
+
+    ``received_ns`` is the ``time.perf_counter_ns()`` at which the triggering
+    notification arrived, for delivery latency metrics.
+    """
+    snapshot = publish_state(current_hr_data)
+    if hr_broadcaster.client_count:
+        hr_broadcaster.publish_message(snapshot, received_ns)
 
 @app.get("/api/heartrate")
-def get_heart_rate():
-    """Get current heart rate data as JSON"""
+async def get_heart_rate(request: Request):
+    """Get current heart rate data as JSON (supports If-None-Match)"""
+    return snapshot_response(request, current_hr_data.snapshot)
+
+@app.get("/api/heartrate/history")
+def get_heart_rate_history(since: Optional[float] = None,
+                           until: Optional[float] = None,
+                           resolution: Optional[float] = None):
+    """Get min/max/mean heart rate buckets between two Unix timestamps."""
+    if until is None:
+        until = time.time()
+    if since is None:
+        since = until - DEFAULT_HISTORY_WINDOW
+    if since >= until:
+        raise HTTPException(status_code=400, detail="'since' must be before 'until'")
+    if resolution is None:
+        resolution = (until - since) / DEFAULT_HISTORY_BUCKETS
+        if resolution >= 1:
+            # Whole seconds line up with the aggregate levels
+            resolution = float(round(resolution))
+    if resolution <= 0 or (until - since) / resolution > MAX_HISTORY_BUCKETS:
+        raise HTTPException(status_code=400,
+                            detail=f"Resolution must yield at most {MAX_HISTORY_BUCKETS} buckets")
     return {
-        "heart_rate": current_hr_data.heart_rate,
-        "timestamp": current_hr_data.timestamp,
-        "device_name": current_hr_data.device_name,
-        "device_address": current_hr_data.device_address,
-        "is_connected": current_hr_data.is_connected,
-        "last_update": time.time() - current_hr_data.timestamp
+        "since": since,
+        "until": until,
+        "resolution": resolution,
+        "buckets": hr_history.downsample(since, until, resolution)
     }
 
+@app.websocket("/ws/heartrate")
+async def heart_rate_websocket(websocket: WebSocket, rate: float = 0.0, format: str = "json"):
+    """Push every heart rate sample; ``rate`` caps messages per second.
+    
+    ``format=binary`` sends ``wire`` sample records as binary frames.
+    """
+    await websocket.accept()
+    sub = hr_broadcaster.subscribe(rate)
+
+    async def send_samples():
+        if format == "binary":
+            await websocket.send_bytes(current_hr_data.snapshot.packed)
+        else:
+            await websocket.send_text(current_hr_data.snapshot.text(time.time()))
+        while True:
+            snapshot = await sub.get()
+            if format == "binary":
+                await websocket.send_bytes(snapshot.packed)
+            else:
+                await websocket.send_text(snapshot.message)
+            delivery_seconds.labels("websocket").observe_ns(time.perf_counter_ns() - sub.published_ns)
+
+    async def wait_for_disconnect():
+        # Clients never send anything we use, but reading is the only way to
+        # notice a close while no samples are flowing
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    tasks = {asyncio.create_task(send_samples()), asyncio.create_task(wait_for_disconnect())}
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if error is not None and not isinstance(error, WebSocketDisconnect):
+                raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+        hr_broadcaster.unsubscribe(sub)
+
+@app.get("/api/heartrate/stream")
+async def heart_rate_stream(rate: float = 0.0):
+    """Server-Sent Events stream of heart rate samples; ``rate`` caps events per second."""
+    async def event_stream():
+        sub = hr_broadcaster.subscribe(rate)
+        try:
+            yield f"data: {current_hr_data.snapshot.text(time.time())}\n\n"
+            while True:
+                try:
+                    snapshot = await asyncio.wait_for(sub.get(), SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {snapshot.message}\n\n"
+                delivery_seconds.labels("sse").observe_ns(time.perf_counter_ns() - sub.published_ns)
+        finally:
+            hr_broadcaster.unsubscribe(sub)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/api/overlay-config")
+async def get_overlay_config(request: Request):
+    """Overlay settings (supports If-None-Match)"""
+    config = overlay_config
+    headers = {"ETag": config.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), config.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=config.body, media_type="application/json", headers=headers)
+
+def same_origin(request):
+    """False for browser requests sent by a page from another origin.
+
+    Browsers always send Origin with PUT; clients without one (curl, scripts)
+    are local tools and allowed.
+    """
+    origin = request.headers.get("origin")
+    return origin is None or urlsplit(origin).netloc == request.headers.get("host")
+
+@app.put("/api/overlay-config")
+async def update_overlay_config(request: Request):
+    """Change some overlay settings and push them to every open overlay"""
+    if not same_origin(request):
+        raise HTTPException(status_code=403, detail="Cross-origin changes are not allowed")
+    try:
+        data = merge_overlay_config(overlay_config.data, await request.json())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    config = set_overlay_config(data)
+    return Response(content=config.body, media_type="application/json",
+                    headers={"ETag": config.etag, "Cache-Control": "no-cache"})
+
+@app.get("/api/overlay-config/stream")
+async def overlay_config_stream():
+    """Server-Sent Events with the overlay settings, sent again whenever they change"""
+    async def event_stream():
+        sub = overlay_broadcaster.subscribe()
+        try:
+            yield f"data: {overlay_config.message}\n\n"
+            while True:
+                try:
+                    config = await asyncio.wait_for(sub.get(), SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {config.message}\n\n"
+        finally:
+            overlay_broadcaster.unsubscribe(sub)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def set_overlay_config(data):
+    """Swap in new overlay settings, save them and notify open overlays."""
+    global overlay_config
+    config = overlay_config = OverlayConfig(data)
+    if overlay_config_path is not None:
+        save_overlay_config(overlay_config_path, config.data)
+    overlay_broadcaster.publish_message(config)
+    return config
+
+@app.get("/api/samples")
+async def get_samples(request: Request, since: int = 0):
+    """Every device's samples with sequence numbers after ``since`` (JSON or binary batch).
+    
+    Pass the returned ``seq`` as the next ``since``; ``truncated`` means
+    samples between the two were already dropped from the log.
+    """
+    latest, snapshots, truncated = snapshot_log.since(since)
+    if wants_binary(request, BATCH_MEDIA_TYPE):
+        return Response(content=pack_batch(latest, snapshots, truncated), media_type=BATCH_MEDIA_TYPE)
+    now = time.time()
+    body = b"".join([
+        b'{"seq":%d,"truncated":%s,"samples":[' % (latest, b"true" if truncated else b"false"),
+        b",".join(snapshot.body(now) for snapshot in snapshots),
+        b"]}",
+    ])
+    return Response(content=body, media_type="application/json")
+
+@app.get("/api/devices")
+def get_devices():
+    """List every monitored device with its latest reading"""
+    now = time.time()
+    devices = []
+    for address, state in list(device_states.items()):
+        data = state.snapshot.data
+        devices.append({
+            "device_address": address,
+            "device_name": data["device_name"],
+            "heart_rate": data["heart_rate"],
+            "is_connected": data["is_connected"],
+            "last_update": now - data["timestamp"],
+            "primary": state is current_hr_data,
+            "filter": state.signal_filter.spec if state.signal_filter is not None else "none",
+            "connection": connection_stats[address].as_dict() if address in connection_stats else None
+        })
+    return devices
+
+@app.get("/api/hrv")
+def get_hrv():
+    """HRV and time-in-zone for every monitored device"""
+    return {
+        "window": HRV_WINDOW,
+        "zones": hr_zones,
+        "devices": {address: state.snapshot.data["hrv"] for address, state in list(device_states.items())}
+    }
+
+@app.get("/api/export")
+def export_session(device: Optional[str] = None, start: Optional[float] = Query(None, alias="from"),
+                   end: Optional[float] = Query(None, alias="to"), format: str = "csv"):
+    """Stream the current --record session as CSV, Parquet or FIT (``from``/``to`` in Unix time)"""
+    if session_recorder is None:
+        raise HTTPException(status_code=404, detail="Not recording; start with --record FILE")
+    try:
+        stream = export_stream(session_recorder.path, format, device, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except OSError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    media_type, extension = EXPORT_FORMATS[format]
+    return StreamingResponse(stream, media_type=media_type, headers={
+        "Content-Disposition": f'attachment; filename="session.{extension}"'})
+
+@app.get("/api/alerts")
+def get_alerts():
+    """Alert rules and the alerts currently firing"""
+    if alert_engine is None:
+        return {"rules": [], "active": []}
+    return {
+        "rules": [rule.spec for rule in alert_engine.rules],
+        "active": list(alert_engine.active.values())
+    }
+
+@app.get("/api/heartrate/{device_address}")
+async def get_device_heart_rate(device_address: str, request: Request):
+    """Get current heart rate data for one device (supports If-None-Match)"""
+    state = device_states.get(device_address)
+    if state is None:
+        raise HTTPException(status_code=404, detail=f"Unknown device {device_address}")
+    return snapshot_response(request, state.snapshot)
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus text exposition of the monitor's metrics"""
+    return Response(content=metrics_registry.render(), media_type=CONTENT_TYPE)
+
 @app.get("/api/status")
 def get_status():
     """Get connection status"""
+    data = current_hr_data.snapshot.data
+    stats = connection_stats.get(data["device_address"])
     return {
-        "is_connected": current_hr_data.is_connected,
-        "device_name": current_hr_data.device_name,
-        "last_heartbeat": time.time() - current_hr_data.timestamp
+        "is_connected": data["is_connected"],
+        "device_name": data["device_name"],
+        "last_heartbeat": time.time() - data["timestamp"],
+        "connection": stats.as_dict() if stats is not None else None
     }
 
-def hr_measurement_handler(sender: int, data: bytearray):
-    """Notification callback for heart rate measurement."""
-    global current_hr_data
+def hr_measurement_handler(sender: int, data: bytearray, state: Optional[HeartRateData] = None,
+                           counter: Optional[Counter] = None):
+    """Notification callback for heart rate measurement.
     
-    flag = data[0]
-    if flag & 1 == 0:
-        heart_rate = data[1]
-    else:
-        heart_rate = int.from_bytes(data[1:3], byteorder="little")
-    
-    # Update global data
-    current_hr_data.heart_rate = heart_rate
-    current_hr_data.timestamp = time.time()
-    current_hr_data.is_connected = True
-    
-    gui_queue.put(heart_rate)
-    print(f"Heart Rate: {heart_rate} bpm")
-
-def get_device_type_hint(address, name, services):
-    """Try to guess device type based on MAC address patterns and services."""
-    address_upper = address.upper()
-    hints = []
-    
-    # Common manufacturer MAC patterns
-    mac_patterns = {
-        "APPLE": ["4C:", "8C:", "F0:", "3C:", "A4:", "BC:"],
-        "SAMSUNG": ["C8:", "E8:", "CC:", "78:", "EC:"],
-        "GARMIN": ["88:", "C4:", "00:", "A4:", "14:"],
-        "POLAR": ["A0:", "00:", "B8:"],
-        "FITBIT": ["FC:", "FB:", "2C:"],
-        "SUUNTO": ["00:", "B4:"],
-        "AMAZFIT": ["C8:", "A4:", "E8:"],
-        "WAHOO": ["90:", "58:"],
-    }
+    ``counter`` is the device's ``hr_notifications_total`` child, looked up once
+    by the caller to keep label resolution off the hot path.
+    """
+    received_ns = time.perf_counter_ns()
     
-    for manufacturer, prefixes in mac_patterns.items():
-        if any(address_upper.startswith(prefix) for prefix in prefixes):
-            hints.append(f"{manufacturer}")
-    
-    # Check for heart rate service
-    if services:
-        service_uuids = [str(uuid).lower() for uuid in services]
-        if HR_SERVICE_UUID.lower() in service_uuids or "180d" in service_uuids:
-            hints.append("❤️ HR")
-        if "180f" in service_uuids:
-            hints.append("🔋 BAT")
-    
-    return " | ".join(hints) if hints else "Unknown"
-
-async def scan_for_devices_fast():
-    """Fast scan for available BLE devices."""
-    print("Quick scanning for BLE devices...")
-    # Reduced timeout for faster scanning
-    devices = await BleakScanner.discover(timeout=3.0, return_adv=True)
-    return devices
+    if state is None:
+        state = current_hr_data
+    
+    try:
+        measurement = parse_hr_measurement(data)
+    except ValueError as e:
+        malformed_notifications_total.inc()
+        malformed_log.update(e)
+        return
+    if counter is None:
+        counter = notifications_total.labels(state.device_address)
+    counter.inc()
+    heart_rate, rr_intervals = measurement.heart_rate, measurement.rr_intervals
+    if state.signal_filter is not None:
+        heart_rate, rr_intervals = state.signal_filter.process(heart_rate, rr_intervals)
+    
+    state.heart_rate_raw = measurement.heart_rate
+    state.rr_intervals_raw = measurement.rr_intervals_ms
+    record_sample(state, heart_rate, rr_intervals, measurement.sensor_contact,
+                  measurement.energy_expended, received_ns)
+
+def record_sample(state, heart_rate, rr_intervals, sensor_contact, energy_expended,
+                  received_ns=None):
+    """Store a filtered reading (RR in ticks) and notify every consumer."""
+    global first_sample_seen
+    state.heart_rate = heart_rate
+    state.timestamp = time.time()
+    state.rr_intervals = rr_ticks_to_ms(rr_intervals)
+    state.sensor_contact = sensor_contact
+    state.energy_expended = energy_expended
+    state.is_connected = True
+    state.hrv.add_sample(state.timestamp, heart_rate, rr_intervals)
+    if alert_engine is not None:
+        alert_engine.on_sample(state.device_address, state.device_name, state.timestamp, heart_rate,
+                               len(rr_intervals), max(0, len(state.rr_intervals_raw) - len(rr_intervals)))
+    if state is not current_hr_data:
+        publish_state(state)
+        return
+    
+    hr_history.append(current_hr_data.timestamp, heart_rate)
+    publish_heart_rate(received_ns)
+    gui_channel.put_heart_rate(heart_rate)
+    hr_log.update(heart_rate)
+    if not first_sample_seen:
+        first_sample_seen = True
+        print(f"First heart rate sample {time.perf_counter() - STARTED_AT:.2f}s after start")
+
+# Publisher timestamp of the last relayed reading per device, to tell new
+# readings from connection state changes
+relay_timestamps = {}
 
-async def test_heart_rate_connection(device_address):
-    """Test if a device supports heart rate monitoring."""
+def apply_relay_sample(device_address, device_name, primary, sample):
+    """Feed a sample from a relay publisher into the local device state.
+
+    The publisher has already filtered it, so it bypasses the signal filter;
+    the unfiltered RR intervals travel alongside for ``rr_intervals_raw`` and
+    artifact alerts. Timestamps are taken from the local clock like any other
+    reading.
+    """
+    state = device_states.get(device_address)
+    if state is None or (primary and state is not current_hr_data):
+        state = get_device_state(device_address, device_name, primary)
+        state.signal_filter = None
+    new_reading = sample["timestamp"] != relay_timestamps.get(device_address)
+    relay_timestamps[device_address] = sample["timestamp"]
+    if not (new_reading and sample["is_connected"]):
+        # Connection state change only
+        if state.is_connected != sample["is_connected"]:
+            state.is_connected = sample["is_connected"]
+            if state is current_hr_data:
+                publish_heart_rate()
+            else:
+                publish_state(state)
+        return
+    state.heart_rate_raw = sample["heart_rate_raw"]
+    rr_ticks = [round(ms * RR_TICKS_PER_SECOND / 1000) for ms in sample["rr_intervals"]]
+    state.rr_intervals_raw = sample["rr_intervals_raw"]
+    record_sample(state, sample["heart_rate"], rr_ticks, sample["sensor_contact"],
+                  sample["energy_expended"], time.perf_counter_ns())
+
+def get_device_type_hint(address, name, services, manufacturer_data=None):
+    """Guess device type from manufacturer data, OUI/MAC prefix and services."""
+    return classify_device(address, services, manufacturer_data)
+
+async def scan_for_devices_fast(on_deltas=None, stop_when=None, timeout=SCAN_DURATION):
+    """Continuously scan for BLE devices, reporting new or changed devices as they appear.
+    
+    Stops after ``timeout`` seconds or as soon as ``stop_when(address, device, adv)``
+    matches. Returns ``{address: (device, adv)}`` like ``BleakScanner.discover``.
+    """
+    print("Scanning for BLE devices...")
+    
+    def deltas(changes):
+        # Keep the BLEDevice objects so connects can skip discovery
+        for address, (ble_device, adv_data) in changes.items():
+            discovered_devices[address] = ble_device
+        if on_deltas is not None:
+            on_deltas(changes)
+    
+    scanner = ContinuousScanner(ble_transport, deltas, stop_when)
+    started = time.monotonic()
+    try:
+        await scanner.run(timeout)
+    finally:
+        scan_seconds.observe(time.monotonic() - started)
+    return scanner.devices
+
+def find_hr_measurement_handle(services):
+    """Handle of the Heart Rate Measurement characteristic, or None."""
+    for service in services:
+        if service.uuid.lower() != HR_SERVICE_UUID:
+            continue
+        for characteristic in getattr(service, "characteristics", ()):
+            if characteristic.uuid.lower() == HR_MEASUREMENT_UUID:
+                return characteristic.handle
+    return None
+
+def hr_notify_target(client, device_address):
+    """What to pass to start_notify: the cached characteristic if its handle is
+    still Heart Rate Measurement, otherwise the UUID. Returns ``(target, handle)``."""
+    services = client.services
+    handle = device_cache.hr_handle(device_address)
+    if handle is not None and hasattr(services, "get_characteristic"):
+        characteristic = services.get_characteristic(handle)
+        if characteristic is not None and characteristic.uuid.lower() == HR_MEASUREMENT_UUID:
+            return characteristic, handle
+    return HR_MEASUREMENT_UUID, find_hr_measurement_handle(services)
+
+async def test_heart_rate_connection(device_address, save=True):
+    """Test if a device supports heart rate monitoring; the result goes to the device cache."""
+    target = discovered_devices.get(device_address, device_address)
     try:
-        async with BleakClient(device_address, timeout=5.0) as client:
+        async with ble_transport.client(target, timeout=5.0) as client:
             if client.is_connected:
                 services = client.services
                 for service in services:
-                    if service.uuid.lower() == HR_SERVICE_UUID.lower():
+                    if service.uuid.lower() == HR_SERVICE_UUID:
+                        device_cache.record_probe(device_address, True,
+                                                  find_hr_measurement_handle(services), save)
                         return True, "✅ HR Service Found!"
+                device_cache.record_probe(device_address, False, save=save)
                 return False, "❌ No HR Service"
             else:
                 return False, "❌ Connection Failed"
     except Exception as e:
         return False, f"❌ Error: {str(e)[:30]}..."
 
-async def run_client(device_address, device_name):
-    """Async function that connects to the device and subscribes to heart rate notifications."""
-    global current_hr_data
+async def probe_devices(addresses, on_result=None, concurrency=PROBE_CONCURRENCY):
+    """Test many devices for the HR service, at most ``concurrency`` at a time.
+    
+    ``on_result(address, success, message)`` is called as each probe finishes.
+    Returns ``{address: (success, message)}``.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def probe(address):
+        async with semaphore:
+            result = await test_heart_rate_connection(address, save=False)
+        if on_result is not None:
+            on_result(address, *result)
+        return address, result
     
     try:
-        async with BleakClient(device_address, timeout=10.0) as client:
-            if client.is_connected:
-                print(f"Connected to {device_address}")
-                current_hr_data.device_name = device_name
-                current_hr_data.device_address = device_address
-                current_hr_data.is_connected = True
-                
-                try:
-                    await client.start_notify(HR_MEASUREMENT_UUID, hr_measurement_handler)
-                    print("Subscribed to Heart Rate notifications...")
-                    
-                    while client.is_connected:
-                        await asyncio.sleep(1)
-                        
-                except Exception as e:
-                    gui_queue.put(f"Error: {str(e)}")
-                    print(f"Failed to subscribe to heart rate notifications: {e}")
-                    current_hr_data.is_connected = False
-            else:
-                print("Failed to connect.")
-                gui_queue.put("Connection failed")
-                current_hr_data.is_connected = False
-    except Exception as e:
-        print(f"An error occurred: {e}")
-        gui_queue.put(f"Error: {str(e)}")
-        current_hr_data.is_connected = False
+        return dict(await asyncio.gather(*(probe(address) for address in addresses)))
+    finally:
+        device_cache.save()
 
-def start_ble_loop(device_address, device_name):
-    """Starts the asyncio loop for Bleak in a separate thread."""
-    asyncio.run(run_client(device_address, device_name))
+async def run_client(device_address, device_name, primary=False):
+    """Async function that connects to the device, subscribes to heart rate notifications
+    and reconnects with backoff whenever the connection drops."""
+    state = get_device_state(device_address, device_name, primary)
+    if alert_engine is not None:
+        alert_engine.watch_device(device_address, device_name)
+    
+    handler = partial(hr_measurement_handler, state=state,
+                      counter=notifications_total.labels(device_address))
+    callback = handler
+    if session_recorder is not None:
+        device_id = session_recorder.add_device(device_address, device_name)
 
-def start_fastapi_server():
-    """Start FastAPI server in a separate thread."""
-    def run_server():
-        uvicorn.run(app, host="127.0.0.1", port=8069, log_level="info")
+        def callback(sender, data):
+            session_recorder.record(device_id, data)
+            handler(sender, data)
+    
+    hr_handle = None
+    
+    async def subscribe(client):
+        nonlocal hr_handle
+        notify_target, hr_handle = hr_notify_target(client, device_address)
+        await client.start_notify(notify_target, callback)
+        print(f"Subscribed to Heart Rate notifications from {device_name}...")
     
-    server_thread = threading.Thread(target=run_server, daemon=True)
-    server_thread.start()
-    print("FastAPI server starting at http://127.0.0.1:8069")
-    print("Access here: http://127.0.0.1:8069/static/obs_display.html")
+    def on_state(stats, message):
+        state.is_connected = stats.state == CONNECTED
+        if stats.state == CONNECTED:
+            print(f"Connected to {device_address}")
+            connect_seconds.observe(stats.last_connect_duration)
+            if stats.last_reconnect_duration is not None:
+                reconnect_seconds.observe(stats.last_reconnect_duration)
+            if alert_engine is not None:
+                alert_engine.watch_device(device_address, device_name)
+            device_cache.record_connected(device_address, device_name, hr_handle,
+                                          primary=state is current_hr_data)
+        if message:
+            print(f"[{device_name}] {message}")
+        if state is current_hr_data:
+            if message:
+                gui_channel.put_event(message)
+            publish_heart_rate()
+        else:
+            publish_state(state)
+    
+    # Reuse the scanned BLEDevice so reconnects do not pay for discovery
+    target = discovered_devices.get(device_address, device_address)
+    connection = DeviceConnection(ble_transport, target, subscribe, on_state, timeout=10.0)
+    connection_stats[device_address] = connection.stats
+    await connection.run()
+
+def known_device_addresses():
+    """The remembered primary device and any --device addresses, for ending scans early."""
+    addresses = list(cli_device_addresses)
+    if device_cache.last_device is not None:
+        addresses.append(device_cache.last_device[0])
+    return addresses
+
+async def find_heart_rate_device(timeout=None):
+    """Scan until a known device or any device advertising the Heart Rate service
+    shows up; returns ``(address, name)``."""
+    scanner = ContinuousScanner(ble_transport, stop_when=match_devices(known_device_addresses()))
+    address = await scanner.run(timeout)
+    if address is None:
+        return None
+    ble_device, adv_data = scanner.devices[address]
+    discovered_devices[address] = ble_device
+    return address, adv_data.local_name or ble_device.name or address
+
+# BLE connections, scans and the API server all share one event loop
+device_manager = DeviceManager(run_client)
+
+async def run_replay(path, speed):
+    """Drive hr_measurement_handler from a recording instead of a device."""
+    states = {}
+
+    def on_device(device_id, address, name):
+        if device_id in states:
+            # An appended session restarts its device ids; start over like the replay timeline
+            for state in states.values():
+                state.is_connected = False
+                publish_state(state)
+            states.clear()
+        # The first device of each session drives the overlays
+        states[device_id] = get_device_state(address, f"{name} (replay)", primary=not states)
+
+    def handler(device_id, data):
+        hr_measurement_handler(device_id, data, states.get(device_id))
+
+    print(f"Replaying {path} at {speed}x..." if speed > 0 else f"Replaying {path} as fast as possible...")
+    count = await replay_recording(path, handler, speed, on_device)
+    for state in states.values():
+        state.is_connected = False
+        publish_state(state)
+    publish_heart_rate()
+    print(f"Replay finished: {count} notifications")
+
+async def serve_api():
+    """Run uvicorn as a task on the shared event loop."""
+    global api_server
+    # Import in a worker thread so BLE tasks on the loop are not held up
+    uvicorn = await asyncio.get_running_loop().run_in_executor(
+        None, importlib.import_module, "uvicorn")
+    api_server = uvicorn.Server(uvicorn.Config(app, host=api_host, port=api_port, log_level="info"))
+    try:
+        await api_server.serve()
+    except asyncio.CancelledError:
+        raise
+    except (Exception, SystemExit) as e:
+        # uvicorn calls sys.exit() when it cannot bind; that must not take the
+        # shared loop (and every BLE connection on it) down with it
+        print(f"API server on http://{api_host}:{api_port} stopped: {e!r}")
+
+def start_fastapi_server():
+    """Start the FastAPI server on the shared event loop (once)."""
+    global api_server_future
+    if api_server_future is not None:
+        return
+    api_server_future = device_manager.run(serve_api())
+    print(f"FastAPI server starting at http://{api_host}:{api_port}")
+    print(f"Access here: http://{api_host}:{api_port}/static/obs_display.html")
+
+def stop_fastapi_server(timeout=5.0):
+    """Ask uvicorn to shut down and wait for it."""
+    if api_server is not None:
+        api_server.should_exit = True
+    if api_server_future is not None:
+        try:
+            api_server_future.result(timeout)
+        except Exception as e:
+            print(f"API server did not stop cleanly: {e!r}")
 
 class ModernDeviceSelectionWindow:
     def __init__(self):
@@ -203,6 +875,10 @@ class ModernDeviceSelectionWindow:
         
         self.devices = []
         self.selected_device = None
+        self.all_devices = {}
+        self._rows = {}  # address -> DeviceRow, rebuilt only when a device changes
+        self._scan_future = None
+        self._filter_job = None
         
         self.create_modern_widgets()
         self.scan_devices()
@@ -237,7 +913,7 @@ class ModernDeviceSelectionWindow:
         self.show_only_hr = tk.BooleanVar()
         hr_checkbox = tk.Checkbutton(filter_frame, text="❤️ Only HR devices",
                                     variable=self.show_only_hr, 
-                                    command=self.apply_filters,
+                                    command=self.schedule_filters,
                                     bg="#34495e", fg="#ecf0f1",
                                     selectcolor="#e74c3c",
                                     font=("Helvetica", 10))
@@ -253,7 +929,7 @@ class ModernDeviceSelectionWindow:
         self.min_rssi = tk.IntVar(value=-75)
         rssi_scale = tk.Scale(signal_frame, from_=-100, to=-30, 
                              orient=tk.HORIZONTAL, variable=self.min_rssi,
-                             command=lambda x: self.apply_filters(),
+                             command=lambda x: self.schedule_filters(),
                              bg="#34495e", fg="#ecf0f1", 
                              highlightbackground="#34495e")
         rssi_scale.pack(side=tk.LEFT, padx=10)
@@ -269,6 +945,23 @@ class ModernDeviceSelectionWindow:
                                relief=tk.FLAT, padx=20, pady=8)
         refresh_btn.pack(side=tk.LEFT, padx=5)
         
+        probe_btn = tk.Button(btn_frame, text="🧪 Probe All", 
+                             command=self.probe_all_devices,
+                             font=("Helvetica", 11, "bold"), 
+                             bg="#8e44ad", fg="white",
+                             relief=tk.FLAT, padx=20, pady=8)
+        probe_btn.pack(side=tk.LEFT, padx=5)
+        
+        # Known device from a previous run: connect without waiting for the scan
+        last_device = device_cache.last_device
+        if last_device is not None:
+            quick_btn = tk.Button(btn_frame, text=f"⚡ {last_device[1]}", 
+                                 command=lambda: self.quick_connect(*last_device),
+                                 font=("Helvetica", 11, "bold"), 
+                                 bg="#e74c3c", fg="white",
+                                 relief=tk.FLAT, padx=20, pady=8)
+            quick_btn.pack(side=tk.LEFT, padx=5)
+        
         server_btn = tk.Button(btn_frame, text="🌐 Start Server", 
                               command=self.start_server,
                               font=("Helvetica", 11, "bold"), 
@@ -290,21 +983,11 @@ class ModernDeviceSelectionWindow:
         list_frame = tk.Frame(main_frame, bg="#ecf0f1", relief=tk.SUNKEN, bd=2)
         list_frame.pack(fill=tk.BOTH, expand=True, padx=10)
         
-        # Scrollable device list
-        self.canvas = tk.Canvas(list_frame, bg="#ecf0f1")
-        self.scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=self.canvas.yview)
-        self.scrollable_frame = tk.Frame(self.canvas, bg="#ecf0f1")
-        
-        self.scrollable_frame.bind(
-            "<Configure>",
-            lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-        )
-        
-        self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        self.canvas.configure(yscrollcommand=self.scrollbar.set)
-        
-        self.canvas.pack(side="left", fill="both", expand=True)
-        self.scrollbar.pack(side="right", fill="y")
+        # Scrollable device list (only visible cards exist as widgets)
+        self.device_list = VirtualDeviceList(list_frame,
+                                             on_connect=self.select_device,
+                                             on_monitor=self.monitor_device,
+                                             on_test=self.test_device)
         
     def start_server(self):
         """Start the FastAPI server."""
@@ -314,162 +997,174 @@ class ModernDeviceSelectionWindow:
                            "API: http://127.0.0.1:8000/api/heartrate\n" +
                            "OBS Display: http://127.0.0.1:8000/static/obs_display.html")
     
+    def schedule_filters(self):
+        """Debounce filter controls; the RSSI scale fires on every drag step."""
+        if self._filter_job is not None:
+            self.root.after_cancel(self._filter_job)
+        self._filter_job = self.root.after(FILTER_DEBOUNCE_MS, self.apply_filters)
+    
     def apply_filters(self):
         """Apply filters to the device list."""
-        if hasattr(self, 'all_devices'):
-            self._update_device_list(self.all_devices)
+        self._filter_job = None
+        self._update_device_list(self.all_devices)
     
     def scan_devices(self):
-        """Start fast device scanning."""
-        self.status_label.config(text="Fast scanning (3 seconds)...")
+        """Start streaming device scan on the shared BLE loop."""
+        self._cancel_scan()
+        self.status_label.config(text=f"Scanning ({SCAN_DURATION:.0f} seconds)...")
         self.progress.start()
-        
-        for widget in self.scrollable_frame.winfo_children():
-            widget.destroy()
-            
-        scan_thread = threading.Thread(target=self._scan_devices_thread, daemon=True)
-        scan_thread.start()
-        
-    def _scan_devices_thread(self):
-        """Thread function to scan for devices."""
+        self.all_devices = {}
+        self._rows = {}
+        self.device_list.clear()
+        
+        def on_deltas(changes):
+            self._post(self._apply_scan_deltas, changes)
+        
+        # A known device ends the scan as soon as it shows up
+        self._scan_future = device_manager.run(scan_for_devices_fast(
+            on_deltas, match_devices(known_device_addresses(), hr_service=False)))
+        self._scan_future.add_done_callback(
+            lambda future: self._post(self._scan_finished, future))
+    
+    def _post(self, callback, *args):
+        """Hand a result from the BLE loop to the Tk thread (ignored once the window is gone)."""
         try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            devices_data = loop.run_until_complete(scan_for_devices_fast())
+            self.root.after(0, callback, *args)
+        except (RuntimeError, tk.TclError):
+            pass
+    
+    def _cancel_scan(self):
+        if self._scan_future is not None:
+            self._scan_future.cancel()
+            self._scan_future = None
+    
+    def _apply_scan_deltas(self, changes):
+        """Merge newly seen or changed devices into the list."""
+        self.all_devices.update(changes)
+        for device_address, adv_data in changes.items():
+            self._rows[device_address] = self._device_row(device_address, adv_data)
+        self._update_device_list(self.all_devices)
+    
+    def _scan_finished(self, future):
+        if future is not self._scan_future:
+            return
+        self._scan_future = None
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            self._scan_error(str(future.exception()))
+            return
+        self.progress.stop()
+        if not self.all_devices:
+            self.status_label.config(text="No devices found. Ensure device is in pairing mode!")
+        else:
+            seen = {address.upper() for address in self.all_devices}
+            known = [address for address in known_device_addresses() if address.upper() in seen]
+            found = f", known device {known[0]} found" if known else ""
+            self.status_label.config(text=f"Scan complete: {len(self.all_devices)} devices seen{found}")
             
-            self.root.after(0, self._update_device_list, devices_data)
-        except Exception as e:
-            self.root.after(0, self._scan_error, str(e))
+    def _device_row(self, device_address, adv_data):
+        """Build the display row for one scanned device."""
+        tmp_data = adv_data[1]
+        device_name = tmp_data.local_name if hasattr(tmp_data, 'local_name') and tmp_data.local_name else "Unknown Device"
+        rssi = tmp_data.rssi if hasattr(tmp_data, 'rssi') else -100
+        services = tmp_data.service_uuids if hasattr(tmp_data, 'service_uuids') else []
+        manufacturer_data = getattr(tmp_data, 'manufacturer_data', None)
+        hint = get_device_type_hint(device_address, device_name, services, manufacturer_data)
+        probed = device_cache.has_hr(device_address)
+        if probed is not None:
+            verdict = "✅ HR verified" if probed else "❌ No HR service"
+            hint = verdict if hint == "Unknown" else f"{hint} | {verdict}"
+        return DeviceRow(device_address, device_name, rssi, hint)
             
     def _update_device_list(self, devices_data):
-        """Update device list with modern cards."""
-        self.progress.stop()
+        """Filter and sort the device rows and hand them to the virtual list."""
         self.all_devices = devices_data
         
-        if not devices_data:
-            self.status_label.config(text="No devices found. Ensure device is in pairing mode!")
-            return
-        
-        # Clear existing widgets
-        for widget in self.scrollable_frame.winfo_children():
-            widget.destroy()
-            
         # Process and filter devices
+        min_rssi = self.min_rssi.get()
+        only_hr = self.show_only_hr.get()
         filtered_devices = []
         
         for device_address, adv_data in devices_data.items():
-            ble_device = adv_data[0]
-            tmp_data = adv_data[1]
-            device_name = tmp_data.local_name if hasattr(tmp_data, 'local_name') and tmp_data.local_name else "Unknown Device"
-            rssi = tmp_data.rssi if hasattr(tmp_data, 'rssi') else -100
-            services = tmp_data.service_uuids if hasattr(tmp_data, 'service_uuids') else []
+            row = self._rows.get(device_address)
+            if row is None:
+                row = self._rows[device_address] = self._device_row(device_address, adv_data)
             
             # Apply filters
-            if rssi < self.min_rssi.get():
+            if row.rssi < min_rssi:
                 continue
                 
-            has_hr_service = any(str(uuid).lower() == HR_SERVICE_UUID.lower() or "180d" in str(uuid).lower() 
-                               for uuid in services)
-            
-            if self.show_only_hr.get() and not has_hr_service:
+            if only_hr and not (has_hr_service(getattr(adv_data[1], 'service_uuids', None))
+                                or device_cache.has_hr(device_address)):
                 continue
                 
-            filtered_devices.append((device_address, device_name, rssi, services, adv_data))
+            filtered_devices.append(row)
         
         # Sort by signal strength
-        filtered_devices.sort(key=lambda x: x[2], reverse=True)
-        self.status_label.config(text=f"Found {len(filtered_devices)} devices")
-        
-        # Create modern device cards
-        for i, (device_address, device_name, rssi, services, adv_data) in enumerate(filtered_devices):
-            self._create_device_card(device_address, device_name, rssi, services, i)
-    
-    def _create_device_card(self, device_address, device_name, rssi, services, index):
-        """Create a modern device card."""
-        # Card frame with rounded appearance
-        card_frame = tk.Frame(self.scrollable_frame, bg="white", relief=tk.RAISED, bd=1)
-        card_frame.pack(fill=tk.X, padx=15, pady=8)
-        
-        # Header with device name and signal
-        header_frame = tk.Frame(card_frame, bg="white")
-        header_frame.pack(fill=tk.X, padx=15, pady=(15, 5))
-        
-        # Device name
-        name_label = tk.Label(header_frame, text=f"📱 {device_name}", 
-                             font=("Helvetica", 14, "bold"), 
-                             bg="white", fg="#2c3e50")
-        name_label.pack(side=tk.LEFT, anchor="w")
-        
-        # Signal strength badge
-        if rssi > -50:
-            signal_color = "#27ae60"
-            signal_text = "🟢 Strong"
-        elif rssi > -70:
-            signal_color = "#f39c12"
-            signal_text = "🟡 Good"
-        else:
-            signal_color = "#e74c3c"
-            signal_text = "🔴 Weak"
-            
-        signal_frame = tk.Frame(header_frame, bg=signal_color, relief=tk.RAISED, bd=1)
-        signal_frame.pack(side=tk.RIGHT)
-        
-        signal_label = tk.Label(signal_frame, text=f"{signal_text} ({rssi})", 
-                               font=("Helvetica", 9, "bold"), 
-                               bg=signal_color, fg="white", padx=8, pady=2)
-        signal_label.pack()
-        
-        # Device details
-        details_frame = tk.Frame(card_frame, bg="white")
-        details_frame.pack(fill=tk.X, padx=15, pady=5)
-        
-        address_label = tk.Label(details_frame, text=f"🏷️ {device_address}", 
-                               font=("Helvetica", 9), 
-                               bg="white", fg="#7f8c8d")
-        address_label.pack(anchor="w")
-        
-        # Device type hints
-        device_hint = get_device_type_hint(device_address, device_name, services)
-        if device_hint != "Unknown":
-            hint_label = tk.Label(details_frame, text=f"🔗 {device_hint}", 
-                                 font=("Helvetica", 9), 
-                                 bg="white", fg="#3498db")
-            hint_label.pack(anchor="w")
-        
-        # Action buttons
-        button_frame = tk.Frame(card_frame, bg="white")
-        button_frame.pack(fill=tk.X, padx=15, pady=(5, 15))
-        
-        # Connect button (prominent)
-        connect_btn = tk.Button(button_frame, text="🚀 Connect", 
-                              command=lambda: self.select_device(device_address, device_name),
-                              font=("Helvetica", 11, "bold"), 
-                              bg="#e74c3c", fg="white",
-                              relief=tk.FLAT, padx=25, pady=8)
-        connect_btn.pack(side=tk.RIGHT, padx=5)
-        
-        # Test button
-        test_btn = tk.Button(button_frame, text="🧪 Test", 
-                           command=lambda: self.test_device(device_address),
-                           font=("Helvetica", 10), 
-                           bg="#95a5a6", fg="white",
-                           relief=tk.FLAT, padx=15, pady=6)
-        test_btn.pack(side=tk.RIGHT, padx=5)
+        filtered_devices.sort(key=lambda row: row.rssi, reverse=True)
+        if devices_data:
+            self.status_label.config(text=f"Found {len(filtered_devices)} devices")
+        self.device_list.set_rows(filtered_devices)
     
+    def monitor_device(self, device_address, device_name):
+        """Monitor a device in the background without leaving device selection."""
+        device_manager.add_device(device_address, device_name)
+        self.status_label.config(text=f"Monitoring {device_name} in background (see /api/devices)")
+        
     def test_device(self, device_address):
         """Test device with modern feedback."""
         self.status_label.config(text=f"Testing {device_address[:8]}...")
         
-        def test_thread():
-            try:
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                success, message = loop.run_until_complete(test_heart_rate_connection(device_address))
-                self.root.after(0, lambda: self._show_test_result(device_address, success, message))
-            except Exception as e:
-                self.root.after(0, lambda: self._show_test_result(device_address, False, f"Error: {str(e)}"))
+        future = device_manager.run(test_heart_rate_connection(device_address))
+        future.add_done_callback(
+            lambda done: self._post(self._test_finished, device_address, done))
+        
+    def _test_finished(self, device_address, future):
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            self._show_test_result(device_address, False, f"Error: {future.exception()}")
+        else:
+            self._probe_result(device_address)
+            self._show_test_result(device_address, *future.result())
+        
+    def probe_all_devices(self):
+        """Probe every listed device for the HR service in parallel."""
+        addresses = [row.address for row in self.device_list.rows]
+        if not addresses:
+            self.status_label.config(text="Nothing to probe - scan first")
+            return
+        self._cancel_scan()  # adapters connect poorly while scanning
+        self.progress.start()
+        self.status_label.config(text=f"Probing {len(addresses)} devices...")
         
-        threading.Thread(target=test_thread, daemon=True).start()
+        def on_result(address, success, message):
+            self._post(self._probe_result, address)
+        
+        future = device_manager.run(probe_devices(addresses, on_result))
+        future.add_done_callback(lambda done: self._post(self._probe_finished, done))
+        
+    def _probe_result(self, device_address):
+        adv_data = self.all_devices.get(device_address)
+        if adv_data is not None:
+            self._rows[device_address] = self._device_row(device_address, adv_data)
+            self._update_device_list(self.all_devices)
+        
+    def _probe_finished(self, future):
+        self.progress.stop()
+        if future.cancelled() or future.exception() is not None:
+            self.status_label.config(text="Probe failed")
+            return
+        found = sum(1 for success, message in future.result().values() if success)
+        self.status_label.config(text=f"Probe complete: {found} of {len(future.result())} have HR service")
+        
+    def quick_connect(self, device_address, device_name):
+        """Connect to the cached device straight away, skipping the scan."""
+        print(f"Selected device: {device_name} ({device_address})")
+        self._cancel_scan()
+        self.root.destroy()
+        self.start_heart_rate_monitor(device_address, device_name)
         
     def _show_test_result(self, device_address, success, message):
         """Show modern test results."""
@@ -488,6 +1183,7 @@ class ModernDeviceSelectionWindow:
                                    f"Connect to:\n\n{device_name}\n{device_address}\n\nThis will start heart rate monitoring.")
         if result:
             print(f"Selected device: {device_name} ({device_address})")
+            self._cancel_scan()
             self.root.destroy()
             self.start_heart_rate_monitor(device_address, device_name)
             
@@ -505,7 +1201,7 @@ class ModernHeartRateMonitorWindow:
         self.device_name = device_name
         self.root = tk.Tk()
         self.root.title(f"❤️ Heart Rate Monitor - {device_name}")
-        self.root.geometry("600x500")
+        self.root.geometry("600x700")
         self.root.configure(bg="#2c3e50")
         
         self.create_modern_widgets()
@@ -552,6 +1248,10 @@ class ModernHeartRateMonitorWindow:
                                    bg="#e74c3c", fg="white", pady=20)
         heart_rate_label.pack()
         
+        # Live BPM/RR chart, updated one segment per sample
+        self.chart = LiveChart(main_frame)
+        self.chart.pack(fill=tk.X, padx=20)
+        
         # Control buttons
         button_frame = tk.Frame(main_frame, bg="#2c3e50")
         button_frame.pack(pady=30)
@@ -580,28 +1280,36 @@ class ModernHeartRateMonitorWindow:
         
     def start_connection(self):
         """Start the BLE connection."""
-        self.ble_thread = threading.Thread(target=start_ble_loop, 
-                                          args=(self.device_address, self.device_name), 
-                                          daemon=True)
-        self.ble_thread.start()
-        self.status_var.set("✅ Connected - Waiting for data...")
+        device_manager.add_device(self.device_address, self.device_name, primary=True)
+        self.status_var.set("🔄 Connecting...")
+        
+    def _post(self, callback, *args):
+        """Schedule ``callback`` on the Tk thread; False once the window is gone."""
+        try:
+            self.root.after(0, callback, *args)
+        except (RuntimeError, tk.TclError):
+            return False
+        return True
         
     def update_gui(self):
-        """Update GUI with heart rate data."""
-        while not gui_queue.empty():
-            data = gui_queue.get_nowait()
-            if isinstance(data, int):
-                self.heart_rate_var.set(f"{data}")
-                self.status_var.set("🟢 Receiving data...")
-            else:
-                self.status_var.set(f"⚠️ {str(data)}")
-                
-        self.root.after(100, self.update_gui)
+        """Apply the latest heart rate and status messages (runs only when woken)."""
+        heart_rate, events, heart_rate_last = gui_channel.drain()
+        if heart_rate is not None:
+            self.heart_rate_var.set(f"{heart_rate}")
+            data = current_hr_data.snapshot.data
+            self.chart.add_sample(data["timestamp"], data["heart_rate"], data["rr_intervals"])
+        if events and not heart_rate_last:
+            self.status_var.set(f"⚠️ {events[-1]}")
+        elif heart_rate is not None:
+            self.status_var.set("🟢 Receiving data...")
         
     def disconnect(self):
         """Disconnect and return to device selection."""
         global current_hr_data
+        gui_channel.set_waker(None)
+        device_manager.remove_device(self.device_address)
         current_hr_data.is_connected = False
+        publish_heart_rate()
         self.root.destroy()
         device_window = ModernDeviceSelectionWindow()
         device_window.run()
@@ -612,19 +1320,223 @@ class ModernHeartRateMonitorWindow:
         webbrowser.open("http://127.0.0.1:8000/docs")
         
     def run(self):
-        self.update_gui()
+        # Attach once the main loop runs so wake-ups can always be scheduled
+        self.root.after(0, gui_channel.set_waker, lambda: self._post(self.update_gui))
         self.root.mainloop()
 
+def load_gui():
+    """Import Tk and the GUI widgets; headless runs never load them."""
+    global tk, ttk, messagebox, DeviceRow, VirtualDeviceList, LiveChart
+    import tkinter as tk
+    from tkinter import ttk, messagebox
+    from device_list import DeviceRow, VirtualDeviceList
+    from live_chart import LiveChart
+
+def run_headless(args):
+    """Run the BLE client and API server without Tk until interrupted."""
+    if args.device:
+        address, name = args.device[0], args.device[0]
+    else:
+        remembered = device_cache.last_device
+        if remembered is not None:
+            address, name = remembered
+            print(f"Using remembered device {name} ({address})")
+        else:
+            print("Waiting for a heart rate device...")
+            address, name = device_manager.run(find_heart_rate_device()).result()
+            print(f"Found {name} ({address})")
+    device_manager.add_device(address, name, primary=True)
+    for other in args.device[1:]:
+        device_manager.add_device(other, other)
+    
+    # Exit cleanly (via the caller's finally) when a service manager stops us
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        print("Stopping...")
+
+async def start_relay_publishers(urls):
+    for url in urls:
+        publisher = RelayPublisher(url, asyncio.get_running_loop())
+        await publisher.start()
+        relay_publishers.append(publisher)
+        print(f"Relaying samples to {url}")
+
+def on_alert(event):
+    state = "ALERT" if event["status"] == FIRING else "Resolved"
+    print(f"{state}: {event['rule']} on {event['device_name']} ({event['value']})")
+    if alert_dispatcher is not None:
+        alert_dispatcher.submit(event)
+
+async def start_alerts(rules, webhooks, commands):
+    """Create the alert engine and its delivery task on the shared loop."""
+    global alert_engine, alert_dispatcher
+    loop = asyncio.get_running_loop()
+    if webhooks or commands:
+        alert_dispatcher = AlertDispatcher(loop, webhooks, commands)
+        loop.create_task(alert_dispatcher.run())
+    alert_engine = AlertEngine(rules, on_alert)
+    loop.create_task(alert_engine.run())
+    print(f"{len(rules)} alert rule(s) active")
+
+def run_relay_subscriber(url):
+    """Serve the API and overlays from a relay stream, without Bluetooth."""
+    global relay_subscriber
+    relay_subscriber = RelaySubscriber(url, apply_relay_sample)
+    print(f"Receiving relayed samples on {url}")
+    future = device_manager.run(relay_subscriber.run())
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        future.result()
+    except KeyboardInterrupt:
+        print("Stopping...")
+    finally:
+        future.cancel()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Heart rate monitor with OBS overlay API")
+    parser.add_argument("--record", metavar="FILE",
+                        help="append every BLE notification to a binary session log")
+    parser.add_argument("--replay", metavar="FILE",
+                        help="replay a session log instead of connecting to a device")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="replay speed multiplier, 0 for as fast as possible (default: 1)")
+    parser.add_argument("--device", action="append", default=[], metavar="ADDR",
+                        help="monitor this device (repeatable); with --headless the first one "
+                             "drives the overlays, otherwise they run in the background")
+    parser.add_argument("--simulate", type=int, nargs="?", const=1, metavar="N",
+                        help="use N simulated heart rate devices instead of Bluetooth (default: 1)")
+    parser.add_argument("--sim-rate", type=float, default=1.0, metavar="HZ",
+                        help="notifications per second per simulated device (default: 1)")
+    parser.add_argument("--sim-dropout", type=float, default=0.0, metavar="P",
+                        help="probability that a simulated notification is lost (default: 0)")
+    parser.add_argument("--sim-drop-interval", type=float, default=0.0, metavar="SEC",
+                        help="mean seconds between simulated connection drops (default: never)")
+    parser.add_argument("--sim-uint16", action="store_true",
+                        help="simulated devices use the 16-bit heart rate format")
+    parser.add_argument("--hr-zones", type=parse_zones, default=DEFAULT_ZONES, metavar="BPM,...",
+                        help="lower bounds of the heart rate zones "
+                             f"(default: {','.join(map(str, DEFAULT_ZONES))})")
+    parser.add_argument("--filter", type=parse_filter_spec, default=DEFAULT_FILTER, metavar="SPEC",
+                        help=f"BPM/RR filter stages, e.g. '{SMOOTHING_FILTER}'; 'artifacts' alert "
+                             f"rules need the 'rr' stage (default: {DEFAULT_FILTER})")
+    parser.add_argument("--device-filter", type=parse_device_filter, action="append", default=[],
+                        metavar="ADDR=SPEC", help="filter stages for one device (repeatable)")
+    parser.add_argument("--headless", action="store_true",
+                        help="run the BLE client and API server without a window")
+    parser.add_argument("--auto", action="store_true",
+                        help="with --headless, connect to the remembered device or the first "
+                             "heart rate device found")
+    parser.add_argument("--relay-to", action="append", default=[], metavar="URL",
+                        help="forward every sample to udp://HOST:PORT (unicast or multicast "
+                             "group) or tcp://HOST:PORT (repeatable)")
+    parser.add_argument("--relay-from", metavar="URL",
+                        help="serve the API from samples relayed to udp://HOST:PORT or "
+                             "tcp://HOST:PORT instead of Bluetooth")
+    parser.add_argument("--alert", type=parse_alert_rule, action="append", default=[],
+                        metavar="RULE", help="alert rule, e.g. 'bpm>180:10', 'stale:5' or "
+                                             "'ADDR=artifacts>20%%:30' (repeatable)")
+    parser.add_argument("--alert-webhook", action="append", default=[], metavar="URL",
+                        help="POST batches of alert events as JSON to this URL (repeatable)")
+    parser.add_argument("--alert-command", action="append", default=[], metavar="CMD",
+                        help="run this shell command with each batch as JSON on stdin (repeatable)")
+    parser.add_argument("--overlay-config", metavar="FILE",
+                        help="load overlay settings from this JSON file and save changes "
+                             "made through PUT /api/overlay-config to it")
+    parser.add_argument("--device-cache", metavar="FILE",
+                        help="device cache file (default: ~/.hr_monitor_cache.json; "
+                             "in memory only with --simulate)")
+    parser.add_argument("--api-host", default="127.0.0.1", metavar="HOST",
+                        help="address the API server binds to (default: 127.0.0.1)")
+    parser.add_argument("--api-port", type=int, default=8069, metavar="PORT",
+                        help="API server port (default: 8069)")
+    args = parser.parse_args(argv)
+    if args.headless and not (args.device or args.auto):
+        parser.error("--headless needs --device ADDR or --auto")
+    if args.auto and not args.headless:
+        parser.error("--auto requires --headless")
+    if (args.alert_webhook or args.alert_command) and not args.alert:
+        parser.error("--alert-webhook and --alert-command need at least one --alert rule")
+    for url in args.relay_to + ([args.relay_from] if args.relay_from else []):
+        try:
+            parse_relay_url(url)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.relay_from and (args.replay or args.simulate or args.device or args.headless
+                            or args.record):
+        parser.error("--relay-from cannot be combined with a Bluetooth, simulated or replay source")
+    return args
+
 def main():
     """Main function with FastAPI integration."""
+    global session_recorder, ble_transport, hr_zones, default_filter_spec, device_cache
+    global api_host, api_port, overlay_config, overlay_config_path
+    args = parse_args()
     print("🫀 Starting Modern Heart Rate Monitor with API...")
     
+    hr_zones = args.hr_zones
+    current_hr_data.hrv = HrvEngine(zones=hr_zones)
+    default_filter_spec = args.filter
+    device_filter_specs.update(args.device_filter)
+    api_host, api_port = args.api_host, args.api_port
+    cli_device_addresses.extend(args.device)
+    if args.overlay_config:
+        try:
+            overlay_config = OverlayConfig(load_overlay_config(args.overlay_config))
+        except ValueError as e:
+            print(f"Invalid overlay config {args.overlay_config}: {e}")
+            return
+        overlay_config_path = args.overlay_config
+    
+    if args.simulate:
+        ble_transport = SimulatedTransport(args.simulate, SimulationConfig(
+            rate_hz=args.sim_rate, dropout=args.sim_dropout,
+            link_drop_interval=args.sim_drop_interval, uint16=args.sim_uint16))
+        # Keep simulated devices out of the on-disk cache
+        device_cache = DeviceCache(args.device_cache)
+        print(f"Using {args.simulate} simulated device(s) at {args.sim_rate} Hz")
+    elif args.device_cache:
+        device_cache = DeviceCache(args.device_cache)
+    
+    if args.replay and not os.path.exists(args.replay):
+        print(f"Recording not found: {args.replay}")
+        return
+    
     # Start FastAPI server
     start_fastapi_server()
+    if args.relay_to:
+        device_manager.run(start_relay_publishers(args.relay_to)).result()
+    if args.alert:
+        device_manager.run(start_alerts(args.alert, args.alert_webhook, args.alert_command)).result()
+    
+    if args.record:
+        session_recorder = SessionRecorder(args.record)
+        print(f"Recording notifications to {args.record}")
     
-    # Start GUI
-    device_window = ModernDeviceSelectionWindow()
-    device_window.run()
+    try:
+        if args.relay_from:
+            run_relay_subscriber(args.relay_from)
+        elif args.replay:
+            device_manager.run(run_replay(args.replay, args.speed)).result()
+        elif args.headless:
+            run_headless(args)
+        else:
+            for address in args.device:
+                device_manager.add_device(address, address)
+            # Start GUI
+            load_gui()
+            device_window = ModernDeviceSelectionWindow()
+            device_window.run()
+    finally:
+        stop_fastapi_server()
+        for publisher in relay_publishers:
+            publisher.close()
+        device_manager.stop()
+        hr_log.close()
+        malformed_log.close()
+        if session_recorder is not None:
+            session_recorder.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,76 @@
+"""Bounded, coalescing hand-off from the BLE loop to the Tk thread.
+
+Heart rate values go into a latest-value slot: if Tk falls behind (e.g. while
+a modal dialog is open) older readings are overwritten instead of queued.
+Status and error messages go into a small bounded channel that drops the
+oldest entries. Instead of Tk polling, the producer calls a waker at most
+once per drain, so an idle GUI does no work at all.
+"""
+import threading
+from collections import deque
+
+# Status/error messages kept while the GUI is not draining
+EVENT_CAPACITY = 32
+
+
+class GuiChannel:
+    def __init__(self, event_capacity=EVENT_CAPACITY):
+        self._lock = threading.Lock()
+        self._heart_rate = None
+        self._heart_rate_last = False  # heart rate arrived after the last event
+        self._events = deque(maxlen=event_capacity)
+        self._wake = None
+        self._wake_pending = False
+        self.dropped_events = 0
+
+    @property
+    def depth(self):
+        """Number of undelivered items (events plus a pending heart rate)."""
+        return len(self._events) + (self._heart_rate is not None)
+
+    def set_waker(self, wake):
+        """Register ``wake()``, called from any thread when new data is ready.
+
+        ``wake`` may return False to report that it could not be scheduled,
+        so the next item tries again. Pass None to detach the consumer.
+        """
+        with self._lock:
+            self._wake = wake
+            self._wake_pending = False
+            pending = self._heart_rate is not None or bool(self._events)
+        if pending:
+            self._notify()
+
+    def put_heart_rate(self, heart_rate):
+        with self._lock:
+            self._heart_rate = heart_rate
+            self._heart_rate_last = True
+        self._notify()
+
+    def put_event(self, message):
+        with self._lock:
+            if len(self._events) == self._events.maxlen:
+                self.dropped_events += 1
+            self._events.append(message)
+            self._heart_rate_last = False
+        self._notify()
+
+    def drain(self):
+        """Return ``(heart_rate or None, events, heart_rate_last)`` and reset."""
+        with self._lock:
+            heart_rate, self._heart_rate = self._heart_rate, None
+            events = list(self._events)
+            self._events.clear()
+            heart_rate_last = self._heart_rate_last
+            self._wake_pending = False
+        return heart_rate, events, heart_rate_last
+
+    def _notify(self):
+        with self._lock:
+            wake = self._wake
+            if wake is None or self._wake_pending:
+                return
+            self._wake_pending = True
+        if wake() is False:
+            with self._lock:
+                self._wake_pending = False
@@ -0,0 +1,189 @@
+"""Fixed-memory heart rate history.
+
+Raw samples live in a ring of typed arrays. Alongside it, every sample is
+folded into a few ring-buffered aggregate levels (1 s, 10 s, 1 min, 5 min
+buckets holding count/sum/min/max). History queries read whole buckets from
+the coarsest level whose width divides the requested resolution, so answering
+costs O(buckets) rather than O(samples). Raw samples fill in the partial
+buckets at the edges of the range and answer resolutions no level divides.
+"""
+import itertools
+import math
+import threading
+from array import array
+
+# Raw samples kept (6 hours at 4 Hz)
+HISTORY_CAPACITY = 86400
+
+# (bucket width in seconds, number of buckets kept)
+AGGREGATE_LEVELS = (
+    (1, 86400),      # 24 hours
+    (10, 8640),      # 24 hours
+    (60, 10080),     # 7 days
+    (300, 2016),     # 7 days
+)
+
+
+class _AggregateLevel:
+    """Ring of fixed-width buckets; a slot is reused once its bucket ages out."""
+
+    def __init__(self, width, capacity):
+        self.width = width
+        self.capacity = capacity
+        self.bucket = array("q", [-1]) * capacity
+        self.count = array("I", [0]) * capacity
+        self.total = array("d", [0.0]) * capacity
+        self.low = array("H", [0]) * capacity
+        self.high = array("H", [0]) * capacity
+
+    def add(self, timestamp, bpm):
+        bucket = int(timestamp // self.width)
+        slot = bucket % self.capacity
+        if self.bucket[slot] != bucket:
+            self.bucket[slot] = bucket
+            self.count[slot] = 1
+            self.total[slot] = bpm
+            self.low[slot] = bpm
+            self.high[slot] = bpm
+            return
+        self.count[slot] += 1
+        self.total[slot] += bpm
+        if bpm < self.low[slot]:
+            self.low[slot] = bpm
+        elif bpm > self.high[slot]:
+            self.high[slot] = bpm
+
+    def buckets(self, since, until):
+        """Yield (start, count, total, low, high) for populated buckets in range."""
+        first = int(since // self.width)
+        last = int(until // self.width)
+        for bucket in range(max(first, last - self.capacity + 1), last + 1):
+            slot = bucket % self.capacity
+            if self.bucket[slot] == bucket:
+                yield (bucket * self.width, self.count[slot], self.total[slot],
+                       self.low[slot], self.high[slot])
+
+
+class HeartRateHistory:
+    """Ring buffer of (timestamp, bpm) samples with downsampled queries."""
+
+    def __init__(self, capacity=HISTORY_CAPACITY, levels=AGGREGATE_LEVELS):
+        self.capacity = capacity
+        self.timestamps = array("d", [0.0]) * capacity
+        self.bpm = array("H", [0]) * capacity
+        self.levels = [_AggregateLevel(width, size) for width, size in levels]
+        self._start = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def append(self, timestamp, bpm):
+        with self._lock:
+            end = (self._start + self._size) % self.capacity
+            self.timestamps[end] = timestamp
+            self.bpm[end] = bpm
+            if self._size < self.capacity:
+                self._size += 1
+            else:
+                self._start = (self._start + 1) % self.capacity
+            for level in self.levels:
+                level.add(timestamp, bpm)
+
+    def _first_index_at(self, timestamp):
+        """Binary search for the first logical index with time >= ``timestamp``."""
+        lo, hi = 0, self._size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.timestamps[(self._start + mid) % self.capacity] < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def samples(self, since, until):
+        """Return raw (timestamp, bpm) samples with since <= t < until."""
+        with self._lock:
+            index = self._first_index_at(since)
+            stop = self._first_index_at(until)
+            result = []
+            for i in range(index, stop):
+                slot = (self._start + i) % self.capacity
+                result.append((self.timestamps[slot], self.bpm[slot]))
+            return result
+
+    def _level_for(self, resolution):
+        """Pick the coarsest aggregate level whose buckets nest in ``resolution`` buckets.
+
+        A level bucket that straddled two output buckets would credit all of
+        its samples to one of them, so the width must divide the resolution.
+        """
+        chosen = None
+        for level in self.levels:
+            ratio = resolution / level.width
+            if (ratio >= 1 and abs(ratio - round(ratio)) < 1e-9
+                    and (chosen is None or level.width > chosen.width)):
+                chosen = level
+        return chosen
+
+    def _raw_buckets(self, since, until):
+        """Raw samples in [since, until) as single-sample buckets."""
+        index = self._first_index_at(since)
+        stop = self._first_index_at(until)
+        source = []
+        for i in range(index, stop):
+            slot = (self._start + i) % self.capacity
+            bpm = self.bpm[slot]
+            source.append((self.timestamps[slot], 1, bpm, bpm, bpm))
+        return source
+
+    def downsample(self, since, until, resolution):
+        """Return min/max/mean buckets of ``resolution`` seconds over [since, until).
+
+        Buckets are aligned to multiples of ``resolution``; empty buckets are
+        omitted.
+        """
+        with self._lock:
+            level = self._level_for(resolution)
+            if level is None:
+                # Finer than the smallest level, or not a multiple of any
+                source = self._raw_buckets(since, until)
+            else:
+                # Whole level buckets inside the range; raw samples for the
+                # partial buckets at either edge
+                width = level.width
+                inner_since = math.ceil(since / width) * width
+                inner_until = math.floor(until / width) * width
+                if inner_since < inner_until:
+                    source = itertools.chain(
+                        self._raw_buckets(since, inner_since),
+                        level.buckets(inner_since, inner_until - 1e-9),
+                        self._raw_buckets(inner_until, until))
+                else:
+                    source = self._raw_buckets(since, until)
+
+            buckets = {}
+            for start, count, total, low, high in source:
+                key = int(start // resolution)
+                merged = buckets.get(key)
+                if merged is None:
+                    buckets[key] = [count, total, low, high]
+                else:
+                    merged[0] += count
+                    merged[1] += total
+                    if low < merged[2]:
+                        merged[2] = low
+                    if high > merged[3]:
+                        merged[3] = high
+
+        return [
+            {
+                "timestamp": key * resolution,
+                "min": low,
+                "max": high,
+                "mean": round(total / count, 2),
+                "count": count,
+            }
+            for key, (count, total, low, high) in sorted(buckets.items())
+        ]
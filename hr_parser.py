@@ -0,0 +1,159 @@
+"""Decoder for the Bluetooth Heart Rate Measurement characteristic (0x2A37).
+
+Layout (all fields little-endian)::
+
+    flags          uint8
+      bit 0        heart rate is uint16 instead of uint8
+      bit 1        sensor contact detected
+      bit 2        sensor contact status supported
+      bit 3        energy expended field present
+      bit 4        RR intervals present
+    heart rate     uint8 | uint16
+    energy         uint16, kJ (optional)
+    rr intervals   uint16 * n, units of 1/1024 s (optional)
+
+Payloads are decoded with a single ``Struct.unpack_from`` call straight from
+the notification buffer; no slices or intermediate copies are made.
+"""
+import struct
+from collections import namedtuple
+
+FLAG_HR_UINT16 = 0x01
+FLAG_CONTACT_DETECTED = 0x02
+FLAG_CONTACT_SUPPORTED = 0x04
+FLAG_ENERGY_EXPENDED = 0x08
+FLAG_RR_INTERVALS = 0x10
+
+# RR intervals are transmitted in 1/1024 second ticks
+RR_TICKS_PER_SECOND = 1024
+
+
+class HeartRateMeasurement(namedtuple("HeartRateMeasurement",
+                                      "heart_rate sensor_contact energy_expended rr_intervals")):
+    """One decoded 0x2A37 notification.
+
+    ``sensor_contact`` is None when the sensor does not report contact,
+    ``energy_expended`` is None when absent and ``rr_intervals`` holds raw
+    1/1024 s ticks (empty tuple when absent).
+    """
+
+    __slots__ = ()
+
+    @property
+    def rr_intervals_ms(self):
+        return rr_ticks_to_ms(self.rr_intervals)
+
+
+def rr_ticks_to_ms(rr_intervals):
+    """Convert RR intervals from 1/1024 s ticks to milliseconds."""
+    return [rr * 1000.0 / RR_TICKS_PER_SECOND for rr in rr_intervals]
+
+
+# Build records with the C-level tuple constructor; namedtuple's __new__ is Python
+_new_measurement = tuple.__new__
+
+
+def _build_layout(flags, size):
+    """Compile the decoder for one (flags, payload length) combination."""
+    fmt = "<H" if flags & FLAG_HR_UINT16 else "<B"
+    if flags & FLAG_ENERGY_EXPENDED:
+        fmt += "H"
+    header = struct.calcsize(fmt) + 1
+    if size < header:
+        raise ValueError(f"Truncated heart rate measurement ({size} bytes, flags 0x{flags:02x})")
+    if flags & FLAG_RR_INTERVALS:
+        fmt += "H" * ((size - header) // 2)
+
+    if flags & FLAG_CONTACT_SUPPORTED:
+        contact = bool(flags & FLAG_CONTACT_DETECTED)
+    else:
+        contact = None
+    energy = 1 if flags & FLAG_ENERGY_EXPENDED else None
+    rr_start = 2 if energy else 1
+    return struct.Struct(fmt).unpack_from, contact, energy, rr_start
+
+
+# (flags, length) -> decoder; real sensors only ever use a handful of layouts
+_layouts = {}
+
+
+def _layout(flags, size):
+    try:
+        return _layouts[flags, size]
+    except KeyError:
+        layout = _layouts[flags, size] = _build_layout(flags, size)
+        return layout
+
+
+def parse_hr_measurement(data):
+    """Decode one Heart Rate Measurement payload (bytes, bytearray or memoryview)."""
+    try:
+        key = (data[0], len(data))
+    except IndexError:
+        raise ValueError("Empty heart rate measurement") from None
+    try:
+        unpack_from, contact, energy, rr_start = _layouts[key]
+    except KeyError:
+        unpack_from, contact, energy, rr_start = _layout(*key)
+
+    values = unpack_from(data, 1)
+    return _new_measurement(HeartRateMeasurement, (values[0], contact,
+                            values[1] if energy else None, values[rr_start:]))
+
+
+def parse_hr_measurements(payloads):
+    """Decode a batch of payloads into a list of measurements."""
+    parse = parse_hr_measurement
+    return [parse(data) for data in payloads]
+
+
+def parse_packed_measurements(buffer, lengths, offset=0):
+    """Decode back-to-back payloads from one buffer without copying.
+
+    ``lengths`` gives the size of each payload in order, starting at
+    ``offset``. Each payload is unpacked in place from a ``memoryview`` of
+    ``buffer`` (which may be an mmap).
+    """
+    view = memoryview(buffer)
+    layouts = _layouts
+    new = _new_measurement
+    measurements = []
+    append = measurements.append
+    for length in lengths:
+        key = (view[offset], length)
+        try:
+            unpack_from, contact, energy, rr_start = layouts[key]
+        except KeyError:
+            unpack_from, contact, energy, rr_start = _layout(*key)
+        values = unpack_from(view, offset + 1)
+        append(new(HeartRateMeasurement, (values[0], contact,
+                   values[1] if energy else None, values[rr_start:])))
+        offset += length
+    return measurements
+
+
+def build_hr_measurement(heart_rate, rr_intervals=(), energy_expended=None,
+                         sensor_contact=None, uint16=False):
+    """Encode a Heart Rate Measurement payload (inverse of parse_hr_measurement).
+
+    ``rr_intervals`` are raw 1/1024 s ticks.
+    """
+    flags = 0
+    fmt = "<BB"
+    values = [heart_rate]
+    if uint16 or heart_rate > 0xFF:
+        flags |= FLAG_HR_UINT16
+        fmt = "<BH"
+    if sensor_contact is not None:
+        flags |= FLAG_CONTACT_SUPPORTED
+        if sensor_contact:
+            flags |= FLAG_CONTACT_DETECTED
+    if energy_expended is not None:
+        flags |= FLAG_ENERGY_EXPENDED
+        fmt += "H"
+        values.append(energy_expended)
+    if rr_intervals:
+        flags |= FLAG_RR_INTERVALS
+        fmt += "H" * len(rr_intervals)
+        values.extend(rr_intervals)
+    return struct.pack(fmt, flags, *values)
@@ -0,0 +1,101 @@
+"""Incremental heart rate variability and time-in-zone.
+
+RR intervals are kept in their raw 1/1024 s ticks so the running sums are
+exact integers: adding an interval and evicting the oldest ones from the
+sliding window only adjusts a few counters, and results never drift no matter
+how long a session runs.
+"""
+import math
+from bisect import bisect_right
+from collections import deque
+
+from hr_parser import RR_TICKS_PER_SECOND
+
+# Sliding window for RMSSD/SDNN/pNN50 (the usual short-term HRV span)
+HRV_WINDOW = 300.0
+
+# Lower BPM bound of each heart rate zone; below the first bound is zone 0
+DEFAULT_ZONES = (100, 120, 140, 160, 180)
+
+# Gaps between samples longer than this (e.g. a dropped link) do not count
+# towards time in zone
+MAX_ZONE_GAP = 5.0
+
+# NN50 threshold: successive differences above 50 ms, compared in ticks * 1000
+_NN50_TICKS_1000 = 50 * RR_TICKS_PER_SECOND
+
+
+def parse_zones(text):
+    """Parse ``"100,120,140"`` into ascending BPM bounds."""
+    zones = tuple(sorted(int(value) for value in text.split(",") if value.strip()))
+    if not zones or zones[0] <= 0:
+        raise ValueError("zones must be positive BPM values")
+    return zones
+
+
+class HrvEngine:
+    """Rolling RR statistics over ``window`` seconds plus cumulative time in zone."""
+
+    def __init__(self, window=HRV_WINDOW, zones=DEFAULT_ZONES):
+        self.window_ticks = int(window * RR_TICKS_PER_SECOND)
+        self.zones = tuple(zones)
+        self._rr = deque()
+        self._sum = 0            # sum of RR
+        self._sum_sq = 0         # sum of RR^2
+        self._diff_sq = 0        # sum of successive differences squared
+        self._nn50 = 0           # successive differences > 50 ms
+        self.zone_seconds = [0.0] * (len(self.zones) + 1)
+        self._last_time = None
+        self._last_zone = 0
+
+    def add_sample(self, timestamp, heart_rate, rr_ticks=()):
+        """Account one notification: its heart rate for zones, its RR intervals for HRV."""
+        if self._last_time is not None:
+            elapsed = timestamp - self._last_time
+            if 0 < elapsed <= MAX_ZONE_GAP:
+                self.zone_seconds[self._last_zone] += elapsed
+        self._last_time = timestamp
+        self._last_zone = bisect_right(self.zones, heart_rate)
+        for rr in rr_ticks:
+            self.add_rr(rr)
+
+    def add_rr(self, rr):
+        """Add one RR interval in ticks and slide the window (amortized O(1))."""
+        intervals = self._rr
+        if intervals:
+            diff = rr - intervals[-1]
+            self._diff_sq += diff * diff
+            if abs(diff) * 1000 > _NN50_TICKS_1000:
+                self._nn50 += 1
+        intervals.append(rr)
+        self._sum += rr
+        self._sum_sq += rr * rr
+        while self._sum > self.window_ticks and len(intervals) > 2:
+            oldest = intervals.popleft()
+            diff = intervals[0] - oldest
+            self._diff_sq -= diff * diff
+            if abs(diff) * 1000 > _NN50_TICKS_1000:
+                self._nn50 -= 1
+            self._sum -= oldest
+            self._sum_sq -= oldest * oldest
+
+    def summary(self):
+        """Current statistics; RR values in milliseconds, pNN50 in percent."""
+        n = len(self._rr)
+        result = {
+            "beats": n,
+            "mean_rr": None,
+            "sdnn": None,
+            "rmssd": None,
+            "pnn50": None,
+            "time_in_zone": self.zone_seconds[:],
+        }
+        if n:
+            scale = 1000.0 / RR_TICKS_PER_SECOND
+            result["mean_rr"] = self._sum / n * scale
+        if n > 1:
+            variance = (n * self._sum_sq - self._sum * self._sum) / (n * (n - 1))
+            result["sdnn"] = math.sqrt(variance) * scale
+            result["rmssd"] = math.sqrt(self._diff_sq / (n - 1)) * scale
+            result["pnn50"] = 100.0 * self._nn50 / (n - 1)
+        return result
@@ -0,0 +1,144 @@
+"""Scrolling BPM/RR chart drawn incrementally on a Tk canvas.
+
+Each series owns a fixed pool of line items. A new sample scrolls every data
+item left with one tagged ``canvas.move`` and re-targets the oldest item in
+the pool as the newest segment, so the number of canvas items and the memory
+used stay constant however long a session runs. Only a resize re-places all
+items, from the fixed-size ring of recent points.
+"""
+import tkinter as tk
+from collections import deque
+
+# Seconds of history visible across the chart
+CHART_WINDOW = 120.0
+
+# Highest sample rate drawn without truncating the window (Hz)
+CHART_MAX_RATE = 8
+
+# Value ranges mapped onto the chart height
+BPM_RANGE = (40, 200)
+RR_RANGE = (300, 1500)
+
+# Samples further apart than this are not joined by a segment (seconds)
+CHART_GAP = 5.0
+
+GRID_BPM = (60, 90, 120, 150, 180)
+
+DATA_TAG = "data"
+
+
+class _Series:
+    def __init__(self, canvas, color, width, value_range, capacity):
+        self.canvas = canvas
+        self.value_range = value_range
+        self.points = deque(maxlen=capacity)  # (time, value)
+        self.items = [canvas.create_line(0, 0, 0, 0, fill=color, width=width,
+                                         tags=DATA_TAG, state="hidden")
+                      for _ in range(capacity)]
+        self.next_item = 0
+
+    def y(self, value, top, height):
+        low, high = self.value_range
+        value = min(max(value, low), high)
+        return top + height * (high - value) / (high - low)
+
+    def add(self, timestamp, value, x, scale, top, height):
+        """Draw a segment from the previous point to ``(x, value)``."""
+        previous = self.points[-1] if self.points else None
+        self.points.append((timestamp, value))
+        y = self.y(value, top, height)
+        if previous is None or timestamp - previous[0] > CHART_GAP:
+            start = (x, y)
+        else:
+            start = (x - (timestamp - previous[0]) * scale, self.y(previous[1], top, height))
+        item = self.items[self.next_item]
+        self.next_item = (self.next_item + 1) % len(self.items)
+        self.canvas.coords(item, *start, x, y)
+        self.canvas.itemconfigure(item, state="normal")
+
+    def relayout(self, now, right, scale, top, height):
+        """Re-place every item from the point ring (resize only)."""
+        for item in self.items:
+            self.canvas.itemconfigure(item, state="hidden")
+        previous = None
+        self.next_item = 0
+        for timestamp, value in self.points:
+            x = right - (now - timestamp) * scale
+            y = self.y(value, top, height)
+            if previous is None or timestamp - previous[0] > CHART_GAP:
+                start = (x, y)
+            else:
+                start = previous[1]
+            item = self.items[self.next_item]
+            self.next_item = (self.next_item + 1) % len(self.items)
+            self.canvas.coords(item, *start, x, y)
+            self.canvas.itemconfigure(item, state="normal")
+            previous = (timestamp, (x, y))
+
+
+class LiveChart:
+    """Live BPM (red) and RR interval (blue) chart for the monitor window."""
+
+    def __init__(self, parent, window=CHART_WINDOW, max_rate=CHART_MAX_RATE, height=160):
+        self.window = window
+        self.canvas = tk.Canvas(parent, bg="#34495e", height=height, highlightthickness=0)
+        self.canvas.bind("<Configure>", self._on_configure)
+        self.width = 1
+        self.height = height
+        self.top = 8
+        self.plot_height = height - 16
+        self.last_time = None
+
+        self._grid = []
+        for bpm in GRID_BPM:
+            line = self.canvas.create_line(0, 0, 0, 0, fill="#4a6278", dash=(2, 4))
+            label = self.canvas.create_text(4, 0, text=str(bpm), anchor="w",
+                                            fill="#95a5a6", font=("Helvetica", 8))
+            self._grid.append((bpm, line, label))
+
+        capacity = int(window * max_rate)
+        self.rr = _Series(self.canvas, "#5dade2", 1, RR_RANGE, capacity)
+        self.bpm = _Series(self.canvas, "#e74c3c", 2, BPM_RANGE, capacity)
+
+    def pack(self, **kwargs):
+        self.canvas.pack(**kwargs)
+
+    @property
+    def scale(self):
+        """Pixels per second."""
+        return self.width / self.window
+
+    @property
+    def item_count(self):
+        return len(self.canvas.find_all())
+
+    def add_sample(self, timestamp, heart_rate, rr_intervals=()):
+        """Append one notification (``rr_intervals`` in milliseconds)."""
+        if self.last_time is not None:
+            if timestamp <= self.last_time:
+                return
+            self.canvas.move(DATA_TAG, -(timestamp - self.last_time) * self.scale, 0)
+        scale, right = self.scale, self.width
+        self.bpm.add(timestamp, heart_rate, right, scale, self.top, self.plot_height)
+
+        # Spread the notification's RR intervals over the time since the last one
+        if rr_intervals:
+            since = self.last_time if self.last_time is not None else timestamp
+            step = (timestamp - since) / len(rr_intervals)
+            for index, rr in enumerate(rr_intervals, 1):
+                rr_time = since + step * index
+                self.rr.add(rr_time, rr, right - (timestamp - rr_time) * scale,
+                            scale, self.top, self.plot_height)
+        self.last_time = timestamp
+
+    def _on_configure(self, event):
+        self.width = max(1, event.width)
+        self.height = max(1, event.height)
+        self.plot_height = max(1, self.height - 2 * self.top)
+        for bpm, line, label in self._grid:
+            y = self.bpm.y(bpm, self.top, self.plot_height)
+            self.canvas.coords(line, 0, y, self.width, y)
+            self.canvas.coords(label, 4, y - 6)
+        if self.last_time is not None:
+            for series in (self.rr, self.bpm):
+                series.relayout(self.last_time, self.width, self.scale, self.top, self.plot_height)
@@ -0,0 +1,342 @@
+"""End-to-end load test: simulated devices -> garmin.py -> HTTP and SSE clients.
+
+Starts ``garmin.py --headless --simulate`` so every simulated notification goes
+through ``hr_measurement_handler``, then for each endpoint runs N concurrent
+keep-alive clients for a fixed time while one SSE client measures delivery
+latency (notification timestamp to event received). CPU and RSS of the
+server process are read from /proc.
+
+Usage: python loadtest.py [--devices N] [--rate HZ] [--clients N] [--duration SEC]
+                          [--output FILE] [--compare BASELINE]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+ENDPOINTS = ("/api/heartrate", "/api/status")
+
+LOADTEST_PORT = 8169
+READY_TIMEOUT = 30.0
+
+# Relative change reported as a regression by --compare
+REGRESSION_THRESHOLD = 0.10
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def summarize(latencies):
+    """Count and p50/p99/max of latencies in seconds, reported in milliseconds."""
+    latencies.sort()
+
+    def ms(value):
+        return round(value * 1000, 3) if value is not None else None
+
+    return {
+        "count": len(latencies),
+        "p50_ms": ms(percentile(latencies, 0.50)),
+        "p99_ms": ms(percentile(latencies, 0.99)),
+        "max_ms": ms(latencies[-1] if latencies else None),
+    }
+
+
+class ProcessSampler:
+    """CPU time and resident memory of a process (Linux /proc; None elsewhere)."""
+
+    def __init__(self, pid):
+        self.pid = pid
+
+    def cpu_seconds(self):
+        try:
+            with open(f"/proc/{self.pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            return None
+        return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+    def rss_mb(self):
+        try:
+            with open(f"/proc/{self.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            pass
+        return None
+
+
+class HttpClient:
+    """Minimal HTTP/1.1 keep-alive client, so the test needs no extra packages."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def get(self, path):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(f"GET {path} HTTP/1.1\r\nHost: {self.host}\r\n\r\n".encode())
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        status = int(head.split(b" ", 2)[1])
+        length = 0
+        for line in head.split(b"\r\n")[1:]:
+            name, _, value = line.partition(b":")
+            if name.strip().lower() == b"content-length":
+                length = int(value)
+        body = await self.reader.readexactly(length)
+        return status, body
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+async def hammer(host, port, path, clients, duration):
+    """``clients`` concurrent clients requesting ``path`` back to back for ``duration``."""
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def client():
+        nonlocal errors
+        http = HttpClient(host, port)
+        try:
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    status, _ = await http.get(path)
+                except (OSError, asyncio.IncompleteReadError, ValueError):
+                    errors += 1
+                    http.close()
+                    continue
+                if status == 200:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+        finally:
+            http.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    result = summarize(latencies)
+    result["errors"] = errors
+    result["rps"] = round(result["count"] / elapsed, 1)
+    return result
+
+
+async def watch_stream(host, port, duration):
+    """Delivery latency of SSE events: sample timestamp to event received."""
+    latencies = []
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET /api/heartrate/stream HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+    deadline = time.monotonic() + duration
+    first = True
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                line = await asyncio.wait_for(reader.readline(), remaining)
+            except asyncio.TimeoutError:
+                break
+            if not line:
+                break
+            # Chunked transfer encoding: chunk size lines never start with "data: "
+            start = line.find(b"data: ")
+            if start < 0:
+                continue
+            received = time.time()
+            if first:
+                # The initial event is the current state, not a fresh sample
+                first = False
+                continue
+            latencies.append(received - json.loads(line[start + 6:])["timestamp"])
+    finally:
+        writer.close()
+    return summarize(latencies)
+
+
+async def wait_ready(process, host, port, timeout):
+    """Wait until the server answers and its primary device is connected."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and process.poll() is None:
+        http = HttpClient(host, port)
+        try:
+            status, body = await http.get("/api/status")
+            if status == 200 and json.loads(body)["is_connected"]:
+                return True
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            http.close()
+        await asyncio.sleep(0.2)
+    return False
+
+
+async def measure(sampler, host, port, path, clients, duration):
+    cpu_before = sampler.cpu_seconds()
+    started = time.perf_counter()
+    requests, delivery = await asyncio.gather(
+        hammer(host, port, path, clients, duration),
+        watch_stream(host, port, duration))
+    elapsed = time.perf_counter() - started
+    cpu_after = sampler.cpu_seconds()
+    requests["delivery"] = delivery
+    requests["server_cpu_percent"] = (round(100 * (cpu_after - cpu_before) / elapsed, 1)
+                                      if cpu_before is not None and cpu_after is not None else None)
+    requests["server_rss_mb"] = sampler.rss_mb()
+    return requests
+
+
+def run_loadtest(devices=10, rate_hz=4.0, clients=50, duration=10.0, port=LOADTEST_PORT,
+                 warmup=2.0):
+    """Run the whole suite and return the results dict (None if the server never came up)."""
+    host = "127.0.0.1"
+    addresses = ["5E:%02X:%02X:%02X:%02X:%02X" % tuple((index >> shift) & 0xFF
+                                                      for shift in (32, 24, 16, 8, 0))
+                 for index in range(devices)]
+    command = [sys.executable, "garmin.py", "--headless", "--simulate", str(devices),
+               "--sim-rate", str(rate_hz), "--api-port", str(port)]
+    for address in addresses:
+        command += ["--device", address]
+    process = subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(__file__)),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not asyncio.run(wait_ready(process, host, port, READY_TIMEOUT)):
+            return None
+        time.sleep(warmup)
+        sampler = ProcessSampler(process.pid)
+        endpoints = {}
+        for path in ENDPOINTS:
+            endpoints[path] = asyncio.run(measure(sampler, host, port, path, clients, duration))
+        idle = asyncio.run(measure(sampler, host, port, "/api/heartrate", 0, duration / 2))
+    finally:
+        process.terminate()
+        try:
+            process.wait(5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+    return {
+        "version": git_version(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {"devices": devices, "rate_hz": rate_hz, "clients": clients,
+                       "duration": duration},
+        "idle": {"delivery": idle["delivery"], "server_cpu_percent": idle["server_cpu_percent"],
+                 "server_rss_mb": idle["server_rss_mb"]},
+        "endpoints": endpoints,
+    }
+
+
+def git_version():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+                              timeout=5).stdout.strip() or None
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+
+
+def flatten(results):
+    """``{"endpoints./api/status.p99_ms": value, ...}`` for the numeric results."""
+    flat = {}
+
+    def walk(prefix, value):
+        if isinstance(value, dict):
+            for key, item in value.items():
+                walk(f"{prefix}.{key}" if prefix else key, item)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[prefix] = value
+
+    walk("", {"idle": results["idle"], "endpoints": results["endpoints"]})
+    return flat
+
+
+# Metrics where a larger value is better; for all others smaller is better
+HIGHER_IS_BETTER = ("rps",)
+
+# Too noisy (or redundant) to flag
+NOT_COMPARED = ("count", "errors", "max_ms")
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """Print changes against a baseline run; returns the number of regressions."""
+    current, previous = flatten(results), flatten(baseline)
+    regressions = 0
+    print(f"Compared with {baseline.get('version')} ({baseline.get('created')}):")
+    for key, value in current.items():
+        old = previous.get(key)
+        if not old or key.endswith(NOT_COMPARED):
+            continue
+        change = (value - old) / old
+        worse = -change if key.endswith(HIGHER_IS_BETTER) else change
+        flag = "  REGRESSION" if worse > threshold else ""
+        regressions += bool(flag)
+        print(f"  {key:45s} {old:10.2f} -> {value:10.2f} ({change:+.0%}){flag}")
+    return regressions
+
+
+def print_results(results):
+    print(f"{results['parameters']}  version {results['version']}")
+    for path, result in results["endpoints"].items():
+        delivery = result["delivery"]
+        print(f"{path:16s} {result['rps']:9.1f} req/s  p50 {result['p50_ms']} ms  "
+              f"p99 {result['p99_ms']} ms  errors {result['errors']}  "
+              f"delivery p50 {delivery['p50_ms']} ms p99 {delivery['p99_ms']} ms  "
+              f"cpu {result['server_cpu_percent']}%  rss {result['server_rss_mb']} MB")
+    idle = results["idle"]
+    print(f"{'idle':16s} delivery p50 {idle['delivery']['p50_ms']} ms "
+          f"p99 {idle['delivery']['p99_ms']} ms  cpu {idle['server_cpu_percent']}%  "
+          f"rss {idle['server_rss_mb']} MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end load test of the API server")
+    parser.add_argument("--devices", type=int, default=10, help="simulated devices (default: 10)")
+    parser.add_argument("--rate", type=float, default=4.0,
+                        help="notifications per second per device (default: 4)")
+    parser.add_argument("--clients", type=int, default=50,
+                        help="concurrent HTTP clients per endpoint (default: 50)")
+    parser.add_argument("--duration", type=float, default=10.0,
+                        help="seconds per endpoint (default: 10)")
+    parser.add_argument("--port", type=int, default=LOADTEST_PORT,
+                        help=f"API port of the server under test (default: {LOADTEST_PORT})")
+    parser.add_argument("--output", metavar="FILE", help="write the results as JSON")
+    parser.add_argument("--compare", metavar="FILE",
+                        help="compare with a previous --output file; exit 1 on regressions")
+    args = parser.parse_args(argv)
+
+    results = run_loadtest(args.devices, args.rate, args.clients, args.duration, args.port)
+    if results is None:
+        print("Server did not become ready (are fastapi and uvicorn installed?)")
+        return 2
+    print_results(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            if compare(results, json.load(f)):
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""Minimal Prometheus-style metrics with lock-free hot paths.
+
+Every counter and histogram is updated from a single thread (the BLE loop or
+the server loop), so updates are plain attribute/list increments without
+locks. ``render`` reads them without locking; a scrape may see a sample that
+is half applied (count bumped, sum not yet), which Prometheus tolerates.
+Labelled children are created with ``dict.setdefault``, which is atomic.
+"""
+import time
+from bisect import bisect_left
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; tuned for BLE connects and scans
+DURATION_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Seconds; tuned for in-process hand-offs and HTTP handlers
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._children = {}
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _samples(self):
+        if self.label_names:
+            return list(self._children.items())
+        return [((), self)]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in self._samples():
+            lines.extend(child._lines(self.name, self.label_names, values))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labels=()):
+        super().__init__(name, documentation, labels)
+        self.value = 0
+
+    def _new_child(self):
+        return Counter(self.name, self.documentation)
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def _lines(self, name, label_names, values):
+        return [f"{name}{_label_text(label_names, values)} {self.value}"]
+
+
+class Gauge(_Metric):
+    """A gauge read from ``function()`` at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, name, documentation, function):
+        super().__init__(name, documentation)
+        self.function = function
+
+    def _lines(self, name, label_names, values):
+        return [f"{name} {self.function()}"]
+
+
+class CounterFunction(Gauge):
+    """A counter read from ``function()`` at scrape time; the value must only grow."""
+    kind = "counter"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+
+    def _new_child(self):
+        return Histogram(self.name, self.documentation, buckets=self.bounds)
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def observe_ns(self, nanoseconds):
+        self.observe(nanoseconds * 1e-9)
+
+    def _lines(self, name, label_names, values):
+        lines = []
+        names = label_names + ("le",)
+        cumulative = 0
+        counts = list(self.counts)
+        for bound, count in zip(self.bounds + ("+Inf",), counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_label_text(names, values + (bound,))} {cumulative}")
+        labels = _label_text(label_names, values)
+        lines.append(f"{name}_sum{labels} {self.sum}")
+        lines.append(f"{name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class LatencyMiddleware:
+    """ASGI middleware timing HTTP requests until the response starts.
+
+    Requests are labelled by route template (e.g. ``/api/heartrate/{device_address}``)
+    so per-device URLs do not create new series.
+    """
+
+    def __init__(self, app, histogram):
+        self.app = app
+        self.histogram = histogram
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter_ns()
+        histogram = self.histogram
+
+        async def timed_send(message):
+            if message["type"] == "http.response.start":
+                route = getattr(scope.get("route"), "path", None) or "unmatched"
+                histogram.labels(scope["method"], route).observe_ns(time.perf_counter_ns() - started)
+            await send(message)
+
+        await self.app(scope, receive, timed_send)
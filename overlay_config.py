@@ -0,0 +1,78 @@
+"""Overlay settings served at /api/overlay-config and pushed to open overlays.
+
+The current settings are an immutable ``OverlayConfig`` encoded once, like
+heart rate snapshots; an update swaps in a new one with a new ETag. URL
+parameters of an overlay still override these per browser source.
+"""
+import itertools
+import json
+import os
+
+DEFAULT_OVERLAY_CONFIG = {
+    "update_interval_ms": 500,  # polling interval while the WebSocket is down
+    "push_rate": 0.0,           # max WebSocket messages per second, 0 for every sample
+    "max_hr": 190,              # for the zone display
+    "compact": False,
+    "warm_bpm": 100,            # lmao_display thresholds
+    "elevated_bpm": 110,
+    "panic_bpm": 140,
+}
+
+_version = itertools.count(1)
+
+
+class OverlayConfig:
+    __slots__ = ("version", "data", "body", "etag")
+
+    def __init__(self, data):
+        self.version = next(_version)
+        self.data = dict(data)
+        self.body = json.dumps(self.data, separators=(",", ":")).encode()
+        self.etag = f'"config-{self.version}"'
+
+    @property
+    def message(self):
+        """Text pushed to overlays when the settings change."""
+        return self.body.decode()
+
+
+def merge_overlay_config(current, updates):
+    """Return ``current`` with ``updates`` applied; ValueError on unknown keys or bad types."""
+    if not isinstance(updates, dict):
+        raise ValueError("expected a JSON object")
+    merged = dict(current)
+    for key, value in updates.items():
+        default = DEFAULT_OVERLAY_CONFIG.get(key)
+        if default is None:
+            raise ValueError(f"unknown overlay setting {key!r}")
+        if isinstance(default, bool):
+            if not isinstance(value, bool):
+                raise ValueError(f"{key} must be true or false")
+        elif isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+            raise ValueError(f"{key} must be a non-negative number")
+        elif isinstance(default, int):
+            value = int(value)
+        else:
+            value = float(value)
+        merged[key] = value
+    return merged
+
+
+def load_overlay_config(path):
+    """Defaults overlaid with the settings saved in ``path`` (missing file: defaults)."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            saved = json.load(f)
+    except FileNotFoundError:
+        return dict(DEFAULT_OVERLAY_CONFIG)
+    return merge_overlay_config(DEFAULT_OVERLAY_CONFIG, saved)
+
+
+def save_overlay_config(path, data):
+    temp_path = f"{path}.tmp"
+    try:
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1)
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"Could not save overlay config: {e}")
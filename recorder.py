@@ -0,0 +1,198 @@
+"""Append-only binary recording of BLE notifications and mmap-based replay.
+
+File layout: an 8 byte magic header followed by length-prefixed entries::
+
+    timestamp   float64   Unix time the notification arrived
+    kind        uint8     ENTRY_NOTIFICATION or ENTRY_DEVICE
+    device      uint16    device id within this file
+    length      uint16    payload size in bytes
+    payload     bytes     raw 0x2A37 value, or UTF-8 "address\\tname" for ENTRY_DEVICE
+
+All integers are little-endian. A torn entry at the end of the file (e.g.
+after a crash) is ignored on replay.
+"""
+import asyncio
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import deque
+
+RECORDING_MAGIC = b"HRLOG\x00\x00\x01"
+ENTRY_HEADER = struct.Struct("<dBHH")
+
+ENTRY_NOTIFICATION = 0
+ENTRY_DEVICE = 1
+
+# Seconds between background flushes of recorded entries
+FLUSH_INTERVAL = 0.5
+
+
+class SessionRecorder:
+    """Records notifications to disk from a background writer thread.
+
+    ``record`` only queues the entry, so it is safe to call from the Bleak
+    notification callback; encoding and file I/O happen on the writer thread
+    in batches every ``flush_interval`` seconds.
+    """
+
+    def __init__(self, path, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._pending = deque()
+        self._devices = {}
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._file = open(path, "ab", buffering=64 * 1024)
+        if self._file.tell() == 0:
+            self._file.write(RECORDING_MAGIC)
+        self._writer = threading.Thread(target=self._run_writer, daemon=True)
+        self._writer.start()
+
+    def add_device(self, address, name):
+        """Declare a device and return its id for ``record``."""
+        if address not in self._devices:
+            device_id = len(self._devices)
+            self._devices[address] = device_id
+            info = f"{address}\t{name}".encode("utf-8")
+            self._pending.append((time.time(), ENTRY_DEVICE, device_id, info))
+        return self._devices[address]
+
+    def record(self, device_id, data, timestamp=None):
+        """Queue one notification payload for writing."""
+        if timestamp is None:
+            timestamp = time.time()
+        self._pending.append((timestamp, ENTRY_NOTIFICATION, device_id, bytes(data)))
+
+    def _flush(self):
+        pending = self._pending
+        pack = ENTRY_HEADER.pack
+        chunks = []
+        while pending:
+            timestamp, kind, device_id, payload = pending.popleft()
+            chunks.append(pack(timestamp, kind, device_id, len(payload)))
+            chunks.append(payload)
+        if chunks:
+            self._file.write(b"".join(chunks))
+            self._file.flush()
+
+    def _run_writer(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._flush()
+        self._flush()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self._writer.join()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SessionRecording:
+    """Read-only, memory-mapped view of a recording file.
+
+    Iterating yields ``(timestamp, kind, device_id, payload)`` where payload is
+    a ``memoryview`` into the mapping; it is only valid until the next item.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.devices = {}
+        self._iterators = []
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        if size < len(RECORDING_MAGIC):
+            self._file.close()
+            raise ValueError(f"{path} is not a heart rate recording")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(RECORDING_MAGIC)] != RECORDING_MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a heart rate recording")
+
+    def __iter__(self):
+        entries = self._entries()
+        self._iterators.append(entries)
+        return entries
+
+    def _entries(self):
+        view = memoryview(self._map)
+        try:
+            offset = len(RECORDING_MAGIC)
+            end = len(view)
+            header_size = ENTRY_HEADER.size
+            unpack_from = ENTRY_HEADER.unpack_from
+            while offset + header_size <= end:
+                timestamp, kind, device_id, length = unpack_from(view, offset)
+                start = offset + header_size
+                offset = start + length
+                if offset > end:
+                    break
+                with view[start:offset] as payload:
+                    if kind == ENTRY_DEVICE:
+                        address, _, name = str(payload, "utf-8").partition("\t")
+                        self.devices[device_id] = (address, name)
+                    yield timestamp, kind, device_id, payload
+        finally:
+            view.release()
+
+    def close(self):
+        # Suspended iterators still hold views into the mapping
+        for entries in self._iterators:
+            entries.close()
+        self._iterators.clear()
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+async def replay_recording(path, handler, speed=1.0, on_device=None):
+    """Feed a recording's notifications into ``handler(sender, data)``.
+
+    ``speed`` scales playback (2.0 plays twice as fast); 0 replays as fast as
+    possible. ``on_device(device_id, address, name)`` is called for each
+    device declaration. Returns the number of notifications replayed.
+
+    A file may hold several sessions appended one after another; the wall
+    clock time between them is skipped rather than slept through.
+    """
+    count = 0
+    first = None
+    declared = set()
+    loop = asyncio.get_running_loop()
+    started = None
+    with SessionRecording(path) as recording:
+        for timestamp, kind, device_id, payload in recording:
+            if kind == ENTRY_DEVICE:
+                if device_id in declared:
+                    # Device ids restart at 0 in each appended session
+                    declared.clear()
+                    first = None
+                declared.add(device_id)
+                if on_device is not None:
+                    on_device(device_id, *recording.devices[device_id])
+                continue
+            if first is None or timestamp < first:
+                first = timestamp
+                started = loop.time()
+            if speed > 0:
+                delay = started + (timestamp - first) / speed - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            handler(device_id, payload)
+            count += 1
+    return count
@@ -0,0 +1,284 @@
+"""Relay heart rate samples from the BLE host to remote overlay servers.
+
+A ``RelayPublisher`` forwards every snapshot as one compact frame over UDP
+(unicast or multicast) or a persistent TCP connection; a ``RelaySubscriber``
+receives them and hands each sample to a callback, so a remote instance can
+serve the API and overlays without any Bluetooth stack.
+
+Frame layout (little-endian)::
+
+    magic       4 bytes   RELAY_MAGIC
+    seq         uint32    per-publisher frame counter, for loss detection
+    flags       uint8     RELAY_PRIMARY if the device is the primary one
+    address     uint8 length + UTF-8
+    name        uint8 length + UTF-8
+    raw_rr      uint8 count + uint16 x count, unfiltered RR in 1/1024 s
+    sample      ``wire`` sample record (filtered values)
+
+Decoded samples carry the unfiltered intervals as ``rr_intervals_raw`` (ms),
+so subscribers see the same raw/filtered pair as the publisher.
+
+Over TCP every frame is preceded by its uint16 length.
+"""
+import asyncio
+import ipaddress
+import itertools
+import socket
+import struct
+from urllib.parse import urlsplit
+
+from hr_parser import RR_TICKS_PER_SECOND
+from wire import unpack_sample
+
+RELAY_MAGIC = b"HRR2"
+RELAY_HEADER = struct.Struct("<4sIB")
+FRAME_LENGTH = struct.Struct("<H")
+RELAY_PRIMARY = 0x01
+
+DEFAULT_RELAY_PORT = 9069
+
+# Bytes a slow TCP subscriber may have queued before frames are dropped
+TCP_BUFFER_LIMIT = 256 * 1024
+
+# Seconds between TCP reconnect attempts
+RECONNECT_DELAY = 2.0
+
+# Multicast hops (1 = local network only)
+MULTICAST_TTL = 1
+
+
+def parse_relay_url(url):
+    """Parse ``udp://host:port`` or ``tcp://host:port`` into ``(scheme, host, port)``."""
+    parts = urlsplit(url)
+    if parts.scheme not in ("udp", "tcp") or not parts.hostname:
+        raise ValueError(f"expected udp://HOST:PORT or tcp://HOST:PORT, got {url!r}")
+    return parts.scheme, parts.hostname, parts.port or DEFAULT_RELAY_PORT
+
+
+def _short_string(text):
+    encoded = text.encode()[:255]
+    return bytes((len(encoded),)) + encoded
+
+
+def encode_frame(seq, address, name, primary, packed_sample, raw_rr_ms=()):
+    raw_rr = [min(0xFFFF, round(ms * RR_TICKS_PER_SECOND / 1000)) for ms in raw_rr_ms[:255]]
+    return b"".join([
+        RELAY_HEADER.pack(RELAY_MAGIC, seq & 0xFFFFFFFF, RELAY_PRIMARY if primary else 0),
+        _short_string(address),
+        _short_string(name),
+        struct.pack(f"<B{len(raw_rr)}H", len(raw_rr), *raw_rr),
+        packed_sample,
+    ])
+
+
+def decode_frame(buffer):
+    """Return ``(seq, address, name, primary, sample)``; ValueError if malformed."""
+    try:
+        magic, seq, flags = RELAY_HEADER.unpack_from(buffer, 0)
+        if magic != RELAY_MAGIC:
+            raise ValueError("not a relay frame")
+        offset = RELAY_HEADER.size
+        strings = []
+        for _ in range(2):
+            length = buffer[offset]
+            strings.append(bytes(buffer[offset + 1:offset + 1 + length]).decode())
+            offset += 1 + length
+        count = buffer[offset]
+        raw_rr = struct.unpack_from(f"<{count}H", buffer, offset + 1)
+        sample, _ = unpack_sample(buffer, offset + 1 + 2 * count)
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise ValueError(f"malformed relay frame: {e}") from None
+    sample["rr_intervals_raw"] = [ticks * 1000.0 / RR_TICKS_PER_SECOND for ticks in raw_rr]
+    return seq, strings[0], strings[1], bool(flags & RELAY_PRIMARY), sample
+
+
+class RelayPublisher:
+    """Sends snapshots to one relay URL; ``send`` is safe from any thread."""
+
+    def __init__(self, url, loop):
+        self.url = url
+        self.scheme, self.host, self.port = parse_relay_url(url)
+        self.loop = loop
+        self.sent = 0
+        self.dropped = 0
+        self._seq = itertools.count(1)
+        self._sock = None
+        self._sockaddr = None
+        self._writer = None
+        self._task = None
+
+    async def start(self):
+        """Open the socket (UDP) or start the reconnecting TCP task; run on ``loop``.
+
+        UDP hostnames are resolved once here, so sends never block on DNS.
+        """
+        if self.scheme == "udp":
+            family, self._sockaddr = await _resolve(self.loop, self.host, self.port)
+            sock = socket.socket(family, socket.SOCK_DGRAM)
+            sock.setblocking(False)
+            if _is_multicast(self._sockaddr[0]) and family == socket.AF_INET:
+                sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, MULTICAST_TTL)
+            self._sock = sock
+        else:
+            self._task = self.loop.create_task(self._maintain_tcp())
+
+    async def _maintain_tcp(self):
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+            except OSError as e:
+                print(f"Relay {self.url}: {e}; retrying in {RECONNECT_DELAY:.0f}s")
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+            print(f"Relay connected to {self.url}")
+            self._writer = writer
+            try:
+                # Subscribers never send; EOF or an error means the link is gone
+                await reader.read()
+            except OSError:
+                pass
+            finally:
+                self._writer = None
+                writer.close()
+            print(f"Relay {self.url} disconnected")
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    def send(self, snapshot, primary):
+        data = snapshot.data
+        frame = encode_frame(next(self._seq), data["device_address"], data["device_name"],
+                             primary, snapshot.packed, data["rr_intervals_raw"])
+        if self.scheme == "udp":
+            self._send_datagram(frame)
+        elif _on_loop(self.loop):
+            self._send_stream(frame)
+        else:
+            self.loop.call_soon_threadsafe(self._send_stream, frame)
+
+    def _send_datagram(self, frame):
+        if self._sock is None:
+            return
+        try:
+            self._sock.sendto(frame, self._sockaddr)
+            self.sent += 1
+        except (BlockingIOError, OSError):
+            self.dropped += 1
+
+    def _send_stream(self, frame):
+        writer = self._writer
+        if writer is None or writer.transport.get_write_buffer_size() > TCP_BUFFER_LIMIT:
+            self.dropped += 1
+            return
+        writer.write(FRAME_LENGTH.pack(len(frame)) + frame)
+        self.sent += 1
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+        elif _on_loop(self.loop):
+            self._close_stream()
+        elif not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._close_stream)
+
+    def _close_stream(self):
+        if self._task is not None:
+            self._task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+
+
+class RelaySubscriber:
+    """Receives relay frames and calls ``on_sample(address, name, primary, sample)``."""
+
+    def __init__(self, url, on_sample):
+        self.url = url
+        self.scheme, self.host, self.port = parse_relay_url(url)
+        self.on_sample = on_sample
+        self.frames = 0
+        self.lost = 0
+        self.malformed = 0
+        self._last_seq = {}
+
+    def _receive(self, frame, peer):
+        try:
+            seq, address, name, primary, sample = decode_frame(frame)
+        except ValueError:
+            self.malformed += 1
+            return
+        self.frames += 1
+        last = self._last_seq.get(peer)
+        if last is not None and seq > last + 1:
+            self.lost += seq - last - 1
+        self._last_seq[peer] = seq
+        self.on_sample(address, name, primary, sample)
+
+    async def run(self):
+        """Receive until cancelled."""
+        loop = asyncio.get_running_loop()
+        if self.scheme == "udp":
+            family, sockaddr = await _resolve(loop, self.host, self.port)
+            transport, _ = await loop.create_datagram_endpoint(
+                lambda: _DatagramReceiver(self), sock=self._udp_socket(family, sockaddr[0]))
+            try:
+                await asyncio.Future()
+            finally:
+                transport.close()
+        else:
+            server = await asyncio.start_server(self._handle_stream, self.host, self.port)
+            async with server:
+                await server.serve_forever()
+
+    def _udp_socket(self, family, address):
+        multicast = _is_multicast(address)
+        sock = socket.socket(family, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(("" if multicast else address, self.port))
+        if multicast and family == socket.AF_INET:
+            membership = struct.pack("4s4s", socket.inet_aton(address), socket.inet_aton("0.0.0.0"))
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+        sock.setblocking(False)
+        return sock
+
+    async def _handle_stream(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        print(f"Relay publisher connected from {peer}")
+        try:
+            while True:
+                (length,) = FRAME_LENGTH.unpack(await reader.readexactly(FRAME_LENGTH.size))
+                self._receive(await reader.readexactly(length), peer)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._last_seq.pop(peer, None)
+            writer.close()
+        print(f"Relay publisher {peer} disconnected")
+
+
+class _DatagramReceiver(asyncio.DatagramProtocol):
+    def __init__(self, subscriber):
+        self.subscriber = subscriber
+
+    def datagram_received(self, data, addr):
+        self.subscriber._receive(data, addr)
+
+
+async def _resolve(loop, host, port):
+    """``(family, sockaddr)`` of the first UDP address for ``host``."""
+    infos = await loop.getaddrinfo(host, port, type=socket.SOCK_DGRAM)
+    if not infos:
+        raise OSError(f"cannot resolve {host}")
+    family, _, _, _, sockaddr = infos[0]
+    return family, sockaddr
+
+
+def _is_multicast(host):
+    try:
+        return ipaddress.ip_address(host).is_multicast
+    except ValueError:
+        return False
+
+
+def _on_loop(loop):
+    try:
+        return asyncio.get_running_loop() is loop
+    except RuntimeError:
+        return False
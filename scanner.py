@@ -0,0 +1,108 @@
+"""Continuous BLE scanning with incremental, deduplicated updates.
+
+Instead of waiting for a fixed-length discover, the scanner reacts to every
+advertisement through the transport's detection callback, keeps one entry per
+address and hands batches of changes (new devices, RSSI or name changes) to
+the caller as they happen.
+"""
+import asyncio
+
+from transport import HR_SERVICE_UUID
+
+# Report an RSSI change only when it moves by at least this many dBm
+RSSI_DELTA = 3
+
+# Seconds between delta batches handed to the caller
+DELTA_INTERVAL = 0.2
+
+
+def has_hr_service(service_uuids):
+    """True if an advertisement's service list includes Heart Rate (0x180D)."""
+    for uuid in service_uuids or ():
+        uuid = str(uuid).lower()
+        if uuid == HR_SERVICE_UUID or uuid == "180d" or uuid.startswith("0000180d-"):
+            return True
+    return False
+
+
+def match_devices(addresses=(), hr_service=True):
+    """Build a stop predicate: a known address, or (optionally) any HR device."""
+    wanted = {address.upper() for address in addresses}
+
+    def matches(address, device, adv):
+        if address.upper() in wanted:
+            return True
+        return hr_service and has_hr_service(getattr(adv, "service_uuids", None))
+    return matches
+
+
+class ContinuousScanner:
+    """Streams deduplicated advertisements from a transport.
+
+    ``on_deltas(changes)`` receives ``{address: (device, adv)}`` for every
+    device that appeared or changed since the previous batch. If
+    ``stop_when(address, device, adv)`` returns True the scan ends early and
+    the matching address is returned from ``run``.
+    """
+
+    def __init__(self, transport, on_deltas=None, stop_when=None,
+                 delta_interval=DELTA_INTERVAL, rssi_delta=RSSI_DELTA):
+        self.transport = transport
+        self.on_deltas = on_deltas
+        self.stop_when = stop_when
+        self.delta_interval = delta_interval
+        self.rssi_delta = rssi_delta
+        self.devices = {}
+        self.match = None
+        self._changes = {}
+        self._done = None
+
+    def _on_detection(self, device, adv):
+        address = device.address
+        previous = self.devices.get(address)
+        self.devices[address] = (device, adv)
+        if previous is not None:
+            old_adv = previous[1]
+            if (abs(getattr(adv, "rssi", 0) - getattr(old_adv, "rssi", 0)) < self.rssi_delta
+                    and getattr(adv, "local_name", None) == getattr(old_adv, "local_name", None)
+                    and getattr(adv, "service_uuids", None) == getattr(old_adv, "service_uuids", None)):
+                # Keep the last reported RSSI so slow drifts still surface
+                self.devices[address] = previous
+                return
+        self._changes[address] = (device, adv)
+        if self.stop_when is not None and self.match is None and self.stop_when(address, device, adv):
+            self.match = address
+            self._done.set()
+
+    def _flush(self):
+        if self._changes and self.on_deltas is not None:
+            changes, self._changes = self._changes, {}
+            self.on_deltas(changes)
+
+    async def run(self, timeout=None):
+        """Scan until ``timeout`` seconds pass, a match is found or the task is cancelled."""
+        loop = asyncio.get_running_loop()
+        self._done = asyncio.Event()
+        deadline = None if timeout is None else loop.time() + timeout
+        scanner = self.transport.scanner(self._on_detection)
+        await scanner.start()
+        try:
+            while not self._done.is_set():
+                wait = self.delta_interval
+                if deadline is not None:
+                    wait = min(wait, deadline - loop.time())
+                    if wait <= 0:
+                        break
+                try:
+                    await asyncio.wait_for(self._done.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                self._flush()
+        finally:
+            await scanner.stop()
+            self._flush()
+        return self.match
+
+    def stop(self):
+        if self._done is not None:
+            self._done.set()
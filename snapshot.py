@@ -0,0 +1,99 @@
+"""Immutable, pre-serialized heart rate snapshots.
+
+The BLE side builds a new snapshot after every change and swaps it in with a
+single reference assignment, so API readers never see a half-updated state.
+Each snapshot is JSON-encoded once; requests only append the time-dependent
+``last_update`` field. The sequence number doubles as a weak ETag. The push
+message and the binary ``wire`` encoding are built on first use and cached.
+
+``SnapshotLog`` keeps the most recent snapshots of all devices in a ring
+indexed by sequence number, for "everything since N" queries.
+"""
+import itertools
+import json
+import time
+
+from wire import pack_sample
+
+_sequence = itertools.count(1)
+
+# Snapshots kept for /api/samples (about 17 minutes of 1 device at 4 Hz)
+SNAPSHOT_LOG_SIZE = 4096
+
+
+class HeartRateSnapshot:
+    __slots__ = ("seq", "data", "etag", "_prefix", "_message", "_packed")
+
+    def __init__(self, data):
+        self.seq = next(_sequence)
+        self.data = dict(data, seq=self.seq)
+        self.etag = f'W/"{self.seq}"'
+        encoded = json.dumps(self.data, separators=(",", ":")).encode()
+        # Re-open the object so last_update can be appended per request
+        self._prefix = encoded[:-1] + b","
+        self._message = None
+        self._packed = None
+
+    def body(self, now):
+        """JSON bytes with ``last_update`` relative to ``now``."""
+        return self._prefix + b'"last_update":%.3f}' % (now - self.data["timestamp"])
+
+    def text(self, now):
+        return self.body(now).decode()
+
+    @property
+    def message(self):
+        """JSON text pushed to WebSocket/SSE clients (encoded once)."""
+        if self._message is None:
+            self._message = self.text(time.time())
+        return self._message
+
+    @property
+    def packed(self):
+        """Binary sample record (see ``wire``)."""
+        if self._packed is None:
+            self._packed = pack_sample(self.data)
+        return self._packed
+
+
+class SnapshotLog:
+    """Recent snapshots of every device, addressable by sequence number."""
+
+    def __init__(self, size=SNAPSHOT_LOG_SIZE):
+        self.size = size
+        self.latest = 0
+        self._ring = [None] * size
+
+    def append(self, snapshot):
+        self._ring[snapshot.seq % self.size] = snapshot
+        if snapshot.seq > self.latest:
+            self.latest = snapshot.seq
+
+    def since(self, seq):
+        """Return ``(latest, snapshots after seq, truncated)``."""
+        latest = self.latest
+        oldest = max(1, latest - self.size + 1)
+        truncated = seq + 1 < oldest
+        snapshots = []
+        ring, size = self._ring, self.size
+        for wanted in range(max(seq + 1, oldest), latest + 1):
+            snapshot = ring[wanted % size]
+            if snapshot is not None and snapshot.seq == wanted:
+                snapshots.append(snapshot)
+        return latest, snapshots, truncated
+
+
+def etag_matches(if_none_match, etag):
+    """Weak comparison of an If-None-Match header against ``etag``."""
+    if not if_none_match:
+        return False
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
@@ -0,0 +1,119 @@
+// Shared heart rate feed for the overlays.
+// Uses the /ws/heartrate push channel and falls back to polling
+// /api/heartrate only while the WebSocket is unavailable.
+// Returns a handle whose update({pollInterval, rate}) applies new settings.
+function subscribeHeartRate(onData, onError, options) {
+    options = options || {};
+    let pollInterval = options.pollInterval || 500;
+    let rate = options.rate || 0;
+    let pollTimer = null;
+    let retryDelay = 1000;
+    let socket = null;
+
+    function poll() {
+        fetch('/api/heartrate')
+            .then(response => response.json())
+            .then(onData)
+            .catch(onError);
+    }
+
+    function startPolling() {
+        if (pollTimer === null) {
+            poll();
+            pollTimer = setInterval(poll, pollInterval);
+        }
+    }
+
+    function stopPolling() {
+        if (pollTimer !== null) {
+            clearInterval(pollTimer);
+            pollTimer = null;
+        }
+    }
+
+    function connect() {
+        if (!('WebSocket' in window)) {
+            startPolling();
+            return;
+        }
+
+        const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+        let url = `${protocol}//${window.location.host}/ws/heartrate`;
+        if (rate > 0) {
+            url += `?rate=${rate}`;
+        }
+
+        try {
+            socket = new WebSocket(url);
+        } catch (error) {
+            socket = null;
+            startPolling();
+            return;
+        }
+
+        socket.onopen = () => {
+            stopPolling();
+            retryDelay = 1000;
+        };
+        socket.onmessage = (event) => onData(JSON.parse(event.data));
+        socket.onclose = () => {
+            // Keep the overlay alive by polling until the push channel is back
+            socket = null;
+            startPolling();
+            setTimeout(connect, retryDelay);
+            retryDelay = Math.min(Math.max(retryDelay * 2, 1000), 30000);
+        };
+    }
+
+    connect();
+
+    return {
+        update(newOptions) {
+            if (newOptions.pollInterval && newOptions.pollInterval !== pollInterval) {
+                pollInterval = newOptions.pollInterval;
+                if (pollTimer !== null) {
+                    stopPolling();
+                    startPolling();
+                }
+            }
+            if (newOptions.rate !== undefined && newOptions.rate !== rate) {
+                rate = newOptions.rate;
+                if (socket !== null) {
+                    // Reconnect right away with the new rate
+                    retryDelay = 0;
+                    socket.close();
+                }
+            }
+        }
+    };
+}
+
+// Overlay settings from /api/overlay-config. onConfig runs with the current
+// settings and again whenever they are changed on the server.
+function subscribeOverlayConfig(onConfig) {
+    if ('EventSource' in window) {
+        // The first event carries the current settings; EventSource reconnects itself
+        const source = new EventSource('/api/overlay-config/stream');
+        source.onmessage = (event) => onConfig(JSON.parse(event.data));
+        return;
+    }
+    fetch('/api/overlay-config')
+        .then(response => response.json())
+        .then(onConfig)
+        .catch(error => console.error('Error fetching overlay config:', error));
+}
+
+// Settings given as URL parameters of this overlay, which take precedence
+// over the server's overlay config. names maps config keys to parameters.
+function overlayUrlOverrides(names) {
+    const params = new URLSearchParams(window.location.search);
+    const overrides = {};
+    for (const [key, param] of Object.entries(names)) {
+        const value = params.get(param);
+        if (value === null) {
+            continue;
+        }
+        overrides[key] = value === 'true' ? true : value === 'false' ? false : parseFloat(value);
+    }
+    return overrides;
+}
@@ -0,0 +1,129 @@
+"""In-memory overlay assets, precompressed once at startup.
+
+Every file under the static directory is read, hashed and compressed with
+gzip (and brotli when the ``brotli`` package is installed) when the server
+starts; requests only pick a ready-made variant. Each variant has a strong
+ETag, so an OBS browser source reload is answered with ``304 Not Modified``.
+
+HTML pages refer to the other assets as ``/static/NAME?v=HASH``; requests
+carrying the current hash are served with a one-year ``immutable``
+Cache-Control, everything else with ``no-cache`` (always revalidated).
+Changes to the files take effect on the next start.
+"""
+import gzip
+import hashlib
+import importlib
+import mimetypes
+import os
+import re
+
+from snapshot import etag_matches
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+# Asset references rewritten to carry their content hash
+_ASSET_REFERENCE = re.compile(r'((?:src|href)=["\'])/static/([^"\'?#]+)(["\'])')
+
+# Encodings in order of preference, with the ETag suffix of each variant
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _brotli():
+    try:
+        return importlib.import_module("brotli")
+    except ImportError:
+        return None
+
+
+class StaticAsset:
+    __slots__ = ("path", "media_type", "version", "variants")
+
+    def __init__(self, path, content, media_type, brotli=None):
+        self.path = path
+        self.media_type = media_type
+        self.version = hashlib.sha256(content).hexdigest()[:16]
+        # encoding -> (body, etag); "identity" always present
+        self.variants = {"identity": (content, f'"{self.version}"')}
+        if media_type.startswith(COMPRESSIBLE_TYPES):
+            compressors = {"gzip": lambda data: gzip.compress(data, 9, mtime=0)}
+            if brotli is not None:
+                compressors["br"] = lambda data: brotli.compress(data, quality=11)
+            for encoding, suffix in ENCODINGS:
+                if encoding in compressors:
+                    body = compressors[encoding](content)
+                    if len(body) < len(content):
+                        self.variants[encoding] = (body, f'"{self.version}{suffix}"')
+
+    def response(self, version, accept_encoding, if_none_match):
+        """Return ``(status, body, headers)`` for a request."""
+        accepted = accepted_encodings(accept_encoding)
+        encoding = next((name for name, _ in ENCODINGS
+                         if name in self.variants and name in accepted), "identity")
+        body, etag = self.variants[encoding]
+        headers = {
+            "ETag": etag,
+            "Vary": "Accept-Encoding",
+            "Cache-Control": IMMUTABLE_CACHE if version == self.version else REVALIDATE_CACHE,
+        }
+        if etag_matches(if_none_match, etag):
+            return 304, b"", headers
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return 200, body, headers
+
+
+def accepted_encodings(header):
+    """Content codings in an Accept-Encoding header, minus those with q=0."""
+    accepted = set()
+    for item in (header or "").split(","):
+        name, _, params = item.partition(";")
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                pass
+        accepted.add(name.strip().lower())
+    return accepted
+
+
+class AssetStore:
+    """All files of ``directory``, keyed by their path relative to it."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.assets = {}
+        brotli = _brotli()
+        files = []
+        for root, _, names in os.walk(directory):
+            for name in names:
+                full_path = os.path.join(root, name)
+                files.append(os.path.relpath(full_path, directory).replace(os.sep, "/"))
+        # Pages last, so they can refer to the hashes of everything else
+        files.sort(key=lambda path: path.endswith(".html"))
+        for path in files:
+            with open(os.path.join(directory, path), "rb") as f:
+                content = f.read()
+            media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            if media_type == "text/html":
+                content = _ASSET_REFERENCE.sub(self._versioned, content.decode("utf-8")).encode()
+            if media_type.startswith("text/") or media_type == "application/javascript":
+                media_type += "; charset=utf-8"
+            self.assets[path] = StaticAsset(path, content, media_type, brotli)
+
+    def _versioned(self, match):
+        asset = self.assets.get(match.group(2))
+        if asset is None:
+            return match.group(0)
+        return f"{match.group(1)}/static/{match.group(2)}?v={asset.version}{match.group(3)}"
+
+    def get(self, path):
+        return self.assets.get(path)
+
+    @property
+    def encodings(self):
+        return sorted({encoding for asset in self.assets.values() for encoding in asset.variants})
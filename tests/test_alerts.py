@@ -0,0 +1,52 @@
+from alerts import FIRING, RESOLVED, AlertEngine, parse_alert_rule
+
+
+def engine(*specs, now=1000.0):
+    events = []
+    return AlertEngine([parse_alert_rule(spec) for spec in specs], events.append, now=now), events
+
+
+def test_stale_after_last_sample():
+    alerts, events = engine("stale:5")
+    alerts.on_sample("AA", "Strap", 1000.0, 80)
+    alerts.check_stale(1004.0)
+    assert events == []
+    alerts.check_stale(1006.0)
+    assert [(e["status"], e["device_address"]) for e in events] == [(FIRING, "AA")]
+    alerts.on_sample("AA", "Strap", 1007.0, 80)
+    assert events[-1]["status"] == RESOLVED
+
+
+def test_stale_without_any_sample():
+    alerts, events = engine("stale:5")
+    alerts.watch_device("AA", "Strap", now=1000.0)
+    alerts.check_stale(1004.0)
+    assert events == []
+    alerts.check_stale(1006.0)
+    assert [(e["status"], e["value"]) for e in events] == [(FIRING, 6.0)]
+
+
+def test_connect_pushes_stale_deadline_back():
+    alerts, events = engine("stale:5")
+    alerts.watch_device("AA", "Strap", now=1000.0)
+    alerts.watch_device("AA", "Strap", now=1003.0)
+    alerts.check_stale(1006.0)
+    assert events == []
+    alerts.check_stale(1008.5)
+    assert [e["status"] for e in events] == [FIRING]
+
+
+def test_stale_rule_for_other_device():
+    alerts, events = engine("BB=stale:5")
+    alerts.watch_device("AA", "Strap", now=1000.0)
+    alerts.check_stale(1010.0)
+    assert events == []
+
+
+def test_bpm_threshold():
+    alerts, events = engine("bpm>180:10")
+    for second in range(12):
+        alerts.on_sample("AA", "Strap", 1000.0 + second, 185)
+    alerts.on_sample("AA", "Strap", 1012.0, 170)
+    assert [(e["status"], e["timestamp"]) for e in events] == [(FIRING, 1010.0),
+                                                              (RESOLVED, 1012.0)]
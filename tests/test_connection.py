@@ -0,0 +1,77 @@
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+from connection import CONNECTED, Backoff, DeviceConnection
+
+
+class FlakyTransport:
+    """Fails the first ``failures`` connects; ``drop()`` disconnects the current client."""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.targets = []
+        self._disconnect = None
+
+    @asynccontextmanager
+    async def client(self, target, timeout=None, disconnected_callback=None):
+        self.targets.append(target)
+        if self.failures:
+            self.failures -= 1
+            raise OSError("device not found")
+        self._disconnect = lambda: disconnected_callback(self)
+        yield self
+
+    def drop(self):
+        self._disconnect()
+
+
+def run_until(connection, predicate):
+    async def main():
+        states = []
+        connection.on_state = lambda stats, message: states.append(stats.state)
+        task = asyncio.create_task(connection.run())
+        try:
+            while not predicate(states):
+                await asyncio.sleep(0.001)
+        finally:
+            task.cancel()
+    asyncio.run(main())
+
+
+def test_failed_first_attempts_are_not_drops():
+    transport = FlakyTransport(failures=2)
+    connection = DeviceConnection(transport, "AA", lambda client: asyncio.sleep(0),
+                                  backoff=Backoff(initial=0.002, maximum=0.002))
+    run_until(connection, lambda states: CONNECTED in states)
+    stats = connection.stats
+    assert (stats.connects, stats.drops, stats.failed_attempts) == (1, 0, 2)
+    assert stats.first_attempt is not None
+    assert stats.last_drop is None
+    assert stats.last_reconnect_duration is None
+
+
+def test_reconnect_after_drop():
+    transport = FlakyTransport(failures=0)
+    connection = DeviceConnection(transport, "AA", lambda client: asyncio.sleep(0),
+                                  backoff=Backoff(initial=0.002, maximum=0.002))
+
+    def predicate(states):
+        if states.count(CONNECTED) == 1 and states[-1] == CONNECTED:
+            transport.drop()
+        return states.count(CONNECTED) == 2
+
+    run_until(connection, predicate)
+    stats = connection.stats
+    assert (stats.connects, stats.drops) == (2, 1)
+    assert stats.last_drop is not None
+    assert 0 <= stats.last_reconnect_duration < 1
+
+
+def test_cached_device_falls_back_to_address():
+    transport = FlakyTransport(failures=1)
+    device = SimpleNamespace(address="AA:BB")
+    connection = DeviceConnection(transport, device, lambda client: asyncio.sleep(0),
+                                  backoff=Backoff(initial=0.002, maximum=0.002))
+    run_until(connection, lambda states: CONNECTED in states)
+    assert transport.targets == [device, "AA:BB"]
@@ -0,0 +1,43 @@
+import asyncio
+import json
+import threading
+
+from device_cache import DeviceCache
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "cache.json")
+    cache = DeviceCache(path)
+    cache.record_probe("aa:bb", True, hr_handle=13)
+    cache.record_connected("aa:bb", "Strap", primary=True)
+    cache = DeviceCache(path)
+    assert cache.has_hr("AA:BB") is True
+    assert cache.hr_handle("AA:BB") == 13
+    assert cache.last_device == ("AA:BB", "Strap")
+    assert cache.has_hr("CC:DD") is None
+
+
+def test_saves_on_loop_use_executor(tmp_path, monkeypatch):
+    path = tmp_path / "cache.json"
+    cache = DeviceCache(str(path))
+    writer_threads = []
+    write = cache._write
+
+    def recording_write(text):
+        writer_threads.append(threading.current_thread())
+        write(text)
+
+    monkeypatch.setattr(cache, "_write", recording_write)
+
+    async def main():
+        for index in range(20):
+            cache.record_connected(f"AA:{index:02X}", f"Strap {index}", primary=True)
+        while cache._writing:
+            await asyncio.sleep(0.001)
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(main())
+    assert writer_threads and loop_thread not in writer_threads
+    data = json.loads(path.read_text())
+    assert data["last_device"] == "AA:13"
+    assert len(data["devices"]) == 20
@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+
+from device_manager import DeviceManager
+
+
+@pytest.fixture
+def runs():
+    return []
+
+
+@pytest.fixture
+def manager(runs):
+    async def run_device(address, name, primary=False):
+        runs.append((address, primary))
+        try:
+            await asyncio.Event().wait()
+        finally:
+            # Disconnecting takes a moment
+            await asyncio.shield(asyncio.sleep(0.05))
+
+    manager = DeviceManager(run_device)
+    yield manager
+    manager.stop()
+
+
+def test_add_is_idempotent(manager, runs):
+    first = manager.add_device("AA", "Strap").result(1)
+    assert manager.add_device("AA", "Strap").result(1) is first
+    assert runs == [("AA", False)]
+
+
+def test_add_primary_promotes_running_device(manager, runs):
+    manager.add_device("AA", "Strap").result(1)
+    manager.add_device("AA", "Strap", primary=True).result(1)
+    # Already primary: nothing to restart, and a plain add does not demote it
+    manager.add_device("AA", "Strap", primary=True).result(1)
+    manager.add_device("AA", "Strap").result(1)
+    assert runs == [("AA", False), ("AA", True)]
+    assert manager.addresses == ["AA"]
+
+
+def test_add_waits_for_pending_removal(manager, runs):
+    manager.add_device("AA", "Strap").result(1)
+    removed = manager.remove_device("AA")
+    task = manager.add_device("AA", "Strap").result(1)
+    removed.result(1)
+    assert not task.done()
+    assert runs == [("AA", False), ("AA", False)]
+    assert manager.addresses == ["AA"]
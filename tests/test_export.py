@@ -0,0 +1,84 @@
+import struct
+
+import pytest
+
+from export import (FIT_EPOCH, FIT_HRV, FIT_HRV_DATA, FIT_INVALID_UINT16, FIT_RECORD,
+                    FIT_RECORD_DATA, export_stream, fit_crc, read_chunks)
+from recorder import SessionRecorder
+
+
+def record(path, samples, devices=(("AA:BB", "Strap"),)):
+    with SessionRecorder(str(path)) as recorder:
+        ids = [recorder.add_device(address, name) for address, name in devices]
+        for index, timestamp, payload in samples:
+            recorder.record(ids[index], payload, timestamp)
+
+
+def test_fit_crc_check_value():
+    # CRC-16/ARC check value
+    assert fit_crc(b"123456789") == 0xBB3D
+    assert fit_crc(b"") == 0
+    assert fit_crc(b"56789", fit_crc(b"1234")) == 0xBB3D
+
+
+def test_fit_file(tmp_path):
+    path = tmp_path / "session.hrlog"
+    timestamp = FIT_EPOCH + 1000
+    record(path, [(0, timestamp, b"\x10\x50\x00\x04\x00\x02"), (0, timestamp + 1, b"\x00\x51")])
+    data = b"".join(export_stream(str(path), "fit"))
+    header_size, protocol, profile, data_size, signature = struct.unpack_from("<BBHI4s", data)
+    assert (header_size, signature) == (14, b".FIT")
+    assert struct.unpack_from("<H", data, 12)[0] == fit_crc(data[:12])
+    assert data_size == len(data) - 14 - 2
+    # The trailing CRC covers header and records; including it leaves zero
+    assert struct.unpack_from("<H", data, len(data) - 2)[0] == fit_crc(data[:-2])
+    assert fit_crc(data) == 0
+    assert FIT_RECORD_DATA.pack(FIT_RECORD, 1000, 80) in data
+    assert FIT_RECORD_DATA.pack(FIT_RECORD, 1001, 81) in data
+    assert FIT_HRV_DATA.pack(FIT_HRV, 1000, 500, *[FIT_INVALID_UINT16] * 3) in data
+
+
+def test_csv(tmp_path):
+    path = tmp_path / "session.hrlog"
+    record(path, [(0, 100.0, b"\x1e\x50\x10\x00\x00\x04\x00\x02"), (1, 101.0, b"\x00\x48")],
+           devices=(("AA:BB", 'Str"ap'), ("CC:DD", "Watch")))
+    assert b"".join(export_stream(str(path), "csv")).decode().splitlines() == [
+        "timestamp,device_address,device_name,heart_rate,sensor_contact,energy_expended,"
+        "rr_intervals_ms",
+        '100.000,AA:BB,"Str""ap",80,1,16,1000.0 500.0',
+        '101.000,CC:DD,"Watch",72,,,',
+    ]
+
+
+def test_read_chunks_filters(tmp_path):
+    path = tmp_path / "session.hrlog"
+    record(path, [(0, 100.0, b"\x00\x50"), (1, 101.0, b"\x00\x51"), (0, 102.0, b"\x00\x52"),
+                  (0, 103.0, b"\x00\x53")], devices=(("AA:BB", "Strap"), ("CC:DD", "Watch")))
+    chunks = list(read_chunks(str(path), device="aa:bb", start=101.0, end=102.5, size=1))
+    assert [chunk["heart_rate"] for chunk in chunks] == [[82]]
+    chunks = list(read_chunks(str(path), size=3))
+    assert [chunk["heart_rate"] for chunk in chunks] == [[80, 81, 82], [83]]
+    assert chunks[0]["rr_offsets"] == [0, 0, 0, 0]
+
+
+def test_device_filter_across_appended_sessions(tmp_path):
+    path = tmp_path / "session.hrlog"
+    record(path, [(0, 100.0, b"\x00\x46"), (1, 100.5, b"\x00\x50")],
+           devices=(("AA:AA", "Strap"), ("BB:BB", "Watch")))
+    # Second --record run: ids restart at 0, now for BB
+    record(path, [(0, 200.0, b"\x00\x5a")], devices=(("BB:BB", "Watch"),))
+    chunks = list(read_chunks(str(path), device="BB:BB"))
+    assert [(t, hr) for chunk in chunks for t, hr in zip(chunk["timestamp"], chunk["heart_rate"])] \
+        == [(100.5, 80), (200.0, 90)]
+    chunks = list(read_chunks(str(path), device="AA:AA"))
+    assert [hr for chunk in chunks for hr in chunk["heart_rate"]] == [70]
+
+
+def test_invalid_recording_fails_before_first_chunk(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_bytes(b"not a recording at all")
+    for format in ("csv", "fit"):
+        with pytest.raises(ValueError):
+            export_stream(str(path), format)
+    with pytest.raises(OSError):
+        export_stream(str(tmp_path / "missing.hrlog"), "csv")
@@ -0,0 +1,53 @@
+import pytest
+
+from hr_history import HeartRateHistory
+
+
+def brute_force(samples, since, until, resolution):
+    buckets = {}
+    for timestamp, bpm in samples:
+        if since <= timestamp < until:
+            buckets.setdefault(int(timestamp // resolution), []).append(bpm)
+    return [{"timestamp": key * resolution, "min": min(values), "max": max(values),
+             "mean": round(sum(values) / len(values), 2), "count": len(values)}
+            for key, values in sorted(buckets.items())]
+
+
+@pytest.fixture
+def samples():
+    return [(1000.0 + i * 0.25, 60 + (i * 7) % 90) for i in range(4000)]
+
+
+@pytest.fixture
+def history(samples):
+    history = HeartRateHistory()
+    for timestamp, bpm in samples:
+        history.append(timestamp, bpm)
+    return history
+
+
+@pytest.mark.parametrize("resolution", [0.5, 1.0, 15.0, 20.0, 45.0, 60.0, 12.5])
+def test_downsample_matches_raw(history, samples, resolution):
+    since, until = 1000.0, 1900.0
+    assert history.downsample(since, until, resolution) == brute_force(samples, since, until,
+                                                                      resolution)
+
+
+def test_level_choice(history):
+    assert history._level_for(15.0).width == 1
+    assert history._level_for(20.0).width == 10
+    assert history._level_for(600.0).width == 300
+    assert history._level_for(12.5) is None
+    assert history._level_for(0.5) is None
+
+
+@pytest.mark.parametrize("since, until", [(1003.3, 1897.1), (1000.0, 1999.0), (1500.5, 1501.0)])
+def test_unaligned_range(history, samples, since, until):
+    for resolution in (10.0, 60.0, 300.0):
+        assert history.downsample(since, until, resolution) == brute_force(samples, since, until,
+                                                                          resolution)
+
+
+def test_samples_window(history):
+    assert history.samples(1000.0, 1001.0) == [(1000.0, 60), (1000.25, 67), (1000.5, 74),
+                                               (1000.75, 81)]
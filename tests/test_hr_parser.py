@@ -0,0 +1,70 @@
+import pytest
+
+from hr_parser import (build_hr_measurement, parse_hr_measurement, parse_hr_measurements,
+                       parse_packed_measurements, rr_ticks_to_ms)
+
+
+@pytest.mark.parametrize("payload, expected", [
+    # uint8 BPM, no optional fields
+    (b"\x00\x48", (72, None, None, ())),
+    # uint16 BPM
+    (b"\x01\x2c\x01", (300, None, None, ())),
+    # contact supported, not detected / detected
+    (b"\x04\x50", (80, False, None, ())),
+    (b"\x06\x50", (80, True, None, ())),
+    # contact detected bit without the supported bit is meaningless
+    (b"\x02\x50", (80, None, None, ())),
+    # energy expended
+    (b"\x08\x50\x34\x12", (80, None, 0x1234, ())),
+    # RR intervals
+    (b"\x10\x50\x00\x04\x00\x02", (80, None, None, (1024, 512))),
+    # energy + RR
+    (b"\x18\x50\x10\x00\x00\x04", (80, None, 16, (1024,))),
+    # everything, uint16 BPM
+    (b"\x1f\x2c\x01\x10\x00\x00\x04\x00\x02", (300, True, 16, (1024, 512))),
+    # a trailing odd byte after the RR intervals is ignored
+    (b"\x10\x50\x00\x04\x01", (80, None, None, (1024,))),
+    # RR flag set but no intervals
+    (b"\x10\x50", (80, None, None, ())),
+])
+def test_parse_flags(payload, expected):
+    for data in (payload, bytearray(payload), memoryview(payload)):
+        assert tuple(parse_hr_measurement(data)) == expected
+
+
+@pytest.mark.parametrize("payload", [b"", b"\x01\x50", b"\x08\x50\x01", b"\x09\x50\x00\x01"])
+def test_parse_truncated(payload):
+    with pytest.raises(ValueError):
+        parse_hr_measurement(payload)
+
+
+def test_rr_intervals_ms():
+    measurement = parse_hr_measurement(b"\x10\x50\x00\x04\x00\x02\x00\x05")
+    assert measurement.rr_intervals_ms == [1000.0, 500.0, 1250.0]
+    assert rr_ticks_to_ms([1]) == [1000.0 / 1024]
+
+
+@pytest.mark.parametrize("kwargs, payload", [
+    ({"heart_rate": 72}, b"\x00\x48"),
+    ({"heart_rate": 72, "uint16": True}, b"\x01\x48\x00"),
+    ({"heart_rate": 300}, b"\x01\x2c\x01"),
+    ({"heart_rate": 80, "sensor_contact": False}, b"\x04\x50"),
+    ({"heart_rate": 80, "rr_intervals": (1024, 512), "energy_expended": 16, "sensor_contact": True},
+     b"\x1e\x50\x10\x00\x00\x04\x00\x02"),
+])
+def test_build_round_trip(kwargs, payload):
+    assert build_hr_measurement(**kwargs) == payload
+    measurement = parse_hr_measurement(payload)
+    assert measurement.heart_rate == kwargs["heart_rate"]
+    assert measurement.sensor_contact == kwargs.get("sensor_contact")
+    assert measurement.energy_expended == kwargs.get("energy_expended")
+    assert measurement.rr_intervals == tuple(kwargs.get("rr_intervals", ()))
+
+
+def test_packed_matches_single():
+    payloads = [b"\x00\x48", b"\x1f\x2c\x01\x10\x00\x00\x04\x00\x02", b"\x16\x48\x40\x03\x52\x03"]
+    buffer = bytearray(b"\xff" + b"".join(payloads))
+    packed = parse_packed_measurements(buffer, [len(p) for p in payloads], offset=1)
+    assert packed == parse_hr_measurements(payloads)
+    assert [m.heart_rate for m in packed] == [72, 300, 72]
+    assert packed[2].rr_intervals == (0x0340, 0x0352)
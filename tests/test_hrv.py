@@ -0,0 +1,77 @@
+import math
+
+import pytest
+
+from hrv import HrvEngine, parse_zones
+
+
+def test_statistics():
+    engine = HrvEngine()
+    # 1000, 1125, 1000, 875 ms
+    engine.add_sample(0.0, 60, (1024, 1152, 1024, 896))
+    summary = engine.summary()
+    assert summary["beats"] == 4
+    assert summary["mean_rr"] == pytest.approx(1000.0)
+    assert summary["sdnn"] == pytest.approx(math.sqrt(2 * 125.0 ** 2 / 3))
+    assert summary["rmssd"] == pytest.approx(125.0)
+    assert summary["pnn50"] == pytest.approx(100.0)
+
+
+def test_pnn50_threshold():
+    engine = HrvEngine()
+    # Successive differences of 20.5 ms, 51.8 ms and 49.8 ms
+    for rr in (1024, 1045, 1098, 1047):
+        engine.add_rr(rr)
+    assert engine.summary()["pnn50"] == pytest.approx(100.0 / 3)
+
+
+def test_single_interval():
+    engine = HrvEngine()
+    engine.add_rr(1024)
+    summary = engine.summary()
+    assert summary["mean_rr"] == 1000.0
+    assert summary["sdnn"] is None and summary["rmssd"] is None and summary["pnn50"] is None
+
+
+def test_window_matches_recomputation():
+    engine = HrvEngine(window=5.0)
+    intervals = [800 + (i * 97) % 400 for i in range(200)]
+    for rr in intervals:
+        engine.add_rr(rr)
+    summary = engine.summary()
+    kept = intervals[-summary["beats"]:]
+    assert sum(kept) <= 5 * 1024 < sum(intervals[-summary["beats"] - 1:])
+    ms = [rr * 1000 / 1024 for rr in kept]
+    mean = sum(ms) / len(ms)
+    diffs = [b - a for a, b in zip(ms, ms[1:])]
+    assert summary["mean_rr"] == pytest.approx(mean)
+    assert summary["sdnn"] == pytest.approx(math.sqrt(sum((x - mean) ** 2 for x in ms) / (len(ms) - 1)))
+    assert summary["rmssd"] == pytest.approx(math.sqrt(sum(d * d for d in diffs) / len(diffs)))
+    assert summary["pnn50"] == pytest.approx(100.0 * sum(abs(d) > 50 for d in diffs) / len(diffs))
+
+
+def test_window_keeps_two_intervals():
+    engine = HrvEngine(window=1.0)
+    for rr in (2048, 2048, 2048):
+        engine.add_rr(rr)
+    assert engine.summary()["beats"] == 2
+
+
+def test_time_in_zone():
+    engine = HrvEngine(zones=(100, 120, 140))
+    engine.add_sample(0.0, 90)
+    engine.add_sample(1.0, 110)
+    engine.add_sample(3.0, 130)
+    engine.add_sample(4.5, 150)
+    # A 10 s gap (dropped link) is not counted
+    engine.add_sample(14.5, 150)
+    engine.add_sample(15.0, 150)
+    assert engine.summary()["time_in_zone"] == [1.0, 2.0, 1.5, 0.5]
+
+
+def test_parse_zones():
+    assert parse_zones("140, 100,120") == (100, 120, 140)
+    with pytest.raises(ValueError):
+        parse_zones("")
+    with pytest.raises(ValueError):
+        parse_zones("0,100")
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from recorder import (ENTRY_DEVICE, ENTRY_HEADER, ENTRY_NOTIFICATION, RECORDING_MAGIC,
+                      SessionRecorder, SessionRecording, replay_recording)
+
+
+def write_session(path, samples, devices=(("AA:BB", "Strap"),)):
+    """Record ``(device_index, timestamp, payload)`` samples."""
+    with SessionRecorder(str(path)) as recorder:
+        ids = [recorder.add_device(address, name) for address, name in devices]
+        for index, timestamp, payload in samples:
+            recorder.record(ids[index], payload, timestamp)
+
+
+def test_file_layout(tmp_path):
+    path = tmp_path / "session.hrlog"
+    write_session(path, [(0, 100.0, b"\x00\x48")])
+    data = path.read_bytes()
+    assert data.startswith(RECORDING_MAGIC)
+    offset = len(RECORDING_MAGIC)
+    timestamp, kind, device_id, length = ENTRY_HEADER.unpack_from(data, offset)
+    assert (kind, device_id) == (ENTRY_DEVICE, 0)
+    offset += ENTRY_HEADER.size
+    assert data[offset:offset + length] == b"AA:BB\tStrap"
+    offset += length
+    assert ENTRY_HEADER.unpack_from(data, offset) == (100.0, ENTRY_NOTIFICATION, 0, 2)
+    assert data[offset + ENTRY_HEADER.size:] == b"\x00\x48"
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / "session.hrlog"
+    samples = [(0, 100.0, b"\x00\x48"), (1, 100.5, b"\x10\x50\x00\x04"), (0, 101.0, b"\x00\x49")]
+    write_session(path, samples, devices=(("AA:BB", "Strap"), ("CC:DD", "Watch")))
+    with SessionRecording(str(path)) as recording:
+        entries = [(timestamp, kind, device_id, bytes(payload))
+                   for timestamp, kind, device_id, payload in recording]
+        assert recording.devices == {0: ("AA:BB", "Strap"), 1: ("CC:DD", "Watch")}
+    notifications = [entry for entry in entries if entry[1] == ENTRY_NOTIFICATION]
+    assert notifications == [(t, ENTRY_NOTIFICATION, i, p) for i, t, p in samples]
+
+
+def test_torn_entry_ignored(tmp_path):
+    path = tmp_path / "session.hrlog"
+    write_session(path, [(0, 100.0, b"\x00\x48")])
+    with open(path, "ab") as f:
+        f.write(ENTRY_HEADER.pack(101.0, ENTRY_NOTIFICATION, 0, 4) + b"\x00")
+    with SessionRecording(str(path)) as recording:
+        payloads = [bytes(payload) for _, kind, _, payload in recording if kind == ENTRY_NOTIFICATION]
+    assert payloads == [b"\x00\x48"]
+
+
+def test_not_a_recording(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"PK\x03\x04 not a recording")
+    with pytest.raises(ValueError):
+        SessionRecording(str(path))
+
+
+def test_replay(tmp_path):
+    path = tmp_path / "session.hrlog"
+    write_session(path, [(0, 100.0, b"\x00\x48"), (0, 100.02, b"\x00\x49")])
+    received, devices = [], []
+
+    async def replay():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        count = await replay_recording(str(path), lambda device_id, data: received.append(
+            (device_id, bytes(data))), 1.0, lambda *device: devices.append(device))
+        return count, loop.time() - started
+
+    count, elapsed = asyncio.run(replay())
+    assert count == 2
+    assert received == [(0, b"\x00\x48"), (0, b"\x00\x49")]
+    assert devices == [(0, "AA:BB", "Strap")]
+    assert elapsed >= 0.015
+
+
+def test_replay_skips_gap_between_sessions(tmp_path):
+    path = tmp_path / "session.hrlog"
+    write_session(path, [(0, 100.0, b"\x00\x48")])
+    # A second --record run appends to the same file an hour later
+    write_session(path, [(0, 3700.0, b"\x00\x49"), (0, 3700.01, b"\x00\x4a")],
+                  devices=(("CC:DD", "Watch"),))
+    received, devices = [], []
+
+    async def replay():
+        return await asyncio.wait_for(replay_recording(
+            str(path), lambda device_id, data: received.append(bytes(data)), 1.0,
+            lambda *device: devices.append(device)), 5.0)
+
+    assert asyncio.run(replay()) == 3
+    assert received == [b"\x00\x48", b"\x00\x49", b"\x00\x4a"]
+    assert devices == [(0, "AA:BB", "Strap"), (0, "CC:DD", "Watch")]
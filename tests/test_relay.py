@@ -0,0 +1,80 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from relay import RELAY_MAGIC, RelayPublisher, RelaySubscriber, decode_frame, encode_frame, parse_relay_url
+from wire import pack_sample
+
+
+def sample_data():
+    return {"seq": 3, "timestamp": 100.0, "heart_rate": 80, "heart_rate_raw": 140,
+            "is_connected": True, "sensor_contact": None, "energy_expended": None,
+            "rr_intervals": [1000.0], "rr_intervals_raw": [1000.0, 250.0, 500.0]}
+
+
+def test_frame_round_trip():
+    data = sample_data()
+    frame = encode_frame(9, "AA:BB", "Strap", True, pack_sample(data), data["rr_intervals_raw"])
+    assert frame.startswith(RELAY_MAGIC)
+    seq, address, name, primary, sample = decode_frame(frame)
+    assert (seq, address, name, primary) == (9, "AA:BB", "Strap", True)
+    assert sample["heart_rate"] == 80 and sample["heart_rate_raw"] == 140
+    assert sample["rr_intervals"] == [1000.0]
+    # Unfiltered intervals survive the relay, so artifact counts stay right
+    assert sample["rr_intervals_raw"] == [1000.0, 250.0, 500.0]
+
+
+def test_frame_without_raw_rr():
+    seq, address, name, primary, sample = decode_frame(
+        encode_frame(1, "AA", "", False, pack_sample(sample_data())))
+    assert (address, name, primary) == ("AA", "", False)
+    assert sample["rr_intervals_raw"] == []
+
+
+@pytest.mark.parametrize("frame", [b"", b"HRR1" + bytes(20), RELAY_MAGIC + bytes(6)])
+def test_malformed_frames(frame):
+    with pytest.raises(ValueError):
+        decode_frame(frame)
+
+
+def test_subscriber_counts_lost_frames():
+    received = []
+    subscriber = RelaySubscriber("udp://127.0.0.1:9", lambda *args: received.append(args))
+    packed = pack_sample(sample_data())
+    for seq in (1, 2, 5):
+        subscriber._receive(encode_frame(seq, "AA", "Strap", True, packed), "peer")
+    subscriber._receive(b"junk", "peer")
+    assert (subscriber.frames, subscriber.lost, subscriber.malformed) == (3, 2, 1)
+    assert len(received) == 3
+
+
+def test_parse_relay_url():
+    assert parse_relay_url("udp://239.1.2.3:9100") == ("udp", "239.1.2.3", 9100)
+    assert parse_relay_url("tcp://relay.local") == ("tcp", "relay.local", 9069)
+    with pytest.raises(ValueError):
+        parse_relay_url("http://relay.local")
+
+
+def test_udp_hostname_resolved_once():
+    async def main():
+        loop = asyncio.get_running_loop()
+        received = asyncio.Queue()
+        subscriber = RelaySubscriber("udp://localhost:19169",
+                                     lambda *args: received.put_nowait(args))
+        receiving = loop.create_task(subscriber.run())
+        await asyncio.sleep(0.05)
+        publisher = RelayPublisher("udp://localhost:19169", loop)
+        await publisher.start()
+        try:
+            assert publisher._sockaddr[0] in ("127.0.0.1", "::1")
+            data = dict(sample_data(), device_address="AA", device_name="Strap")
+            publisher.send(SimpleNamespace(data=data, packed=pack_sample(data)), True)
+            return await asyncio.wait_for(received.get(), 1.0)
+        finally:
+            publisher.close()
+            receiving.cancel()
+
+    address, name, primary, sample = asyncio.run(main())
+    assert (address, name, primary) == ("AA", "Strap", True)
+    assert sample["rr_intervals_raw"] == [1000.0, 250.0, 500.0]
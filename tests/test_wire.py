@@ -0,0 +1,78 @@
+import struct
+from types import SimpleNamespace
+
+from wire import (BATCH_HEADER, FLAG_CONNECTED, FLAG_CONTACT, FLAG_CONTACT_SUPPORTED, FLAG_ENERGY,
+                  SAMPLE_HEADER, pack_batch, pack_sample, unpack_batch, unpack_sample)
+
+
+def sample_data(**overrides):
+    data = {
+        "seq": 7,
+        "timestamp": 1700000000.5,
+        "heart_rate": 80,
+        "heart_rate_raw": 82,
+        "is_connected": True,
+        "sensor_contact": True,
+        "energy_expended": 16,
+        "rr_intervals": [1000.0, 500.0],
+        "device_address": "AA:BB",
+    }
+    data.update(overrides)
+    return data
+
+
+def test_sample_layout():
+    flags = FLAG_CONNECTED | FLAG_CONTACT_SUPPORTED | FLAG_CONTACT | FLAG_ENERGY
+    expected = (struct.pack("<IdHHBBH", 7, 1700000000.5, 80, 82, flags, 2, 16)
+                + struct.pack("<2H", 1024, 512))
+    assert SAMPLE_HEADER.size == 20
+    assert pack_sample(sample_data()) == expected
+
+
+def test_sample_optional_fields():
+    packed = pack_sample(sample_data(is_connected=False, sensor_contact=None, energy_expended=None,
+                                     rr_intervals=[]))
+    assert packed == struct.pack("<IdHHBBH", 7, 1700000000.5, 80, 82, 0, 0, 0)
+    sample, offset = unpack_sample(packed)
+    assert offset == len(packed)
+    assert sample["is_connected"] is False
+    assert sample["sensor_contact"] is None
+    assert sample["energy_expended"] is None
+    assert sample["rr_intervals"] == []
+
+
+def test_sample_round_trip():
+    data = sample_data(sensor_contact=False, rr_intervals=[1000.0, 750.0, 1250.0])
+    sample, offset = unpack_sample(b"\x00\x00" + pack_sample(data), 2)
+    assert offset == 2 + SAMPLE_HEADER.size + 6
+    for key in ("seq", "timestamp", "heart_rate", "heart_rate_raw", "is_connected",
+                "sensor_contact", "energy_expended", "rr_intervals"):
+        assert sample[key] == data[key]
+
+
+def test_rr_clamped():
+    sample, _ = unpack_sample(pack_sample(sample_data(rr_intervals=[1e6] * 300)))
+    assert len(sample["rr_intervals"]) == 255
+    assert sample["rr_intervals"][0] == 0xFFFF * 1000.0 / 1024
+
+
+def snapshot(**overrides):
+    data = sample_data(**overrides)
+    return SimpleNamespace(data=data, packed=pack_sample(data))
+
+
+def test_batch_round_trip():
+    snapshots = [snapshot(seq=1, device_address="AA"), snapshot(seq=2, device_address="BB"),
+                 snapshot(seq=3, device_address="AA", heart_rate=90)]
+    packed = pack_batch(3, snapshots, truncated=True)
+    assert BATCH_HEADER.unpack_from(packed) == (3, 1, 2, 3)
+    # Each address is stored once
+    assert packed.count(b"\x02AA") == 1
+    latest, truncated, samples = unpack_batch(packed)
+    assert (latest, truncated) == (3, True)
+    assert [(s["seq"], s["device_address"], s["heart_rate"]) for s in samples] == \
+        [(1, "AA", 80), (2, "BB", 80), (3, "AA", 90)]
+
+
+def test_empty_batch():
+    assert unpack_batch(pack_batch(5, [])) == (5, False, [])
@@ -0,0 +1,235 @@
+"""BLE transports: real devices through Bleak, or a simulated heart rate fleet.
+
+A transport provides ``scan(timeout)``, returning the same
+``{address: (device, advertisement)}`` mapping as
+``BleakScanner.discover(return_adv=True)``; ``scanner(detection_callback)``,
+returning an object with async ``start``/``stop`` like ``BleakScanner``; and
+``client(address_or_device, timeout, disconnected_callback)``, returning an
+async context manager with the subset of the ``BleakClient`` API the monitor
+uses (``is_connected``, ``services``, ``start_notify``, ``stop_notify``).
+"""
+import asyncio
+import math
+import random
+from dataclasses import dataclass
+from typing import Optional
+
+from hr_parser import RR_TICKS_PER_SECOND, build_hr_measurement
+
+HR_SERVICE_UUID = "0000180d-0000-1000-8000-00805f9b34fb"
+BATTERY_SERVICE_UUID = "0000180f-0000-1000-8000-00805f9b34fb"
+
+# At most this many RR intervals fit in one 20 byte notification
+MAX_RR_PER_NOTIFICATION = 9
+
+
+class BleakTransport:
+    """Real Bluetooth devices via Bleak (imported on first use)."""
+
+    name = "bleak"
+
+    async def scan(self, timeout=3.0):
+        from bleak import BleakScanner
+        return await BleakScanner.discover(timeout=timeout, return_adv=True)
+
+    def scanner(self, detection_callback):
+        from bleak import BleakScanner
+        return BleakScanner(detection_callback=detection_callback)
+
+    def client(self, address, timeout=10.0, disconnected_callback=None):
+        from bleak import BleakClient
+        return BleakClient(address, timeout=timeout, disconnected_callback=disconnected_callback)
+
+
+@dataclass
+class SimulationConfig:
+    """Shape of the simulated heart rate signal."""
+    rate_hz: float = 1.0          # notifications per second per device
+    base_bpm: float = 70.0        # resting heart rate
+    amplitude: float = 60.0       # peak rise above base_bpm
+    period: float = 300.0         # seconds for one rest -> peak -> rest cycle
+    noise: float = 2.0            # standard deviation of BPM jitter
+    dropout: float = 0.0          # probability that a notification is lost
+    link_drop_interval: float = 0.0  # mean seconds between connection drops (0 = never)
+    rr_intervals: bool = True     # include RR intervals
+    uint16: bool = False          # use the 16-bit heart rate format
+    seed: Optional[int] = None
+
+
+@dataclass
+class SimulatedDevice:
+    address: str
+    name: str
+
+
+@dataclass
+class SimulatedAdvertisement:
+    local_name: str
+    rssi: int
+    service_uuids: list
+
+
+@dataclass
+class SimulatedService:
+    uuid: str
+
+
+class SimulatedClient:
+    """Connection to one virtual heart rate strap."""
+
+    def __init__(self, address, config, index=0, disconnected_callback=None):
+        self.address = address
+        self.config = config
+        self.disconnected_callback = disconnected_callback
+        self.is_connected = False
+        self.services = [SimulatedService(HR_SERVICE_UUID), SimulatedService(BATTERY_SERVICE_UUID)]
+        self._random = random.Random(None if config.seed is None else config.seed + index)
+        # Spread devices across the BPM cycle so they do not move in lockstep
+        self._phase = self._random.random() * config.period
+        self._tasks = {}
+
+    async def connect(self):
+        await asyncio.sleep(0)
+        self.is_connected = True
+        return True
+
+    async def disconnect(self):
+        self._drop(notify=False)
+        return True
+
+    def _drop(self, notify=True):
+        for task in self._tasks.values():
+            if task is not asyncio.current_task():
+                task.cancel()
+        self._tasks.clear()
+        was_connected = self.is_connected
+        self.is_connected = False
+        if notify and was_connected and self.disconnected_callback is not None:
+            self.disconnected_callback(self)
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.disconnect()
+
+    async def start_notify(self, uuid, callback):
+        if not self.is_connected:
+            raise RuntimeError("Not connected")
+        self._tasks[uuid] = asyncio.create_task(self._emit(callback))
+
+    async def stop_notify(self, uuid):
+        task = self._tasks.pop(uuid, None)
+        if task is not None:
+            task.cancel()
+
+    def heart_rate_at(self, elapsed):
+        config = self.config
+        cycle = (elapsed + self._phase) / config.period
+        bpm = config.base_bpm + config.amplitude * (0.5 - 0.5 * math.cos(2 * math.pi * cycle))
+        if config.noise:
+            bpm += self._random.gauss(0.0, config.noise)
+        return max(30, min(250, int(round(bpm))))
+
+    async def _emit(self, callback):
+        config = self.config
+        loop = asyncio.get_running_loop()
+        interval = 1.0 / config.rate_hz
+        drop_chance = interval / config.link_drop_interval if config.link_drop_interval else 0.0
+        started = loop.time()
+        # Start at a random offset within the interval to spread the load
+        next_time = started + self._random.random() * interval
+        beats_due = 0.0
+        payload = bytearray()
+        while self.is_connected:
+            delay = next_time - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            next_time += interval
+
+            bpm = self.heart_rate_at(next_time - started)
+            rr = ()
+            if config.rr_intervals:
+                beats_due += interval * bpm / 60.0
+                beats = min(int(beats_due), MAX_RR_PER_NOTIFICATION)
+                beats_due -= int(beats_due)
+                rr_ticks = int(RR_TICKS_PER_SECOND * 60.0 / bpm)
+                rr = (rr_ticks,) * beats
+            if config.dropout and self._random.random() < config.dropout:
+                continue
+            payload[:] = build_hr_measurement(bpm, rr, sensor_contact=True, uint16=config.uint16)
+            callback(0, payload)
+            if drop_chance and self._random.random() < drop_chance:
+                self._drop()
+                return
+
+
+class SimulatedScanner:
+    """Advertises every virtual device about once per second with RSSI jitter."""
+
+    def __init__(self, transport, detection_callback, interval=1.0):
+        self.transport = transport
+        self.detection_callback = detection_callback
+        self.interval = interval
+        self._task = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._advertise())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _advertise(self):
+        loop = asyncio.get_running_loop()
+        rng = random.Random(self.transport.config.seed)
+        adverts = list((await self.transport.scan()).values())
+        # Each device advertises at its own random offset within the interval
+        schedule = sorted((rng.random() * self.interval, index) for index in range(len(adverts)))
+        started = loop.time()
+        cycle = 0
+        while True:
+            for offset, index in schedule:
+                delay = started + cycle * self.interval + offset - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                device, adv = adverts[index]
+                adv = SimulatedAdvertisement(adv.local_name, adv.rssi + rng.randint(-4, 4),
+                                             adv.service_uuids)
+                self.detection_callback(device, adv)
+            cycle += 1
+
+
+class SimulatedTransport:
+    """A fleet of virtual heart rate straps for hardware-free testing."""
+
+    name = "simulator"
+
+    def __init__(self, device_count=1, config=None):
+        self.config = config or SimulationConfig()
+        self.devices = {}
+        for index in range(device_count):
+            address = "5E:%02X:%02X:%02X:%02X:%02X" % tuple(
+                (index >> shift) & 0xFF for shift in (32, 24, 16, 8, 0))
+            self.devices[address] = (index, f"Simulated HR {index + 1}")
+
+    async def scan(self, timeout=3.0):
+        await asyncio.sleep(0)
+        rng = random.Random(self.config.seed)
+        return {
+            address: (SimulatedDevice(address, name),
+                      SimulatedAdvertisement(name, rng.randint(-90, -40), [HR_SERVICE_UUID]))
+            for address, (index, name) in self.devices.items()
+        }
+
+    def scanner(self, detection_callback):
+        return SimulatedScanner(self, detection_callback)
+
+    def client(self, address, timeout=10.0, disconnected_callback=None):
+        address = getattr(address, "address", address)
+        if address not in self.devices:
+            raise ValueError(f"Unknown simulated device {address}")
+        index, _ = self.devices[address]
+        return SimulatedClient(address, self.config, index, disconnected_callback)
@@ -0,0 +1,126 @@
+"""Compact binary encoding of heart rate samples for high-rate API clients.
+
+Served as ``application/vnd.hr-monitor.sample`` (one sample) and
+``application/vnd.hr-monitor.batch`` (many devices). All integers are
+little-endian.
+
+Sample record::
+
+    seq             uint32    snapshot sequence number
+    timestamp       float64   Unix time of the reading
+    heart_rate      uint16    filtered BPM
+    heart_rate_raw  uint16    BPM as reported by the device
+    flags           uint8     FLAG_* bits below
+    rr_count        uint8     number of RR intervals that follow
+    energy          uint16    kJ, valid if FLAG_ENERGY
+    rr              uint16 x rr_count   filtered RR intervals in 1/1024 s
+
+Batch::
+
+    latest_seq      uint32    pass back as ``since`` on the next request
+    flags           uint8     BATCH_TRUNCATED if older samples were dropped
+    device_count    uint16
+    sample_count    uint16
+    devices         device_count x (uint8 length, UTF-8 address)
+    samples         sample_count x (uint16 device index, sample record)
+
+HRV summaries and device names are JSON-only (see /api/hrv, /api/devices).
+"""
+import struct
+
+from hr_parser import RR_TICKS_PER_SECOND
+
+SAMPLE_MEDIA_TYPE = "application/vnd.hr-monitor.sample"
+BATCH_MEDIA_TYPE = "application/vnd.hr-monitor.batch"
+
+SAMPLE_HEADER = struct.Struct("<IdHHBBH")
+BATCH_HEADER = struct.Struct("<IBHH")
+DEVICE_INDEX = struct.Struct("<H")
+
+FLAG_CONNECTED = 0x01
+FLAG_CONTACT_SUPPORTED = 0x02
+FLAG_CONTACT = 0x04
+FLAG_ENERGY = 0x08
+
+BATCH_TRUNCATED = 0x01
+
+_RR_STRUCTS = {}
+
+
+def _rr_struct(count):
+    layout = _RR_STRUCTS.get(count)
+    if layout is None:
+        layout = _RR_STRUCTS[count] = struct.Struct(f"<{count}H")
+    return layout
+
+
+def pack_sample(data):
+    """Encode a snapshot payload dict as a sample record."""
+    flags = FLAG_CONNECTED if data["is_connected"] else 0
+    contact = data["sensor_contact"]
+    if contact is not None:
+        flags |= FLAG_CONTACT_SUPPORTED | (FLAG_CONTACT if contact else 0)
+    energy = data["energy_expended"]
+    if energy is not None:
+        flags |= FLAG_ENERGY
+    rr = [min(0xFFFF, round(ms * RR_TICKS_PER_SECOND / 1000)) for ms in data["rr_intervals"][:255]]
+    header = SAMPLE_HEADER.pack(data["seq"], data["timestamp"], data["heart_rate"],
+                                data["heart_rate_raw"], flags, len(rr), energy or 0)
+    return header + _rr_struct(len(rr)).pack(*rr) if rr else header
+
+
+def unpack_sample(buffer, offset=0):
+    """Decode a sample record; returns ``(dict, next_offset)``."""
+    seq, timestamp, heart_rate, heart_rate_raw, flags, rr_count, energy = \
+        SAMPLE_HEADER.unpack_from(buffer, offset)
+    offset += SAMPLE_HEADER.size
+    rr = _rr_struct(rr_count).unpack_from(buffer, offset) if rr_count else ()
+    offset += 2 * rr_count
+    sample = {
+        "seq": seq,
+        "timestamp": timestamp,
+        "heart_rate": heart_rate,
+        "heart_rate_raw": heart_rate_raw,
+        "is_connected": bool(flags & FLAG_CONNECTED),
+        "sensor_contact": bool(flags & FLAG_CONTACT) if flags & FLAG_CONTACT_SUPPORTED else None,
+        "energy_expended": energy if flags & FLAG_ENERGY else None,
+        "rr_intervals": [ticks * 1000.0 / RR_TICKS_PER_SECOND for ticks in rr],
+    }
+    return sample, offset
+
+
+def pack_batch(latest_seq, snapshots, truncated=False):
+    """Encode snapshots (each with ``data`` and ``packed``) from any devices."""
+    devices = {}
+    body = []
+    for snapshot in snapshots:
+        address = snapshot.data["device_address"]
+        index = devices.setdefault(address, len(devices))
+        body.append(DEVICE_INDEX.pack(index))
+        body.append(snapshot.packed)
+    table = []
+    for address in devices:
+        encoded = address.encode()[:255]
+        table.append(bytes((len(encoded),)) + encoded)
+    header = BATCH_HEADER.pack(latest_seq, BATCH_TRUNCATED if truncated else 0,
+                               len(devices), len(snapshots))
+    return b"".join([header, *table, *body])
+
+
+def unpack_batch(buffer):
+    """Decode a batch; returns ``(latest_seq, truncated, samples)`` with
+    ``device_address`` filled in on each sample."""
+    latest_seq, flags, device_count, sample_count = BATCH_HEADER.unpack_from(buffer, 0)
+    offset = BATCH_HEADER.size
+    addresses = []
+    for _ in range(device_count):
+        length = buffer[offset]
+        addresses.append(bytes(buffer[offset + 1:offset + 1 + length]).decode())
+        offset += 1 + length
+    samples = []
+    for _ in range(sample_count):
+        (index,) = DEVICE_INDEX.unpack_from(buffer, offset)
+        sample, offset = unpack_sample(buffer, offset + DEVICE_INDEX.size)
+        sample["device_address"] = addresses[index]
+        samples.append(sample)
+    return latest_seq, bool(flags & BATCH_TRUNCATED), samples